@@ -0,0 +1,94 @@
+# import_time.py
+"""Cold-start import benchmark for the web app and the parse-only path
+
+Each target is imported in a fresh interpreter several times. The script
+exits with status 1 if the best time is over the budget, or if a heavy ML
+or OCR module got imported eagerly.
+
+Usage: python benchmarks/import_time.py [--budget 2.0] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules that must only be imported when a model, extractor or fallback is first used
+HEAVY_MODULES = [
+    'torch', 'transformers', 'sentence_transformers', 'nltk',
+    'pytesseract', 'PIL', 'PyPDF2', 'docx', 'mailparser'
+]
+
+TARGETS = {
+    'web/app.py': (os.path.join(ROOT, 'web'), 'import app'),
+    'email_parser': (os.path.join(ROOT, 'src'), 'import email_parser'),
+    'main': (os.path.join(ROOT, 'src'), 'import main'),
+}
+
+# Lines the probe reports on; anything the import itself logs goes to stderr
+RESULT_PREFIX = 'IMPORT_TIME_RESULT '
+
+PROBE = """
+import contextlib, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(sys.stderr):
+    {statement}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print({prefix!r} + repr(elapsed) + ' ' + ','.join(heavy))
+"""
+
+
+def measure(cwd: str, statement: str, runs: int):
+    """Return (best seconds, eagerly imported heavy modules) over fresh interpreters"""
+    best = None
+    heavy = []
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'src'))
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(statement=statement, heavy=HEAVY_MODULES, prefix=RESULT_PREFIX)],
+            cwd=cwd, env=env, capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        result = next(line for line in output if line.startswith(RESULT_PREFIX))
+        fields = result[len(RESULT_PREFIX):].split(' ', 1)
+        elapsed = float(fields[0])
+        heavy = [name for name in fields[1].split(',') if name] if len(fields) > 1 else []
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, heavy
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--budget', type=float, default=2.0,
+                            help="maximum cold import time in seconds for each target")
+    arg_parser.add_argument('--runs', type=int, default=5,
+                            help="fresh interpreters per target; the best run counts")
+    args = arg_parser.parse_args()
+
+    failed = False
+    for name, (cwd, statement) in TARGETS.items():
+        try:
+            best, heavy = measure(cwd, statement, max(1, args.runs))
+        except subprocess.CalledProcessError as e:
+            print(f"✗ {name}: import failed\n{e.stderr}")
+            failed = True
+            continue
+
+        status = "✓"
+        if best > args.budget:
+            status = "✗"
+            failed = True
+        print(f"{status} {name}: {best * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms)")
+
+        if heavy:
+            print(f"✗ {name}: heavy modules imported eagerly: {', '.join(heavy)}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
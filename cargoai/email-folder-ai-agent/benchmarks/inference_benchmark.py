@@ -0,0 +1,173 @@
+# inference_benchmark.py
+"""Throughput and parity benchmark for the T5 inference backends
+
+Summarizes the same synthetic email texts with each backend (fp32, int8,
+onnx) and reports:
+  * summaries/sec and the speed-up over fp32
+  * parity with the fp32 summaries: exact-match rate and mean ROUGE-L F1
+
+A backend whose mean ROUGE-L against fp32 is below --min-parity fails the
+run (exit code 1), so the check can gate a switch of the default backend.
+
+Usage: python benchmarks/inference_benchmark.py --backends fp32,int8,onnx --count 64 --threads 4
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_corpus import random_text
+from model_registry import T5_BACKENDS, ModelRegistry
+from summarizer import EmailSummarizer
+
+
+def rouge_l_f1(reference: str, candidate: str) -> float:
+    """ROUGE-L F1 over whitespace tokens, from the longest common subsequence"""
+    ref, cand = reference.lower().split(), candidate.lower().split()
+    if not ref or not cand:
+        return 1.0 if ref == cand else 0.0
+    previous = [0] * (len(cand) + 1)
+    for ref_token in ref:
+        current = [0]
+        for j, cand_token in enumerate(cand):
+            current.append(previous[j] + 1 if ref_token == cand_token else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if lcs == 0:
+        return 0.0
+    precision, recall = lcs / len(cand), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def make_texts(count: int, approx_chars: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [' '.join(random_text(rng, approx_chars)) for _ in range(count)]
+
+
+def run_backend(backend: str, texts: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    """Summarize texts on one backend, after a warm-up batch, and time it"""
+    # A fresh registry per backend so models are not shared between runs
+    summarizer = EmailSummarizer(
+        batch_size=args.batch_size, registry=ModelRegistry(), dedup=False,
+        inference_backend=backend, intra_op_threads=args.threads,
+        inter_op_threads=args.interop_threads
+    )
+    start = time.perf_counter()
+    summarizer.summarize_batch(texts[:args.batch_size], max_length=args.max_length, min_length=args.min_length)
+    warmup = time.perf_counter() - start
+    if summarizer.active_backend != backend:
+        return {'backend': backend, 'error': f"fell back to {summarizer.active_backend or 'no model'}"}
+
+    elapsed, summaries = 0.0, []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        summaries = summarizer.summarize_batch(texts, max_length=args.max_length, min_length=args.min_length)
+        elapsed += time.perf_counter() - start
+
+    return {
+        'backend': backend,
+        'warmup_seconds': round(warmup, 3),
+        'seconds': round(elapsed, 3),
+        'summaries_per_sec': round(len(texts) * args.repeat / elapsed, 2) if elapsed else 0.0,
+        'summaries': summaries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare T5 inference backends for speed and parity")
+    parser.add_argument('--backends', default=','.join(T5_BACKENDS),
+                        help="comma-separated backends; fp32 always runs as the reference")
+    parser.add_argument('--count', type=int, default=64, help="texts to summarize")
+    parser.add_argument('--chars', type=int, default=700, help="approximate characters per text")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-length', type=int, default=150)
+    parser.add_argument('--min-length', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=1, help="timed passes over the texts")
+    parser.add_argument('--threads', type=int, default=None, help="intra-op threads")
+    parser.add_argument('--interop-threads', type=int, default=None, help="inter-op threads")
+    parser.add_argument('--min-parity', type=float, default=0.9,
+                        help="lowest acceptable mean ROUGE-L F1 against fp32")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help="JSON results path")
+    args = parser.parse_args()
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    unknown = [name for name in backends if name not in T5_BACKENDS]
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(unknown)}")
+    backends = ['fp32'] + [name for name in backends if name != 'fp32']
+
+    texts = make_texts(args.count, args.chars, args.seed)
+    results = {
+        'benchmark': 'inference',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'texts': len(texts),
+        'chars_per_text': args.chars,
+        'batch_size': args.batch_size,
+        'threads': {'intra_op': args.threads, 'inter_op': args.interop_threads},
+        'min_parity': args.min_parity,
+        'backends': []
+    }
+
+    reference = None
+    failed = False
+    for backend in backends:
+        print(f"Running {backend}...")
+        run = run_backend(backend, texts, args)
+        if 'error' in run:
+            print(f"✗ {backend}: {run['error']}")
+            failed = failed or backend == 'fp32'
+            results['backends'].append(run)
+            if backend == 'fp32':
+                break
+            continue
+
+        summaries = run.pop('summaries')
+        if reference is None:
+            reference = {'summaries': summaries, 'rate': run['summaries_per_sec']}
+        scores = [rouge_l_f1(ref, cand) for ref, cand in zip(reference['summaries'], summaries)]
+        run['speedup'] = round(run['summaries_per_sec'] / reference['rate'], 2) if reference['rate'] else 0.0
+        run['exact_match'] = round(sum(ref == cand for ref, cand in zip(reference['summaries'], summaries))
+                                   / len(summaries), 3)
+        run['rouge_l_f1'] = round(sum(scores) / len(scores), 3)
+        run['rouge_l_f1_min'] = round(min(scores), 3)
+        run['parity_ok'] = run['rouge_l_f1'] >= args.min_parity
+        failed = failed or not run['parity_ok']
+        results['backends'].append(run)
+
+    print("\n=== Inference Backends ===")
+    for run in results['backends']:
+        if 'error' in run:
+            print(f"{run['backend']:>5}: {run['error']}")
+            continue
+        mark = '✓' if run['parity_ok'] else '✗'
+        print(f"{run['backend']:>5}: {run['summaries_per_sec']:7.2f} summaries/sec  x{run['speedup']:<5}  "
+              f"exact {run['exact_match']:.1%}  ROUGE-L {run['rouge_l_f1']:.3f} (min {run['rouge_l_f1_min']:.3f}) {mark}")
+
+    output_path = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"inference_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output_path}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
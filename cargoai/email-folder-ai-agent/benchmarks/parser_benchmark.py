@@ -0,0 +1,123 @@
+# parser_benchmark.py
+"""Email parser benchmark: mail-parser vs the stdlib fast path vs header-only
+
+Every .eml file in the folder is parsed ``--repeat`` times with each
+method; files are read into memory first so disk I/O is not measured.
+  * mailparser: mailparser.parse_from_bytes plus the mail-parser field mapping
+  * fast:       EmailParser._parse_fast (BytesParser with policy.default)
+  * headers:    EmailParser.parse_headers, as used for listings
+
+Defaults to the sample emails in emails/; pass --synthetic N to add a
+generated corpus with attachments.
+
+Usage: python benchmarks/parser_benchmark.py [--folder emails] [--repeat 20] [--synthetic 50]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_corpus import generate_corpus
+from email_parser import EmailParser
+
+
+def time_method(parse, items: List, repeat: int) -> Dict[str, float]:
+    """Best-of-repeat total seconds for one pass over items, with output silenced"""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for item in items:
+                parse(item)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'best_seconds': round(best, 6),
+        'ms_per_email': round(best * 1000.0 / len(items), 3),
+        'emails_per_sec': round(len(items) / best, 1) if best else 0.0
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--folder', default=os.path.join(ROOT, 'emails'), help="folder of .eml files")
+    arg_parser.add_argument('--repeat', type=int, default=20, help="passes per method; the best is kept")
+    arg_parser.add_argument('--synthetic', type=int, default=0, help="also generate this many synthetic emails")
+    arg_parser.add_argument('--output', help="results JSON path (default benchmarks/results/parser_<time>.json)")
+    args = arg_parser.parse_args()
+
+    parser = EmailParser()
+    paths = sorted(parser.list_email_files(args.folder))
+
+    work_dir = tempfile.mkdtemp(prefix='parser-bench-')
+    try:
+        if args.synthetic:
+            paths += generate_corpus(os.path.join(work_dir, 'emails'), args.synthetic)
+        if not paths:
+            print(f"No email files found in {args.folder}")
+            sys.exit(1)
+
+        raw_messages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                raw_messages.append((f.read(), os.path.basename(path)))
+
+        methods = {
+            'mailparser': lambda item: parser._parse_with_mailparser(*item),
+            'fast': lambda item: parser._parse_fast(*item),
+        }
+        results = {
+            'benchmark': 'parser',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus': {
+                'emails': len(paths),
+                'bytes': sum(len(raw) for raw, _ in raw_messages),
+                'folder': args.folder,
+                'synthetic': args.synthetic
+            },
+            'repeat': args.repeat,
+            'methods': {}
+        }
+
+        for name, parse in methods.items():
+            results['methods'][name] = time_method(parse, raw_messages, args.repeat)
+        # Header-only parsing reads from disk by design, so it is timed on paths
+        results['methods']['headers'] = time_method(parser.parse_headers, paths, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = results['methods']['mailparser']['best_seconds']
+    print("\n=== Parser Benchmark ===")
+    print(f"{len(paths)} emails, {results['corpus']['bytes'] / 1024.0:.1f} KB, best of {args.repeat}")
+    for name, row in results['methods'].items():
+        speedup = baseline / row['best_seconds'] if row['best_seconds'] else 0.0
+        row['speedup_vs_mailparser'] = round(speedup, 2)
+        print(f"{name:>10}: {row['ms_per_email']:8.3f} ms/email  {row['emails_per_sec']:9.1f} emails/sec  "
+              f"{speedup:5.1f}x")
+
+    output_path = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"parser_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# pipeline_benchmark.py
+"""End-to-end benchmark for EmailProcessingAgent
+
+Generates a synthetic corpus, then measures:
+  * staged: each email driven through parse, extract, summarize, entities
+    and write one at a time, giving per-stage timings and p50/p95 latency
+  * agent:  process_all_emails() on the same corpus, giving end-to-end
+    emails/sec with batching and the worker pool as configured
+
+Results are printed and written as JSON so runs can be compared across
+releases.
+
+Usage: python benchmarks/pipeline_benchmark.py --count 50 --attachments pdf,docx,png
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_corpus import generate_corpus
+from main import EmailProcessingAgent
+
+STAGES = ['parse', 'extract', 'summarize', 'entities', 'write']
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Smallest value with at least pct% of the values at or below it
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of finished worker processes"""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+
+def run_staged(agent: EmailProcessingAgent, paths: List[str], output_folder: str) -> List[Dict[str, float]]:
+    """Process emails one at a time and time every stage"""
+    summarizer = agent.summarizer
+    extract_entities = summarizer._extract_entities_batch
+    entity_time = [0.0]
+
+    def timed_entities(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return extract_entities(*args, **kwargs)
+        finally:
+            entity_time[0] += time.perf_counter() - start
+
+    # Entities run inside summary assembly; time them separately
+    summarizer._extract_entities_batch = timed_entities
+    records = []
+
+    try:
+        for path in paths:
+            timings = {}
+
+            start = time.perf_counter()
+            email_data = agent.email_parser.parse_single_email(path)
+            timings['parse'] = time.perf_counter() - start
+            if not email_data:
+                continue
+
+            start = time.perf_counter()
+            extracted_docs = agent.document_extractor.extract_from_attachments(email_data['attachments'])
+            timings['extract'] = time.perf_counter() - start
+
+            entity_time[0] = 0.0
+            start = time.perf_counter()
+            summary = summarizer.generate_comprehensive_summaries([(email_data, extracted_docs)])[0]
+            timings['entities'] = entity_time[0]
+            timings['summarize'] = time.perf_counter() - start - entity_time[0]
+
+            start = time.perf_counter()
+            with open(os.path.join(output_folder, f"summary_{email_data['filename']}.json"), 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
+            timings['write'] = time.perf_counter() - start
+
+            timings['total'] = sum(timings[stage] for stage in STAGES)
+            records.append(timings)
+    finally:
+        del summarizer._extract_entities_batch
+
+    return records
+
+
+def summarize_records(records: List[Dict[str, float]]) -> Dict[str, Any]:
+    """Per-stage totals, means and percentiles in milliseconds"""
+    report = {}
+    for stage in STAGES + ['total']:
+        values = [record[stage] * 1000.0 for record in records]
+        report[stage] = {
+            'total_ms': round(sum(values), 2),
+            'mean_ms': round(sum(values) / len(values), 2) if values else 0.0,
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2)
+        }
+    total_seconds = sum(record['total'] for record in records)
+    report['emails_per_sec'] = round(len(records) / total_seconds, 2) if total_seconds else 0.0
+    return report
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--count', type=int, default=20, help="number of synthetic emails")
+    arg_parser.add_argument('--html-ratio', type=float, default=0.5, help="share of HTML-only bodies")
+    arg_parser.add_argument('--attachments', default='pdf,docx,png',
+                            help="comma-separated attachment kinds, empty for none")
+    arg_parser.add_argument('--attachments-per-email', type=int, default=1)
+    arg_parser.add_argument('--min-kb', type=int, default=4, help="smallest attachment size")
+    arg_parser.add_argument('--max-kb', type=int, default=64, help="largest attachment size")
+    arg_parser.add_argument('--workers', type=int, default=1, help="worker processes for the agent run")
+    arg_parser.add_argument('--mode', choices=['staged', 'agent', 'both'], default='both')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--corpus-dir', help="reuse or keep the corpus here instead of a temp dir")
+    arg_parser.add_argument('--output', help="results JSON path (default benchmarks/results/pipeline_<time>.json)")
+    args = arg_parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='email-bench-')
+    corpus_dir = args.corpus_dir or os.path.join(work_dir, 'emails')
+    kinds = [kind for kind in args.attachments.split(',') if kind]
+
+    try:
+        start = time.perf_counter()
+        if args.corpus_dir and os.path.isdir(corpus_dir) and os.listdir(corpus_dir):
+            paths = sorted(
+                os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir) if name.endswith('.eml')
+            )
+        else:
+            paths = generate_corpus(
+                corpus_dir, args.count, html_ratio=args.html_ratio, attachment_kinds=kinds,
+                attachments_per_email=args.attachments_per_email,
+                attachment_kb=(args.min_kb, args.max_kb), seed=args.seed
+            )
+        print(f"Corpus: {len(paths)} emails in {corpus_dir} ({time.perf_counter() - start:.1f}s to prepare)")
+
+        results = {
+            'benchmark': 'pipeline',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus': {
+                'emails': len(paths),
+                'bytes': sum(os.path.getsize(path) for path in paths),
+                'html_ratio': args.html_ratio,
+                'attachment_kinds': kinds,
+                'attachments_per_email': args.attachments_per_email,
+                'attachment_kb': [args.min_kb, args.max_kb],
+                'seed': args.seed
+            }
+        }
+
+        if args.mode in ('staged', 'both'):
+            output_folder = os.path.join(work_dir, 'staged_output')
+            agent = EmailProcessingAgent(corpus_dir, output_folder, use_cache=False)
+            results['summarizer'] = agent.summarizer.settings_fingerprint()
+            records = run_staged(agent, paths, output_folder)
+            results['staged'] = summarize_records(records)
+            agent.close()
+
+        if args.mode in ('agent', 'both'):
+            output_folder = os.path.join(work_dir, 'agent_output')
+            agent = EmailProcessingAgent(corpus_dir, output_folder, use_cache=False, workers=args.workers)
+            start = time.perf_counter()
+            processed = agent.process_all_emails()
+            elapsed = time.perf_counter() - start
+            agent.close()
+            results['agent'] = {
+                'workers': args.workers,
+                'processed': len(processed),
+                'seconds': round(elapsed, 3),
+                'emails_per_sec': round(len(processed) / elapsed, 2) if elapsed else 0.0
+            }
+
+        results['peak_rss_mb'] = peak_rss_mb()
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n=== Benchmark Results ===")
+    if 'staged' in results:
+        for stage in STAGES + ['total']:
+            row = results['staged'][stage]
+            print(f"{stage:>10}: mean {row['mean_ms']:8.1f} ms  p50 {row['p50_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms")
+        print(f"Staged throughput: {results['staged']['emails_per_sec']} emails/sec")
+    if 'agent' in results:
+        print(f"Agent throughput: {results['agent']['emails_per_sec']} emails/sec "
+              f"({results['agent']['processed']} emails, {results['agent']['workers']} workers)")
+    print(f"Peak RSS: {results['peak_rss_mb']['self']} MB (children {results['peak_rss_mb']['children']} MB)")
+
+    output_path = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
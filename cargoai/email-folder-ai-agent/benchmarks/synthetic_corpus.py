@@ -0,0 +1,217 @@
+# synthetic_corpus.py
+"""Generate synthetic .eml corpora for benchmarking the email pipeline
+
+Everything is built with the standard library: the PDF, DOCX and PNG
+attachments are minimal but valid files that the real extractors can open.
+"""
+import io
+import os
+import random
+import struct
+import zipfile
+import zlib
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from typing import List, Sequence, Tuple
+
+WORDS = (
+    "shipment container vessel booking invoice freight cargo port arrival departure "
+    "customs clearance consignee shipper pallet weight volume delivery schedule "
+    "carrier manifest rate quote pickup warehouse terminal documents release "
+    "please confirm attached update regarding the of and for with on to by"
+).split()
+
+PORTS = ["Rotterdam", "Singapore", "Shanghai", "Hamburg", "Mumbai", "Los Angeles", "Dubai", "Antwerp"]
+
+
+def random_sentence(rng: random.Random, words: int = 12) -> str:
+    """A pseudo-English freight sentence with a few domain identifiers mixed in"""
+    tokens = [rng.choice(WORDS) for _ in range(words)]
+    extras = [
+        f"container {rng.choice('ABCDEFGHMNOPSTU')}{rng.choice('ABCDEFGHMNOPSTU')}{rng.choice('ABCDEFGHMNOPSTU')}U{rng.randint(1000000, 9999999)}",
+        f"AWB {rng.randint(100, 999)}-{rng.randint(10000000, 99999999)}",
+        f"port of {rng.choice(PORTS)}",
+    ]
+    tokens.insert(rng.randint(0, len(tokens)), rng.choice(extras))
+    return ' '.join(tokens).capitalize() + '.'
+
+
+def random_text(rng: random.Random, approx_chars: int) -> List[str]:
+    """Lines of sentences totalling roughly approx_chars characters"""
+    lines, size = [], 0
+    while size < approx_chars:
+        line = random_sentence(rng)
+        lines.append(line)
+        size += len(line) + 1
+    return lines
+
+
+def make_pdf(lines: Sequence[str], lines_per_page: int = 55) -> bytes:
+    """Minimal multi-page PDF with a Helvetica text layer"""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # filled in once the page tree exists
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_lines in pages:
+        text = ''.join(
+            "(" + line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ") '\n"
+            for line in page_lines
+        )
+        stream = f"BT /F1 9 Tf 40 800 Td 13 TL\n{text}ET".encode('latin-1', errors='replace')
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    kids = b' '.join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    xref_offset = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+              % (len(objects) + 1, catalog_id, xref_offset))
+    return out.getvalue()
+
+
+def make_docx(paragraphs: Sequence[str]) -> bytes:
+    """Minimal WordprocessingML document that python-docx can open"""
+    def escape(text: str) -> str:
+        return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+    body = ''.join(f'<w:p><w:r><w:t xml:space="preserve">{escape(p)}</w:t></w:r></w:p>' for p in paragraphs)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{body}</w:body></w:document>'
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', content_types)
+        archive.writestr('_rels/.rels', rels)
+        archive.writestr('word/document.xml', document)
+    return out.getvalue()
+
+
+def make_png(rng: random.Random, width: int, height: int) -> bytes:
+    """Grayscale PNG filled with noise, so its size tracks its dimensions"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    raw = b''.join(b'\x00' + rng.randbytes(width) for _ in range(height))
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b''))
+
+
+ATTACHMENT_TYPES = {
+    'pdf': ('application', 'pdf', 'pdf'),
+    'docx': ('application', 'vnd.openxmlformats-officedocument.wordprocessingml.document', 'docx'),
+    'png': ('image', 'png', 'png'),
+}
+
+
+def make_attachment(rng: random.Random, kind: str, approx_kb: int) -> bytes:
+    """Build an attachment of the given kind close to approx_kb kilobytes"""
+    if kind == 'pdf':
+        return make_pdf(random_text(rng, approx_kb * 900))
+    if kind == 'docx':
+        # Deflate shrinks repetitive text roughly threefold
+        return make_docx(random_text(rng, approx_kb * 3000))
+    if kind == 'png':
+        side = max(16, int((approx_kb * 1024) ** 0.5))
+        return make_png(rng, side, side)
+    raise ValueError(f"Unknown attachment kind: {kind}")
+
+
+def build_email(rng: random.Random, index: int, html: bool,
+                attachments: Sequence[Tuple[str, int]], body_chars: int = 1500) -> bytes:
+    """Build one synthetic message with the given (kind, approx_kb) attachments"""
+    message = EmailMessage()
+    message['From'] = f"Ops Desk {index} <ops{index}@forwarder.example>"
+    message['To'] = "imports@consignee.example"
+    message['Subject'] = f"Shipment update #{index}: {rng.choice(PORTS)} to {rng.choice(PORTS)}"
+    message['Date'] = format_datetime(datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index))
+    message['Message-ID'] = f"<bench-{index}@forwarder.example>"
+
+    lines = random_text(rng, body_chars)
+    if html:
+        # HTML-only body, like most newsletters, so the HTML-to-text path is exercised
+        paragraphs = ''.join(f"<p>{line}</p>" for line in lines)
+        message.set_content(
+            f"<html><head><style>p {{ margin: 0 }}</style></head><body>"
+            f"<table><tr><td>{paragraphs}</td></tr></table></body></html>",
+            subtype='html'
+        )
+    else:
+        message.set_content('\n'.join(lines))
+
+    for number, (kind, approx_kb) in enumerate(attachments, 1):
+        maintype, subtype, extension = ATTACHMENT_TYPES[kind]
+        message.add_attachment(
+            make_attachment(rng, kind, approx_kb),
+            maintype=maintype, subtype=subtype,
+            filename=f"document_{index}_{number}.{extension}"
+        )
+
+    return message.as_bytes()
+
+
+def generate_corpus(folder: str, count: int, html_ratio: float = 0.5,
+                    attachment_kinds: Sequence[str] = ('pdf', 'docx', 'png'),
+                    attachments_per_email: int = 1, attachment_kb: Tuple[int, int] = (4, 64),
+                    seed: int = 0) -> List[str]:
+    """Write ``count`` synthetic .eml files to folder and return their paths"""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+
+    for index in range(count):
+        attachments = [
+            (rng.choice(attachment_kinds), rng.randint(*attachment_kb))
+            for _ in range(attachments_per_email)
+        ] if attachment_kinds else []
+        raw = build_email(rng, index, rng.random() < html_ratio, attachments)
+
+        path = os.path.join(folder, f"bench_{index:06d}.eml")
+        with open(path, 'wb') as f:
+            f.write(raw)
+        paths.append(path)
+
+    return paths
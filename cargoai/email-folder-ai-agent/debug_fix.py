@@ -58,7 +58,7 @@ def test_summarization(emails):
         print(f"    Document summaries: {len(doc_summaries)}")
         
         print("  Testing entity extraction...")
-        entities = summarizer._extract_entities(email_data, extracted_docs)
+        entities = summarizer._extract_entities_batch([(email_data, extracted_docs)])[0]
         print(f"    Entities: {entities}")
         
         print("  Testing comprehensive summary...")
@@ -0,0 +1,202 @@
+import binascii
+import io
+import mmap
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional, Union
+
+from metrics import get_metrics
+
+# Decoded payloads larger than this are written to a temp file and memory-mapped
+SPILL_THRESHOLD = 8 * 1024 * 1024
+
+# Encoded characters decoded per step when streaming base64 (a multiple of 4)
+DECODE_CHUNK_CHARS = 4 * 1024 * 1024
+
+_NON_BASE64 = re.compile(r'[^A-Za-z0-9+/=]+')
+
+
+class AttachmentPayload:
+    """Attachment bytes held in memory or in a memory-mapped temp file
+
+    Small payloads keep a single ``bytes`` object; payloads over the spill
+    threshold are written to disk while they are decoded and mapped on
+    demand. Extractors read through ``open()`` or ``view()`` so the data is
+    not copied again, and ``release()`` frees the buffer (and deletes the
+    spill file) as soon as extraction is done.
+    """
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None,
+                 size: int = 0, owner: bool = True):
+        self._data = data
+        self._path = path
+        self._size = len(data) if data is not None else size
+        self._owner = owner
+        self._mmap: Optional[mmap.mmap] = None
+        self._released = False
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, bytearray, memoryview]) -> 'AttachmentPayload':
+        """Wrap bytes that are already in memory"""
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        return cls(data=data)
+
+    @classmethod
+    def from_base64(cls, encoded: Union[str, bytes], spill_threshold: int = SPILL_THRESHOLD,
+                    spill_dir: Optional[str] = None) -> 'AttachmentPayload':
+        """Decode base64 in chunks, spilling to disk once the output passes the threshold
+
+        Raises binascii.Error for payloads that are not valid base64, like
+        base64.b64decode.
+        """
+        if isinstance(encoded, bytes):
+            encoded = encoded.decode('ascii', errors='ignore')
+
+        if len(encoded) // 4 * 3 <= spill_threshold:
+            # Fits in memory anyway: one C-level decode, which skips line breaks itself
+            return cls(data=binascii.a2b_base64(encoded))
+
+        buffer = io.BytesIO()
+        spill = None
+        leftover = ''
+
+        try:
+            for start in range(0, len(encoded), DECODE_CHUNK_CHARS):
+                chunk = leftover + _NON_BASE64.sub('', encoded[start:start + DECODE_CHUNK_CHARS])
+                cut = len(chunk) - len(chunk) % 4
+                leftover = chunk[cut:]
+                if not cut:
+                    continue
+
+                decoded = binascii.a2b_base64(chunk[:cut])
+                if spill is None and buffer.tell() + len(decoded) > spill_threshold:
+                    spill = tempfile.NamedTemporaryFile(prefix='attachment-', suffix='.bin',
+                                                        dir=spill_dir, delete=False)
+                    spill.write(buffer.getbuffer())
+                    buffer = None
+                if spill is not None:
+                    spill.write(decoded)
+                else:
+                    buffer.write(decoded)
+
+            if leftover:
+                raise binascii.Error("Incorrect padding")
+        except Exception:
+            if spill is not None:
+                spill.close()
+                os.unlink(spill.name)
+            raise
+
+        if spill is None:
+            return cls(data=buffer.getvalue())
+
+        size = spill.tell()
+        spill.close()
+        metrics = get_metrics()
+        metrics.inc('attachments_spilled_total')
+        metrics.inc('attachment_spilled_bytes_total', size)
+        return cls(path=spill.name, size=size)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def spilled(self) -> bool:
+        return self._path is not None
+
+    def open(self) -> BinaryIO:
+        """A fresh binary stream over the payload (no copy of in-memory bytes)"""
+        self._check_released()
+        if self._path is not None:
+            return open(self._path, 'rb')
+        # BytesIO shares the bytes object until it is written to
+        return io.BytesIO(self._data)
+
+    def view(self) -> memoryview:
+        """Read-only memoryview of the payload, mapping spilled files on first use"""
+        self._check_released()
+        if self._path is None:
+            return memoryview(self._data)
+        if self._size == 0:
+            return memoryview(b'')
+        if self._mmap is None:
+            with open(self._path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def tobytes(self) -> bytes:
+        """The payload as bytes; copies spilled payloads into memory"""
+        self._check_released()
+        if self._path is None:
+            return self._data
+        with self.open() as f:
+            return f.read()
+
+    def decode(self, encoding: str = 'utf-8', errors: str = 'strict') -> str:
+        """Decode the payload as text"""
+        return str(self.view(), encoding, errors)
+
+    def release(self):
+        """Drop the buffer and delete the spill file; len() stays valid"""
+        if self._released:
+            return
+        self._released = True
+        self._data = None
+
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A caller still holds a view; the mapping goes when it does
+                pass
+            self._mmap = None
+
+        if self._path is not None and self._owner:
+            try:
+                os.unlink(self._path)
+            except OSError:
+                pass
+
+    def __enter__(self) -> 'AttachmentPayload':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+    def __reduce__(self):
+        # Worker processes get the spill path instead of a copy of the bytes,
+        # and never delete a file they do not own
+        self._check_released()
+        if self._path is not None:
+            return (AttachmentPayload, (None, self._path, self._size, False))
+        return (AttachmentPayload, (self._data,))
+
+    def _check_released(self):
+        if self._released:
+            raise ValueError("Attachment payload has been released")
+
+    def __repr__(self) -> str:
+        where = 'released' if self._released else ('spilled' if self._path else 'memory')
+        return f"AttachmentPayload({self._size} bytes, {where})"
+
+
+def open_payload(content) -> BinaryIO:
+    """Binary stream over an AttachmentPayload or any bytes-like object"""
+    if isinstance(content, AttachmentPayload):
+        return content.open()
+    return io.BytesIO(content)
+
+
+def payload_view(content) -> memoryview:
+    """memoryview over an AttachmentPayload or any bytes-like object"""
+    if isinstance(content, AttachmentPayload):
+        return content.view()
+    return memoryview(content)
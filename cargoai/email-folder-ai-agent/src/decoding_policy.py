@@ -0,0 +1,180 @@
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from metrics import get_metrics
+
+# Decoding tiers, best quality first: (name, num_beams, length_penalty).
+# The policy steps down this ladder to meet the latency budget or drain a backlog
+TIERS = (
+    ('beam4', 4, 2.0),
+    ('beam2', 2, 1.0),
+    ('greedy', 1, 1.0),
+)
+_TIER_INDEX = {name: index for index, (name, _, _) in enumerate(TIERS)}
+
+# Tier each kind of text starts from: the email summary is the headline of the
+# result, attachment and chunk summaries matter less per token spent
+BASE_TIER = {'email': 'beam4', 'document': 'beam2', 'chunk': 'beam2'}
+
+# Beam search buys little on inputs this short; they are decoded greedily
+SHORT_INPUT_TOKENS = 64
+
+# Summary length as a share of the input length, per kind of text
+OUTPUT_RATIO = {'email': 0.5, 'document': 0.4, 'chunk': 0.4}
+
+# No summary is cut below this many new tokens
+MIN_NEW_TOKENS = 16
+
+# Emails waiting outside the run (queued jobs, files still arriving) at
+# which decoding drops one tier, and at four times which it drops to greedy
+BACKLOG_THRESHOLD = 50
+
+# Weight of the newest measurement in the decoding cost estimate
+COST_SMOOTHING = 0.3
+
+# Recorded for summaries made without the model
+FALLBACK_DECODING = {'policy': 'fallback'}
+
+
+class DecodingSettings(NamedTuple):
+    """Generate arguments for one batch, with the reason the policy chose them"""
+    policy: str
+    num_beams: int
+    length_penalty: float
+    max_new_tokens: int
+    min_new_tokens: int
+    # None, 'backlog' or 'budget' when the policy stepped down from the base tier
+    downgraded: Optional[str] = None
+
+    def describe(self) -> Dict[str, Any]:
+        """The record stored with every summary this decoding produced"""
+        return {
+            'policy': self.policy,
+            'num_beams': self.num_beams,
+            'max_new_tokens': self.max_new_tokens,
+            'downgraded': self.downgraded
+        }
+
+
+class DecodingPolicy:
+    """Choose greedy or beam decoding and the output length for each generate call
+
+    The output budget follows the input: a summary gets at most
+    ``OUTPUT_RATIO`` of its input's tokens, capped by the caller's maximum,
+    so a three-line email no longer pays for a 150-token beam search. The
+    tier starts from the kind of text and steps down while the emails
+    waiting behind the run (queued jobs, files still arriving) exceed
+    ``backlog_threshold``, so a large run on its own keeps full quality,
+    or while the predicted time of the call exceeds its budget. The budget
+    is ``latency_budget`` seconds per call and, when ``run_budget`` is set,
+    the call's share of the time left in the run: remaining seconds over
+    remaining emails, times the emails in the call. The prediction comes
+    from measured seconds per decoding step per beam row.
+    """
+
+    def __init__(self, latency_budget: Optional[float] = None, backlog_threshold: int = BACKLOG_THRESHOLD,
+                 run_budget: Optional[float] = None):
+        self.latency_budget = latency_budget
+        self.run_budget = run_budget
+        self.backlog_threshold = max(1, backlog_threshold)
+        self.backlog = 0
+        # Emails of the current run not yet summarized, and when its budget runs out
+        self.run_remaining = 0
+        self._run_deadline: Optional[float] = None
+        # Seconds per decoding step per (batch row x beam), None until measured
+        self.step_cost: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def set_backlog(self, emails: int):
+        """Record how many emails are waiting behind the current run"""
+        self.backlog = max(0, emails)
+        get_metrics().set_gauge('decoding_backlog_emails', self.backlog)
+
+    def start_run(self, emails: Optional[int]):
+        """Start the clock on the run budget for a run of ``emails`` emails (None if unknown)"""
+        self.run_remaining = max(0, emails or 0)
+        self._run_deadline = None
+        if self.run_budget and self.run_remaining:
+            self._run_deadline = time.monotonic() + self.run_budget
+
+    def set_run_remaining(self, emails: int):
+        """Record how many emails of the run are still to be summarized"""
+        self.run_remaining = max(0, emails)
+
+    def emails_done(self, emails: int):
+        """Take emails whose summaries are finished off the run's remainder"""
+        self.run_remaining = max(0, self.run_remaining - emails)
+
+    def call_budget(self, batch_rows: int = 1) -> Optional[float]:
+        """Seconds a call over ``batch_rows`` texts may take, or None when unbounded"""
+        budgets = [self.latency_budget] if self.latency_budget else []
+        if self._run_deadline is not None:
+            left = max(0.0, self._run_deadline - time.monotonic())
+            budgets.append(left / max(1, self.run_remaining) * batch_rows)
+        return min(budgets) if budgets else None
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """The fixed rules that shape summaries (used in cache keys)
+
+        The budget and backlog only pick a cheaper tier for a while, so they
+        are left out: a cached summary stays valid and records its decoding.
+        """
+        return {
+            'tiers': [name for name, _, _ in TIERS],
+            'base': BASE_TIER,
+            'short_input_tokens': SHORT_INPUT_TOKENS,
+            'output_ratio': OUTPUT_RATIO
+        }
+
+    def choose(self, kind: str, input_tokens: int, max_length: int, min_length: int,
+               batch_rows: int = 1, shortest_input: Optional[int] = None) -> DecodingSettings:
+        """Settings for one generate call over ``batch_rows`` inputs of up to ``input_tokens`` tokens"""
+        shortest_input = input_tokens if shortest_input is None else shortest_input
+        ratio = OUTPUT_RATIO.get(kind, OUTPUT_RATIO['document'])
+        max_new = max(MIN_NEW_TOKENS, min(max_length, int(input_tokens * ratio)))
+        min_new = min(min_length, max(1, shortest_input // 4), max_new // 2)
+
+        tier = _TIER_INDEX[BASE_TIER.get(kind, 'beam2')]
+        if input_tokens < SHORT_INPUT_TOKENS:
+            tier = _TIER_INDEX['greedy']
+
+        downgraded = None
+        if self.backlog >= 4 * self.backlog_threshold:
+            backlog_tier = _TIER_INDEX['greedy']
+        elif self.backlog >= self.backlog_threshold:
+            backlog_tier = min(tier + 1, len(TIERS) - 1)
+        else:
+            backlog_tier = tier
+        if backlog_tier > tier:
+            tier, downgraded = backlog_tier, 'backlog'
+
+        budget = self.call_budget(batch_rows)
+        if budget is not None and self.step_cost:
+            while tier < len(TIERS) - 1 and self._predict(tier, batch_rows, max_new) > budget:
+                tier, downgraded = tier + 1, 'budget'
+            if self._predict(tier, batch_rows, max_new) > budget:
+                # Greedy still too slow: shorten the summary instead
+                fitting = int(budget / (self.step_cost * batch_rows * TIERS[tier][1]))
+                if fitting < max_new:
+                    max_new, downgraded = max(MIN_NEW_TOKENS, fitting), 'budget'
+                    min_new = min(min_new, max_new // 2)
+
+        name, num_beams, length_penalty = TIERS[tier]
+        get_metrics().inc('decoding_policy_total', batch_rows, policy=name, kind=kind,
+                          downgraded=downgraded or 'no')
+        return DecodingSettings(name, num_beams, length_penalty, max_new, min_new, downgraded)
+
+    def record(self, settings: DecodingSettings, batch_rows: int, steps: int, seconds: float):
+        """Update the step cost estimate from a finished generate call"""
+        if steps <= 0 or batch_rows <= 0 or seconds <= 0:
+            return
+        cost = seconds / (steps * batch_rows * settings.num_beams)
+        with self._lock:
+            if self.step_cost is None:
+                self.step_cost = cost
+            else:
+                self.step_cost += COST_SMOOTHING * (cost - self.step_cost)
+
+    def _predict(self, tier: int, batch_rows: int, max_new: int) -> float:
+        return self.step_cost * batch_rows * TIERS[tier][1] * max_new
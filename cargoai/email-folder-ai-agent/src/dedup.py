@@ -0,0 +1,165 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Emails whose body SimHashes differ in at most this many bits are near-duplicates
+MAX_HAMMING_DISTANCE = 3
+
+# Bodies with fewer words than this are compared exactly, not by SimHash
+MIN_SIMHASH_WORDS = 8
+
+# Words per shingle, and the body prefix that is fingerprinted
+SHINGLE_WORDS = 3
+MAX_FINGERPRINT_CHARS = 20000
+
+_WORD_PATTERN = re.compile(r'\w+')
+_QUOTED_LINE_PATTERN = re.compile(r'^[ \t]*>.*$\n?', re.MULTILINE)
+# Reply headers that start the quoted part of a message; everything after is dropped
+_REPLY_MARKER_PATTERN = re.compile(
+    r'^(?:On\b[^\n]{0,200}(?:\n[^\n]{0,200})?\bwrote:[ \t]*$'
+    r'|-{2,}[ \t]*Original Message[ \t]*-{2,}'
+    r'|From:[^\n]+\n(?:Sent|Date):)',
+    re.MULTILINE | re.IGNORECASE
+)
+_SUBJECT_PREFIX_PATTERN = re.compile(r'^(?:\s*(?:re|fw|fwd|aw|wg)\s*(?:\[\d+\])?\s*:\s*)+', re.IGNORECASE)
+_MESSAGE_ID_PATTERN = re.compile(r'<[^<>\s]+>')
+
+
+def strip_quoted_text(body: str) -> str:
+    """The new part of a reply: quoted '>' lines and everything after a reply header removed"""
+    marker = _REPLY_MARKER_PATTERN.search(body)
+    if marker:
+        body = body[:marker.start()]
+    return _QUOTED_LINE_PATTERN.sub('', body).strip()
+
+
+def normalize_subject(subject: str) -> str:
+    """Subject without Re:/Fwd: prefixes, lower-cased"""
+    return _SUBJECT_PREFIX_PATTERN.sub('', subject or '').strip().lower()
+
+
+def parse_message_ids(value: str) -> List[str]:
+    """Message-IDs in a Message-ID, In-Reply-To or References header, in order"""
+    return _MESSAGE_ID_PATTERN.findall(value or '')
+
+
+def thread_id(email_data: Dict[str, Any]) -> Optional[str]:
+    """Thread root from the References, In-Reply-To and Message-ID headers"""
+    for header in ('references', 'in_reply_to', 'message_id'):
+        ids = parse_message_ids(email_data.get(header, ''))
+        if ids:
+            return ids[0]
+    return None
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word shingles, or None when the text is too short"""
+    words = _WORD_PATTERN.findall(text[:MAX_FINGERPRINT_CHARS].lower())
+    if len(words) < MIN_SIMHASH_WORDS:
+        return None
+
+    weights = [0] * 64
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    signature = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            signature |= 1 << bit
+    return signature
+
+
+class Deduplicator:
+    """Remembers summaries so duplicate emails and attachments are summarized once
+
+    Emails are keyed by the SimHash of their subject and quote-stripped
+    body. A new body within ``max_distance`` bits of a known one maps to the
+    same key. The key never comes from the Message-ID alone: a modified or
+    re-delivered file with a known Message-ID but a different body must get
+    a summary of its own. Attachments are keyed by a hash of their extracted
+    text. Summaries are kept in an LRU of ``max_entries`` keys, so reuse
+    also works across windows and runs of the same agent. Thread headers
+    play no part in the key: messages of one thread say different things.
+    They are only recorded as ``thread_id`` (see below) for grouping results.
+    """
+
+    def __init__(self, max_distance: int = MAX_HAMMING_DISTANCE, max_entries: int = 10000):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # SimHash split into bands: near-duplicates share at least one band exactly
+        self._band_count = max_distance + 1
+        self._band_bits = 64 // self._band_count
+        self._bands: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+
+    def email_key(self, email_data: Dict[str, Any]) -> str:
+        """Dedup key for an email body; near-duplicates get the key of the first one seen"""
+        body = strip_quoted_text(email_data.get('body', '') or '')
+        text = f"{normalize_subject(email_data.get('subject', ''))}\n{body}"
+
+        signature = simhash(text)
+        if signature is None:
+            # The same message delivered twice still matches here, by content
+            return 'email:' + hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+        with self._lock:
+            near = self._find_near(signature)
+            if near is None:
+                self._add_signature(signature)
+                near = signature
+            return f"email:simhash:{near:016x}"
+
+    @staticmethod
+    def document_key(text: str) -> str:
+        """Dedup key for an attachment's extracted text"""
+        return 'document:' + hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The remembered summary entry for key, or None"""
+        with self._lock:
+            entry = self._summaries.get(key)
+            if entry is not None:
+                self._summaries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, summary: str, source: Optional[str] = None,
+            decoding: Optional[Dict[str, Any]] = None):
+        """Remember a summary, with the file it was first produced for and how it was decoded"""
+        with self._lock:
+            self._summaries[key] = {'summary': summary, 'source': source, 'decoding': decoding}
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.max_entries:
+                old_key, _ = self._summaries.popitem(last=False)
+                if old_key.startswith('email:simhash:'):
+                    self._remove_signature(int(old_key.rsplit(':', 1)[1], 16))
+
+    def _band_keys(self, signature: int) -> List[tuple]:
+        mask = (1 << self._band_bits) - 1
+        return [(band, signature >> (band * self._band_bits) & mask) for band in range(self._band_count)]
+
+    def _find_near(self, signature: int) -> Optional[int]:
+        best, best_distance = None, self.max_distance + 1
+        for band_key in self._band_keys(signature):
+            for candidate in self._bands.get(band_key, ()):
+                distance = bin(candidate ^ signature).count('1')
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return best
+
+    def _add_signature(self, signature: int):
+        for band_key in self._band_keys(signature):
+            self._bands.setdefault(band_key, set()).add(signature)
+
+    def _remove_signature(self, signature: int):
+        for band_key in self._band_keys(signature):
+            members = self._bands.get(band_key)
+            if members is not None:
+                members.discard(signature)
+                if not members:
+                    del self._bands[band_key]
@@ -1,12 +1,22 @@
-import PyPDF2
-import docx
-from PIL import Image
-import io
-import pytesseract
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from metrics import get_metrics
+from pdf_engine import PDFTextEngine
+from ocr_engine import OCREngine
+from attachment_payload import AttachmentPayload, open_payload, payload_view
+
+# PyPDF2, python-docx, Pillow and pytesseract are imported inside the
+# extractors that need them, so parse-only and web code paths start fast.
 
 class DocumentExtractor:
-    def __init__(self):
+    def __init__(self, cache=None, pdf_engine: Optional[PDFTextEngine] = None,
+                 ocr_engine: Optional[OCREngine] = None, pool=None):
+        # Optional SummaryCache keyed on attachment bytes
+        self.cache = cache
+        # Preprocessing, pooled and cached tesseract OCR for images and scanned pages
+        self.ocr_engine = ocr_engine or OCREngine(cache=cache)
+        # Scanned PDF pages are OCRed with the same path as image attachments;
+        # pool is an optional WorkerPool that large PDFs split their pages over
+        self.pdf_engine = pdf_engine or PDFTextEngine(ocr=self._extract_image, pool=pool)
         self.extractors = {
             'application/pdf': self._extract_pdf,
             'application/vnd.openxmlformats-officedocument.wordprocessingml.document': self._extract_docx,
@@ -17,70 +27,113 @@ class DocumentExtractor:
             'text/plain': self._extract_text
         }
     
+    def settings_fingerprint(self) -> Dict[str, Any]:
+        """Extraction settings that change the extracted text (used in cache keys)"""
+        return {
+            'pdf_max_pages': self.pdf_engine.max_pages,
+            'pdf_max_chars': self.pdf_engine.max_chars,
+            'pdf_ocr': self.pdf_engine.ocr is not None,
+            'ocr_max_side': self.ocr_engine.max_side,
+            'ocr_dpi': self.ocr_engine.target_dpi
+        }
+    
     def extract_from_attachments(self, attachments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Extract content from all attachments"""
+        """Extract content from all attachments, releasing each payload once it is done"""
         extracted_data = []
         
         for attachment in attachments:
             try:
                 content_type = attachment['content_type']
-                if content_type in self.extractors:
-                    extractor = self.extractors[content_type]
-                    extracted_content = extractor(attachment['content'])
-                    
-                    extracted_data.append({
-                        'filename': attachment['filename'],
-                        'content_type': content_type,
-                        'extracted_text': extracted_content,
-                        'metadata': self._extract_metadata(attachment)
-                    })
-                else:
-                    # Try to extract as text if unknown type
+                cache_key = None
+                extracted_content = None
+                
+                if self.cache is not None:
+                    cache_key = self.cache.make_key('extract', content_type, payload_view(attachment['content']),
+                                                    self.settings_fingerprint())
+                    cached = self.cache.get('extract', cache_key)
+                    if cached is not None:
+                        extracted_content = cached['extracted_text']
+                
+                if extracted_content is None:
                     try:
-                        text_content = attachment['content'].decode('utf-8', errors='ignore')
-                        if text_content.strip():
-                            extracted_data.append({
-                                'filename': attachment['filename'],
-                                'content_type': content_type,
-                                'extracted_text': text_content,
-                                'metadata': self._extract_metadata(attachment)
-                            })
-                    except:
-                        print(f"Could not extract content from {attachment['filename']}")
+                        extracted_content = self._extract_content(attachment)
+                    except Exception:
+                        # Kept without text, and not cached so the next run tries again
+                        extracted_content = ""
+                    else:
+                        if cache_key is not None:
+                            self.cache.put('extract', cache_key, {'extracted_text': extracted_content})
+                
+                if extracted_content is False:
+                    continue
+                
+                extracted_data.append({
+                    'filename': attachment['filename'],
+                    'content_type': content_type,
+                    'extracted_text': extracted_content,
+                    'metadata': self._extract_metadata(attachment)
+                })
                         
             except Exception as e:
                 print(f"Error extracting from {attachment['filename']}: {str(e)}")
+            
+            finally:
+                # Free the buffer (and any spill file) now; only len() is needed later
+                if isinstance(attachment.get('content'), AttachmentPayload):
+                    attachment['content'].release()
                 
         return extracted_data
     
-    def _extract_pdf(self, content: bytes) -> str:
-        """Extract text from PDF content"""
-        text = ""
-        pdf_file = io.BytesIO(content)
+    def _extract_content(self, attachment: Dict[str, Any]):
+        """Run the matching extractor; returns False when nothing usable was found
+
+        Extractors raise when they fail, after logging the error, so a
+        failed extraction is never cached as an empty text.
+        """
+        content_type = attachment['content_type']
+        metrics = get_metrics()
         
+        if content_type in self.extractors:
+            extractor = self.extractors[content_type]
+            name = extractor.__name__.replace('_extract_', '')
+            metrics.inc('attachments_extracted_total', extractor=name)
+            metrics.inc('attachment_bytes_total', len(attachment['content']), extractor=name)
+            with metrics.timer('extract_seconds', extractor=name):
+                return extractor(attachment['content'])
+        
+        # Try to extract as text if unknown type
+        metrics.inc('attachments_extracted_total', extractor='unknown')
         try:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+            with metrics.timer('extract_seconds', extractor='unknown'):
+                text_content = attachment['content'].decode('utf-8', errors='ignore')
+            if text_content.strip():
+                return text_content
+        except:
+            print(f"Could not extract content from {attachment['filename']}")
+        return False
+    
+    def _extract_pdf(self, content: bytes) -> str:
+        """Extract text from PDF content within the engine's page and character budget"""
+        try:
+            return self.pdf_engine.extract(content)
         except Exception as e:
             print(f"PDF extraction error: {str(e)}")
-            
-        return text.strip()
+            raise
     
     def _extract_docx(self, content: bytes) -> str:
         """Extract text from DOCX content"""
         text = ""
-        docx_file = io.BytesIO(content)
+        docx_file = open_payload(content)
         
         try:
+            import docx
             doc = docx.Document(docx_file)
             for paragraph in doc.paragraphs:
                 if paragraph.text.strip():
                     text += paragraph.text + "\n"
         except Exception as e:
             print(f"DOCX extraction error: {str(e)}")
+            raise
             
         return text.strip()
     
@@ -90,17 +143,15 @@ class DocumentExtractor:
             return content.decode('utf-8', errors='ignore').strip()
         except Exception as e:
             print(f"Text extraction error: {str(e)}")
-            return ""
+            raise
     
     def _extract_image(self, content: bytes) -> str:
         """Extract text from image using OCR"""
         try:
-            image = Image.open(io.BytesIO(content))
-            text = pytesseract.image_to_string(image)
-            return text.strip()
+            return self.ocr_engine.image_to_text(content)
         except Exception as e:
             print(f"Image OCR error: {str(e)}")
-            return ""
+            raise
     
     def _extract_metadata(self, attachment: Dict[str, Any]) -> Dict[str, Any]:
         """Extract metadata from attachment"""
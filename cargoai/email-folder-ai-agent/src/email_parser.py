@@ -1,42 +1,160 @@
-import mailparser
 import os
-from bs4 import BeautifulSoup
-import re
-from typing import Dict, List, Any
+from datetime import timezone
+from email.header import decode_header, make_header
+from email.parser import BytesParser
+from email.policy import EmailPolicy
+from email.utils import getaddresses, parsedate_to_datetime
+from typing import Dict, List, Any, Iterator, Optional, Union
+from metrics import get_metrics
+from attachment_payload import AttachmentPayload, SPILL_THRESHOLD
+from html_text import HTMLTextEngine, is_html, strip_html_tags
+from mailbox_reader import MboxIndex, MessageRef, is_maildir, iter_maildir, message_name, read_message_bytes
+
+# mail-parser is only imported for the rare messages the stdlib fast path rejects
+
+# Cap on bytes read when looking for the end of the header block
+MAX_HEADER_BYTES = 256 * 1024
+
+
+class DecodedTextPolicy(EmailPolicy):
+    """policy.default, except header values are returned as plain decoded strings
+
+    Building the structured header objects costs more than the rest of the
+    parse for typical messages, and the parser only needs text.
+    """
+    
+    def header_fetch_parse(self, name, value):
+        if hasattr(value, 'name'):
+            return str(value)
+        value = ''.join(value.splitlines())
+        if '=?' in value:
+            try:
+                return str(make_header(decode_header(value)))
+            except Exception:
+                pass
+        return value
+
+
+FAST_POLICY = DecodedTextPolicy()
+
 
 class EmailParser:
-    def __init__(self):
+    def __init__(self, spill_threshold: int = SPILL_THRESHOLD, spill_dir: str = None,
+                 html_engine: Optional[HTMLTextEngine] = None, mailbox_index_dir: Optional[str] = None):
         self.supported_formats = ['.eml', '.msg']
+        # Archives holding many messages; mbox offsets are indexed under mailbox_index_dir
+        self.mailbox_formats = ['.mbox']
+        self.mailbox_index_dir = mailbox_index_dir
+        # lxml when installed, otherwise a streaming tokenizer; input size is capped
+        self.html_engine = html_engine or HTMLTextEngine()
+        # Attachments decoding to more than this many bytes are spilled to disk
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        self._bytes_parser = BytesParser(policy=FAST_POLICY)
     
-    def parse_email_folder(self, folder_path: str) -> List[Dict[str, Any]]:
-        """Parse all emails in the specified folder"""
-        emails = []
-        
+    def iter_email_files(self, folder_path: str) -> Iterator[str]:
+        """Yield paths of supported email files in the folder without listing it up front"""
         if not os.path.exists(folder_path):
             print(f"Email folder {folder_path} does not exist. Creating it...")
             os.makedirs(folder_path, exist_ok=True)
-            return emails
+            return
         
-        for filename in os.listdir(folder_path):
-            if any(filename.endswith(fmt) for fmt in self.supported_formats):
-                email_path = os.path.join(folder_path, filename)
-                try:
-                    parsed_email = self.parse_single_email(email_path)
-                    if parsed_email:
-                        emails.append(parsed_email)
-                        print(f"✓ Successfully parsed: {filename}")
-                except Exception as e:
-                    print(f"✗ Error parsing {filename}: {str(e)}")
-                    
-        return emails
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                if any(entry.name.endswith(fmt) for fmt in self.supported_formats):
+                    yield entry.path
     
-    def parse_single_email(self, email_path: str) -> Dict[str, Any]:
-        """Parse a single email file using mail-parser"""
-        filename = os.path.basename(email_path)
+    def list_email_files(self, folder_path: str) -> List[str]:
+        """List paths of all supported email files in the folder"""
+        return list(self.iter_email_files(folder_path))
+    
+    def iter_messages(self, folder_path: str) -> Iterator[Union[str, MessageRef]]:
+        """Yield every message in the folder: email file paths, then mbox and Maildir messages
+        
+        Each mbox is indexed (or its index resumed) before its messages are
+        yielded; the messages themselves are only read when parsed.
+        """
+        yield from self.iter_email_files(folder_path)
+        
+        with os.scandir(folder_path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.name.endswith(tuple(self.mailbox_formats)):
+                    index = MboxIndex(entry.path, self.mailbox_index_dir)
+                    added = index.update()
+                    print(f"✓ Indexed {entry.name}: {len(index)} messages ({added} new)")
+                    yield from index.iter_messages()
+                elif entry.is_dir() and is_maildir(entry.path):
+                    yield from iter_maildir(entry.path)
+            except Exception as e:
+                print(f"✗ Error reading mailbox {entry.name}: {str(e)}")
+    
+    def iter_email_folder(self, folder_path: str) -> Iterator[Dict[str, Any]]:
+        """Parse emails in the folder one at a time, yielding each parsed email"""
+        for email_path in self.iter_email_files(folder_path):
+            filename = os.path.basename(email_path)
+            try:
+                parsed_email = self.parse_single_email(email_path)
+                if parsed_email:
+                    print(f"✓ Successfully parsed: {filename}")
+                    yield parsed_email
+            except Exception as e:
+                print(f"✗ Error parsing {filename}: {str(e)}")
+    
+    def parse_email_folder(self, folder_path: str) -> List[Dict[str, Any]]:
+        """Parse all emails in the specified folder"""
+        return list(self.iter_email_folder(folder_path))
+    
+    def parse_single_email(self, email_path: Union[str, MessageRef]) -> Dict[str, Any]:
+        """Parse a single email file or mailbox message, recording timing and outcome metrics"""
+        metrics = get_metrics()
+        with metrics.timer('parse_seconds'):
+            email_data = self._parse_single_email(email_path)
+        metrics.inc('emails_parsed_total', result='ok' if email_data else 'failed')
+        return email_data
+    
+    def _parse_single_email(self, email_path: Union[str, MessageRef]) -> Dict[str, Any]:
+        """Parse a single email file or mailbox message in one pass, using mail-parser only as a fallback"""
+        filename = message_name(email_path)
         
         try:
-            # Parse the email file
-            mail = mailparser.parse_from_file(email_path)
+            raw = read_message_bytes(email_path)
+        except OSError as e:
+            print(f"Error reading {filename}: {str(e)}")
+            return None
+        
+        try:
+            email_data = self._parse_fast(raw, filename)
+            get_metrics().inc('parser_path_total', path='fast')
+            return email_data
+        except Exception as e:
+            print(f"Fast parse failed for {filename}: {str(e)}; retrying with mail-parser")
+        
+        get_metrics().inc('parser_path_total', path='mailparser')
+        return self._parse_with_mailparser(raw, filename)
+    
+    def _parse_fast(self, raw: bytes, filename: str) -> Dict[str, Any]:
+        """Parse raw message bytes with the stdlib parser in a single pass"""
+        msg = self._bytes_parser.parsebytes(raw)
+        if msg.defects and not any(msg.get(name) for name in ('From', 'Subject', 'Date')):
+            # Not an RFC 5322 message (e.g. an Outlook .msg); let mail-parser try
+            raise ValueError("no readable message headers")
+        
+        email_data = self._headers_from_message(msg)
+        body, attachments = self._extract_parts(msg)
+        email_data.update({
+            'body': body,
+            'attachments': attachments,
+            'filename': filename
+        })
+        return email_data
+    
+    def _parse_with_mailparser(self, raw: bytes, filename: str) -> Dict[str, Any]:
+        """Parse raw message bytes using mail-parser"""
+        try:
+            import mailparser
+            mail = mailparser.parse_from_bytes(raw)
             
             # Extract email data with proper type handling
             email_data = {
@@ -45,6 +163,7 @@ class EmailParser:
                 'date': self._safe_get_string(mail.date),
                 'to': self._safe_get_email_list(mail.to),
                 'cc': self._safe_get_email_list(mail.cc),
+                **self._thread_headers(mail.message),
                 'body': self._extract_body(mail),
                 'attachments': self._extract_attachments(mail),
                 'filename': filename
@@ -54,8 +173,129 @@ class EmailParser:
             
         except Exception as e:
             print(f"Error parsing {filename}: {str(e)}")
-            # Try fallback method with built-in email parser
-            return self._fallback_parse(email_path)
+            return None
+    
+    def parse_headers(self, email_path: str) -> Optional[Dict[str, Any]]:
+        """Parse only the header block of an email file, for fast listings"""
+        filename = os.path.basename(email_path)
+        
+        try:
+            with open(email_path, 'rb') as f:
+                header_lines = []
+                size = 0
+                for line in f:
+                    if line in (b'\r\n', b'\n') or size > MAX_HEADER_BYTES:
+                        break
+                    header_lines.append(line)
+                    size += len(line)
+            
+            msg = self._bytes_parser.parsebytes(b''.join(header_lines), headersonly=True)
+            headers = self._headers_from_message(msg)
+            headers.update({
+                'filename': filename,
+                'size': os.path.getsize(email_path)
+            })
+            return headers
+        except Exception as e:
+            print(f"Error reading headers of {filename}: {str(e)}")
+            return None
+    
+    def iter_email_headers(self, folder_path: str) -> Iterator[Dict[str, Any]]:
+        """Yield the headers of every supported email in the folder without parsing bodies"""
+        for email_path in self.iter_email_files(folder_path):
+            headers = self.parse_headers(email_path)
+            if headers:
+                yield headers
+    
+    def _headers_from_message(self, msg) -> Dict[str, Any]:
+        """Sender, subject, date, recipients and thread headers, formatted like the mail-parser path"""
+        senders = self._get_addresses(msg, 'From')
+        return {
+            'sender': str(senders[0]) if senders else "",
+            'subject': str(msg.get('Subject', '') or ''),
+            'date': self._format_date(msg.get('Date')),
+            'to': self._safe_get_email_list(self._get_addresses(msg, 'To')),
+            'cc': self._safe_get_email_list(self._get_addresses(msg, 'Cc')),
+            **self._thread_headers(msg)
+        }
+    
+    def _thread_headers(self, msg) -> Dict[str, str]:
+        """Message-ID, In-Reply-To and References, used to group replies into threads"""
+        return {
+            'message_id': str(msg.get('Message-ID', '') or '').strip(),
+            'in_reply_to': str(msg.get('In-Reply-To', '') or '').strip(),
+            'references': ' '.join(str(msg.get('References', '') or '').split())
+        }
+    
+    def _get_addresses(self, msg, name: str) -> List[tuple]:
+        """(display name, address) pairs from the first occurrence of an address header"""
+        value = msg.get(name)
+        if value is None:
+            return []
+        return [
+            ('' if display_name == address else display_name, address)
+            for display_name, address in getaddresses([str(value)])
+            if address
+        ]
+    
+    def _format_date(self, value) -> str:
+        """Date header as a naive UTC timestamp string"""
+        if not value:
+            return ""
+        try:
+            parsed = parsedate_to_datetime(str(value))
+        except (TypeError, ValueError):
+            return ""
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return str(parsed)
+    
+    def _extract_parts(self, msg) -> tuple:
+        """Walk the MIME tree once; decode plain text first and HTML only if there is none"""
+        plain_parts, html_parts, attachments = [], [], []
+        
+        for part in msg.walk():
+            if part.is_multipart():
+                continue
+            
+            filename = part.get_filename()
+            content_type = part.get_content_type()
+            if filename or part.get_content_disposition() == 'attachment':
+                attachments.append({
+                    'filename': filename or 'unknown_attachment',
+                    'content': self._decode_part_payload(part),
+                    'content_type': content_type
+                })
+            elif content_type == 'text/plain':
+                plain_parts.append(part)
+            elif content_type == 'text/html':
+                html_parts.append(part)
+        
+        body_parts = []
+        try:
+            if plain_parts:
+                for part in plain_parts:
+                    text = self._decode_text_part(part).strip()
+                    if text:
+                        body_parts.append(text)
+            else:
+                for part in html_parts:
+                    clean_text = self._html_to_clean_text(self._decode_text_part(part))
+                    if clean_text:
+                        body_parts.append(clean_text)
+        except Exception as e:
+            print(f"Error extracting body: {str(e)}")
+            body_parts.append("Error extracting email body")
+        
+        return '\n\n'.join(body_parts).strip(), attachments
+    
+    def _decode_text_part(self, part) -> str:
+        """Decode a text part with its declared charset, falling back to UTF-8"""
+        try:
+            return part.get_content()
+        except (LookupError, UnicodeError, AssertionError):
+            payload = part.get_payload(decode=True) or b''
+            return payload.decode('utf-8', errors='ignore')
     
     def _safe_get_string(self, value) -> str:
         """Safely convert any value to string"""
@@ -133,52 +373,22 @@ class EmailParser:
     def _html_to_clean_text(self, html_content: str) -> str:
         """Convert HTML content to clean, readable text"""
         try:
-            # Use BeautifulSoup to parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text and clean it up
-            text = soup.get_text()
-            
-            # Clean up whitespace
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            return text
-            
+            return self.html_engine.to_text(html_content)
         except Exception as e:
             print(f"Error converting HTML to text: {str(e)}")
             # Fallback: remove HTML tags with regex
             return self._strip_html_tags(html_content)
     
     def _strip_html_tags(self, html_content: str) -> str:
-        """Fallback method to strip HTML tags using regex"""
+        """Fallback method to strip HTML tags using a precompiled regex"""
         try:
-            # Remove HTML tags
-            clean = re.compile('<.*?>')
-            text = re.sub(clean, '', html_content)
-            
-            # Clean up common HTML entities
-            text = text.replace('&nbsp;', ' ')
-            text = text.replace('&amp;', '&')
-            text = text.replace('&lt;', '<')
-            text = text.replace('&gt;', '>')
-            text = text.replace('&quot;', '"')
-            
-            # Clean up whitespace
-            text = ' '.join(text.split())
-            
-            return text
-        except:
+            return strip_html_tags(html_content)
+        except Exception:
             return html_content
     
     def _is_html(self, text: str) -> bool:
         """Check if text contains HTML markup"""
-        return bool(re.search(r'<[^>]+>', text))
+        return is_html(text)
     
     def _extract_attachments(self, mail) -> List[Dict[str, Any]]:
         """Extract attachments from mail-parser object"""
@@ -191,16 +401,19 @@ class EmailParser:
                         filename = attachment.get('filename', 'unknown_attachment')
                         content_type = attachment.get('mail_content_type', 'application/octet-stream')
                         
-                        # Get binary content
-                        import base64
+                        # Decode the binary content in chunks, spilling large payloads to disk
                         payload = attachment.get('payload', '')
                         if payload:
                             try:
-                                content = base64.b64decode(payload)
-                            except:
-                                content = payload.encode() if isinstance(payload, str) else payload
+                                content = AttachmentPayload.from_base64(
+                                    payload, self.spill_threshold, self.spill_dir
+                                )
+                            except Exception:
+                                content = AttachmentPayload.from_bytes(
+                                    payload.encode() if isinstance(payload, str) else payload
+                                )
                         else:
-                            content = b''
+                            content = AttachmentPayload.from_bytes(b'')
                         
                         attachments.append({
                             'filename': filename,
@@ -213,79 +426,13 @@ class EmailParser:
         
         return attachments
     
-    def _fallback_parse(self, email_path: str) -> Dict[str, Any]:
-        """Fallback parser using Python's built-in email library"""
-        import email
-        
-        try:
-            with open(email_path, 'rb') as f:
-                msg = email.message_from_bytes(f.read())
-            
-            email_data = {
-                'sender': msg.get('From', ''),
-                'subject': msg.get('Subject', ''),
-                'date': msg.get('Date', ''),
-                'to': msg.get('To', ''),
-                'cc': msg.get('Cc', ''),
-                'body': self._extract_body_builtin(msg),
-                'attachments': self._extract_attachments_builtin(msg),
-                'filename': os.path.basename(email_path)
-            }
-            
-            return email_data
-        except Exception as e:
-            print(f"Fallback parsing also failed: {str(e)}")
-            return None
-    
-    def _extract_body_builtin(self, msg) -> str:
-        """Extract email body using built-in parser"""
-        body = ""
-        
-        try:
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            body += payload.decode('utf-8', errors='ignore')
-                    elif part.get_content_type() == "text/html":
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            html_content = payload.decode('utf-8', errors='ignore')
-                            # Convert HTML to clean text
-                            clean_text = self._html_to_clean_text(html_content)
-                            body += clean_text
-            else:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    content = payload.decode('utf-8', errors='ignore')
-                    if self._is_html(content):
-                        body = self._html_to_clean_text(content)
-                    else:
-                        body = content
-        except Exception as e:
-            print(f"Error in builtin body extraction: {str(e)}")
-            body = "Error extracting email body"
-            
-        return body.strip()
-    
-    def _extract_attachments_builtin(self, msg) -> List[Dict[str, Any]]:
-        """Extract attachments using built-in parser"""
-        attachments = []
-        
-        try:
-            for part in msg.walk():
-                if part.get_content_disposition() == 'attachment':
-                    filename = part.get_filename()
-                    if filename:
-                        content = part.get_payload(decode=True)
-                        if content:
-                            attachments.append({
-                                'filename': filename,
-                                'content': content,
-                                'content_type': part.get_content_type() or 'application/octet-stream'
-                            })
-        except Exception as e:
-            print(f"Error extracting attachments (builtin): {str(e)}")
-                    
-        return attachments
+    def _decode_part_payload(self, part) -> AttachmentPayload:
+        """Decode a MIME part's payload, streaming base64 instead of decoding it in one go"""
+        if part.get('Content-Transfer-Encoding', '').strip().lower() == 'base64':
+            try:
+                return AttachmentPayload.from_base64(
+                    part.get_payload(decode=False), self.spill_threshold, self.spill_dir
+                )
+            except Exception:
+                pass
+        return AttachmentPayload.from_bytes(part.get_payload(decode=True) or b'')
@@ -0,0 +1,294 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from metrics import get_metrics
+
+# scikit-learn, scipy and numpy are imported on first use, so importing the
+# summarizer does not pay for them
+
+# Keywords and domain entities reported per email
+TOP_KEYWORDS = 10
+
+# Text per email (body plus documents) that is tokenized
+MAX_TEXT_CHARS = 200000
+
+# New terms stop being added once the vocabulary reaches this size
+MAX_VOCABULARY = 200000
+
+# Hashes of counted texts kept to skip reprocessed mail; the oldest are forgotten first
+MAX_SEEN = 200000
+
+# Seconds between writes of the corpus file, unless a save is forced
+SAVE_INTERVAL = 60.0
+
+# Words that are common in mail but say nothing about its content
+EMAIL_STOP_WORDS = frozenset((
+    'http', 'https', 'www', 'com', 'html', 'mailto', 'email', 'mail', 'sent',
+    'subject', 'dear', 'hello', 'thanks', 'thank', 'regards', 'kind', 'best',
+    'please', 'unsubscribe', 'click', 'view', 'browser'
+))
+
+_TOKEN_PATTERN = r'(?u)\b[a-zA-Z][a-zA-Z]{2,}\b'
+
+# ISO 6346 container number: owner code, category (U/J/Z), serial and check digit
+_CONTAINER_PATTERN = re.compile(r'\b([A-Z]{3}[UJZ])[ -]?(\d{6})[ -]?(\d)\b')
+# IATA air waybill: 3-digit airline prefix and 8-digit serial, after an AWB label
+_AWB_PATTERN = re.compile(
+    r'\b(?:[MH]?AWB|air\s*waybill)\s*(?:no\.?|number|#)?\s*[:#]?\s*(\d{3})[ -]?(\d{4})[ -]?(\d{4})\b',
+    re.IGNORECASE
+)
+# Bill of lading numbers are carrier-specific; require a label and a digit
+_BL_PATTERN = re.compile(
+    r'\b(?:B/?L|BOL|bill\s+of\s+lading)\s*(?:no\.?|number|#)?\s*[:#]?\s*([A-Z0-9][A-Z0-9-]{5,19})\b',
+    re.IGNORECASE
+)
+
+# Major ports by name, with their UN/LOCODE
+PORTS = {
+    'Rotterdam': 'NLRTM', 'Antwerp': 'BEANR', 'Hamburg': 'DEHAM', 'Bremerhaven': 'DEBRV',
+    'Felixstowe': 'GBFXT', 'Le Havre': 'FRLEH', 'Valencia': 'ESVLC', 'Algeciras': 'ESALG',
+    'Piraeus': 'GRPIR', 'Genoa': 'ITGOA', 'Singapore': 'SGSIN', 'Shanghai': 'CNSHA',
+    'Ningbo': 'CNNGB', 'Shenzhen': 'CNSZX', 'Qingdao': 'CNTAO', 'Hong Kong': 'HKHKG',
+    'Busan': 'KRPUS', 'Tokyo': 'JPTYO', 'Port Klang': 'MYPKG', 'Jebel Ali': 'AEJEA',
+    'Nhava Sheva': 'INNSA', 'Mundra': 'INMUN', 'Chennai': 'INMAA', 'Colombo': 'LKCMB',
+    'Los Angeles': 'USLAX', 'Long Beach': 'USLGB', 'New York': 'USNYC', 'Savannah': 'USSAV',
+    'Houston': 'USHOU', 'Vancouver': 'CAVAN', 'Santos': 'BRSSZ', 'Durban': 'ZADUR'
+}
+_PORT_BY_NAME = {name.lower(): name for name in PORTS}
+_PORT_BY_CODE = {code: name for name, code in PORTS.items()}
+_PORT_NAME_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(name) for name in sorted(PORTS, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+_PORT_CODE_PATTERN = re.compile(r'\b(' + '|'.join(sorted(_PORT_BY_CODE)) + r')\b')
+
+
+def _container_check_digit(code: str) -> int:
+    """ISO 6346 check digit of the first ten characters of a container number"""
+    total = 0
+    for position, char in enumerate(code):
+        if char.isdigit():
+            value = int(char)
+        else:
+            # A=10 upwards, skipping multiples of 11
+            value = ord(char) - ord('A') + 10
+            value += (value - 1) // 10
+        total += value << position
+    return total % 11 % 10
+
+
+def extract_domain_entities(text: str) -> Dict[str, List[str]]:
+    """Container numbers, air waybills, bills of lading and ports mentioned in text"""
+    containers = []
+    for owner, serial, check in _CONTAINER_PATTERN.findall(text):
+        if _container_check_digit(owner + serial) == int(check):
+            containers.append(f"{owner}{serial}{check}")
+
+    air_waybills = []
+    for prefix, first, second in _AWB_PATTERN.findall(text):
+        serial = first + second
+        # The last serial digit is the first seven modulo 7
+        if int(serial[:7]) % 7 == int(serial[7]):
+            air_waybills.append(f"{prefix}-{serial}")
+
+    bills_of_lading = [number.upper() for number in _BL_PATTERN.findall(text)
+                       if any(char.isdigit() for char in number)]
+
+    ports = [_PORT_BY_NAME[name.lower()] for name in _PORT_NAME_PATTERN.findall(text)]
+    ports += [_PORT_BY_CODE[code] for code in _PORT_CODE_PATTERN.findall(text)]
+
+    return {
+        'containers': _unique(containers),
+        'air_waybills': _unique(air_waybills),
+        'bills_of_lading': _unique(bills_of_lading),
+        'ports': [f"{name} ({PORTS[name]})" for name in _unique(ports)]
+    }
+
+
+def _unique(values: List[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+
+class CorpusEntityExtractor:
+    """TF-IDF keywords scored against every email seen so far, plus domain entities
+
+    The vocabulary and document frequencies grow with each batch, so a word
+    that appears in most mail ("shipment" in a freight inbox) ranks below the
+    words that set one email apart. Each batch is counted into one sparse
+    matrix and scored in a single pass. With ``state_path`` the corpus
+    statistics are kept on disk between runs, written at most every
+    ``save_interval`` seconds; texts already counted (by hash, for the last
+    ``max_seen`` texts) do not count again when an email is reprocessed.
+    """
+
+    def __init__(self, state_path: Optional[str] = None, top_k: int = TOP_KEYWORDS,
+                 max_vocabulary: int = MAX_VOCABULARY, max_seen: int = MAX_SEEN,
+                 save_interval: float = SAVE_INTERVAL):
+        self.state_path = state_path
+        self.top_k = top_k
+        self.max_vocabulary = max_vocabulary
+        self.max_seen = max(1, max_seen)
+        self.save_interval = save_interval
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.document_frequency: List[int] = []
+        self.documents = 0
+        # Insertion ordered, oldest first
+        self._seen: Dict[str, None] = {}
+        self._analyzer = None
+        self._loaded = False
+        self._dirty = False
+        self._last_save: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def extract_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Keywords and domain entities for each text, after adding the batch to the corpus
+
+        Returns one dict per text with 'keywords' (best first) and
+        'domain_entities'.
+        """
+        texts = [text[:MAX_TEXT_CHARS] for text in texts]
+        results = [{'keywords': [], 'domain_entities': extract_domain_entities(text)} for text in texts]
+
+        with get_metrics().timer('entities_seconds'):
+            try:
+                keywords = self._score_batch(texts)
+            except ImportError as e:
+                print(f"Warning: scikit-learn unavailable ({str(e)}); using word frequencies")
+                keywords = [self._frequency_keywords(text) for text in texts]
+
+        for result, words in zip(results, keywords):
+            result['keywords'] = words
+        return results
+
+    def save(self, force: bool = False):
+        """Write the corpus statistics to ``state_path`` if they changed
+
+        Within ``save_interval`` seconds of the last write nothing is written
+        unless ``force`` is set, so watch mode does not rewrite the file
+        after every batch.
+        """
+        with self._lock:
+            if not self.state_path or not self._dirty:
+                return
+            if (not force and self._last_save is not None
+                    and time.monotonic() - self._last_save < self.save_interval):
+                return
+            state = {
+                'documents': self.documents,
+                'terms': self.terms,
+                'document_frequency': self.document_frequency,
+                'seen': list(self._seen)
+            }
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+    def _score_batch(self, texts: List[str]) -> List[List[str]]:
+        """Count the batch into one sparse matrix, update the corpus and rank terms per row"""
+        import numpy as np
+        from scipy import sparse
+
+        with self._lock:
+            self._load()
+            analyzer = self._get_analyzer()
+            token_counts = [Counter(analyzer(text)) for text in texts]
+
+            # Grow the vocabulary with the new terms of documents not yet counted
+            new_rows = []
+            for text, counts in zip(texts, token_counts):
+                digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+                if digest in self._seen:
+                    continue
+                self._seen[digest] = None
+                if len(self._seen) > self.max_seen:
+                    del self._seen[next(iter(self._seen))]
+                new_rows.append(counts)
+                for term in counts:
+                    if term not in self.vocabulary and len(self.terms) < self.max_vocabulary:
+                        self.vocabulary[term] = len(self.terms)
+                        self.terms.append(term)
+                        self.document_frequency.append(0)
+
+            indptr, indices, data = [0], [], []
+            for counts in token_counts:
+                for term, count in counts.items():
+                    column = self.vocabulary.get(term)
+                    if column is not None:
+                        indices.append(column)
+                        data.append(count)
+                indptr.append(len(indices))
+            matrix = sparse.csr_matrix(
+                (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), indptr),
+                shape=(len(texts), len(self.terms))
+            )
+
+            if new_rows:
+                df = np.asarray(self.document_frequency, dtype=np.int64)
+                for counts in new_rows:
+                    columns = [self.vocabulary[term] for term in counts if term in self.vocabulary]
+                    df[columns] += 1
+                self.document_frequency = df.tolist()
+                self.documents += len(new_rows)
+                self._dirty = True
+
+            df = np.asarray(self.document_frequency, dtype=np.float32)
+            idf = np.log((1.0 + self.documents) / (1.0 + df)) + 1.0
+
+        # Sublinear term frequency times inverse document frequency, for the whole batch at once
+        matrix.data = 1.0 + np.log(matrix.data)
+        scores = matrix.multiply(idf.reshape(1, -1)).tocsr()
+
+        keywords = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            row_scores = scores.data[start:end]
+            row_terms = scores.indices[start:end]
+            # Highest score first; ties broken by term for stable output
+            order = np.lexsort((row_terms, -row_scores))[:self.top_k]
+            keywords.append([self.terms[row_terms[position]] for position in order])
+        return keywords
+
+    def _get_analyzer(self):
+        if self._analyzer is None:
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer
+            self._analyzer = CountVectorizer(
+                token_pattern=_TOKEN_PATTERN,
+                stop_words=list(ENGLISH_STOP_WORDS | EMAIL_STOP_WORDS)
+            ).build_analyzer()
+        return self._analyzer
+
+    def _load(self):
+        """Read saved corpus statistics once; an unreadable file starts a new corpus"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.terms = state['terms']
+            self.vocabulary = {term: column for column, term in enumerate(self.terms)}
+            self.document_frequency = state['document_frequency']
+            self.documents = state['documents']
+            self._seen = dict.fromkeys(state.get('seen', [])[-self.max_seen:])
+        except Exception as e:
+            print(f"Warning: could not read {self.state_path}: {str(e)}")
+
+    @staticmethod
+    def _frequency_keywords(text: str) -> List[str]:
+        """Most frequent longer words, used when scikit-learn is not installed"""
+        words = [word for word in text.lower().split()
+                 if len(word) > 3 and word.isalpha() and word not in EMAIL_STOP_WORDS]
+        return [word for word, _ in Counter(words).most_common(TOP_KEYWORDS)]
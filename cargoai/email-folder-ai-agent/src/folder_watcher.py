@@ -0,0 +1,221 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class FolderWatcher:
+    """Report email files that appear, change or disappear in a folder
+
+    Uses inotify on Linux and falls back to polling the folder with
+    ``os.scandir`` elsewhere, or where inotify does not work (some network
+    and container volume mounts; pass ``backend='poll'`` there). A file is
+    only reported once it has been quiet for ``debounce`` seconds and its
+    size and mtime matched on two checks, so a message still being copied
+    in is not parsed half-written.
+    """
+
+    def __init__(self, folder: str, extensions: List[str], debounce: float = 1.0,
+                 poll_interval: float = 2.0, backend: str = 'auto'):
+        if backend not in ('auto', 'inotify', 'poll'):
+            raise ValueError(f"Unknown watch backend: {backend}")
+        self.folder = folder
+        self.extensions = tuple(extensions)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+
+        # path -> (first event, last activity, stat at last activity)
+        self._pending: Dict[str, Tuple[float, float, Optional[tuple]]] = {}
+        self._deleted: set = set()
+        # Poll baseline: name -> (size, mtime_ns) of every email file seen
+        self._known: Dict[str, tuple] = self._scan()
+
+        self._fd = None
+        self.backend = 'poll'
+        if backend in ('auto', 'inotify'):
+            try:
+                self._fd = self._inotify_open()
+                self.backend = 'inotify'
+            except OSError as e:
+                if backend == 'inotify':
+                    raise
+                print(f"inotify unavailable ({str(e)}); polling every {poll_interval}s")
+
+    def batches(self, stop_event: Optional[threading.Event] = None,
+                idle: bool = False) -> Iterator[Tuple[Dict[str, float], List[str]]]:
+        """Yield (ready, deleted) until stop_event is set
+
+        ``ready`` maps each settled file path to the monotonic time its first
+        change was seen; ``deleted`` lists file names that were removed.
+        With ``idle`` an empty batch is yielded after every quiet wait too,
+        at least once per poll interval, so the caller can do periodic work.
+        """
+        while stop_event is None or not stop_event.is_set():
+            if self._fd is not None:
+                self._read_events(self._wait_timeout())
+            else:
+                self._poll()
+                self._sleep(stop_event, self._wait_timeout())
+
+            ready = self._collect_ready()
+            deleted = sorted(self._deleted)
+            self._deleted.clear()
+            if ready or deleted or idle:
+                yield ready, deleted
+
+    def pending_count(self) -> int:
+        """Files seen changing that have not settled yet"""
+        return len(self._pending)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _wait_timeout(self) -> float:
+        """Seconds until the next pending file could settle, capped by the poll interval"""
+        if not self._pending:
+            return self.poll_interval
+        now = time.monotonic()
+        due = min(last + self.debounce for _, last, _ in self._pending.values())
+        return max(0.05, min(self.poll_interval, due - now))
+
+    @staticmethod
+    def _sleep(stop_event: Optional[threading.Event], seconds: float):
+        if stop_event is not None:
+            stop_event.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _is_email(self, name: str) -> bool:
+        return not name.startswith('.') and name.endswith(self.extensions)
+
+    def _stat(self, path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _scan(self) -> Dict[str, tuple]:
+        """(size, mtime_ns) of every email file in the folder"""
+        found = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if self._is_email(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        found[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            pass
+        return found
+
+    def _touch(self, name: str):
+        """Record activity on a file; the debounce clock restarts"""
+        path = os.path.join(self.folder, name)
+        now = time.monotonic()
+        first = self._pending[path][0] if path in self._pending else now
+        self._pending[path] = (first, now, self._stat(path))
+        self._deleted.discard(name)
+
+    def _forget(self, name: str):
+        self._pending.pop(os.path.join(self.folder, name), None)
+        self._known.pop(name, None)
+        self._deleted.add(name)
+
+    def _poll(self):
+        """Compare the folder with the last scan"""
+        current = self._scan()
+        for name, stat in current.items():
+            if self._known.get(name) != stat:
+                self._touch(name)
+        for name in set(self._known) - set(current):
+            self._forget(name)
+        self._known = current
+
+    def _collect_ready(self) -> Dict[str, float]:
+        """Pending files that have been quiet long enough and did not change since"""
+        ready = {}
+        now = time.monotonic()
+        for path, (first, last, stat) in list(self._pending.items()):
+            if now - last < self.debounce:
+                continue
+            current = self._stat(path)
+            if current is None:
+                del self._pending[path]
+            elif current != stat:
+                # Still being written: wait another debounce period
+                self._pending[path] = (first, now, current)
+            else:
+                del self._pending[path]
+                ready[path] = first
+        return ready
+
+    def _inotify_open(self) -> int:
+        """Create an inotify descriptor watching the folder"""
+        if not hasattr(os, 'O_NONBLOCK') or not os.path.isdir(self.folder):
+            raise OSError("inotify needs Linux and an existing folder")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not supported on this platform")
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, os.fsencode(self.folder), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, "inotify_add_watch failed")
+        return fd
+
+    def _read_events(self, timeout: float):
+        """Wait up to timeout for inotify events and apply them"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; find out what changed by scanning
+                self._poll()
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                print(f"Watched folder {self.folder} went away; falling back to polling")
+                self.close()
+                self.backend = 'poll'
+                return
+            elif name and self._is_email(name):
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._forget(name)
+                else:
+                    self._touch(name)
+                    self._known[name] = self._pending[os.path.join(self.folder, name)][2]
@@ -0,0 +1,128 @@
+import re
+from html import unescape
+from html.parser import HTMLParser
+from typing import List, Optional
+
+from metrics import get_metrics
+
+# HTML beyond this many characters is dropped before conversion
+MAX_HTML_CHARS = 1000000
+
+# Characters fed to the fallback tokenizer per step
+FEED_CHUNK_CHARS = 64 * 1024
+
+# Elements whose text is never part of the readable body
+SKIP_TAGS = frozenset(('script', 'style'))
+
+# Elements that end a line of text, so neighbouring words are not glued together
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol',
+    'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'
+))
+
+_TAG_PATTERN = re.compile(r'<[^>]*>')
+_MARKUP_PATTERN = re.compile(r'<[^>]+>')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class HTMLTextEngine:
+    """HTML-to-text conversion with lxml when installed and a streaming tokenizer otherwise
+
+    Script and style content is dropped, block elements are separated by a
+    space and all whitespace is collapsed. Input is capped at
+    ``max_chars`` so a huge marketing email cannot dominate parse time.
+    """
+
+    def __init__(self, backend: str = 'auto', max_chars: int = MAX_HTML_CHARS):
+        if backend not in ('auto', 'lxml', 'tokenizer'):
+            raise ValueError(f"Unknown HTML backend: {backend}")
+        self.backend = backend
+        self.max_chars = max_chars
+        self._lxml_available: Optional[bool] = None
+
+    def to_text(self, html_content: str) -> str:
+        """Readable text of an HTML document or fragment"""
+        metrics = get_metrics()
+        if len(html_content) > self.max_chars:
+            metrics.inc('html_truncated_total')
+            html_content = html_content[:self.max_chars]
+
+        backend = self.active_backend()
+        with metrics.timer('html_to_text_seconds', backend=backend):
+            if backend == 'lxml':
+                text = self._lxml_text(html_content)
+            else:
+                text = self._tokenizer_text(html_content)
+
+        return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+    def active_backend(self) -> str:
+        """The backend in use: 'lxml' or 'tokenizer'"""
+        if self.backend != 'auto':
+            return self.backend
+        if self._lxml_available is None:
+            try:
+                import lxml.html  # noqa: F401
+                self._lxml_available = True
+            except ImportError:
+                self._lxml_available = False
+        return 'lxml' if self._lxml_available else 'tokenizer'
+
+    def _lxml_text(self, html_content: str) -> str:
+        """Parse with lxml's C parser, drop scripts and styles, and read the text"""
+        from lxml import etree
+        from lxml import html as lxml_html
+
+        try:
+            document = lxml_html.fromstring(html_content)
+        except (etree.ParserError, ValueError):
+            # Empty documents and strings with an encoding declaration
+            return self._tokenizer_text(html_content)
+        etree.strip_elements(document, *SKIP_TAGS, with_tail=False)
+        for element in document.iter(*BLOCK_TAGS):
+            element.tail = ' ' + element.tail if element.tail else ' '
+        return document.text_content()
+
+    def _tokenizer_text(self, html_content: str) -> str:
+        """Collect text with the stdlib tokenizer, fed in chunks without building a tree"""
+        collector = _TextCollector()
+        for start in range(0, len(html_content), FEED_CHUNK_CHARS):
+            collector.feed(html_content[start:start + FEED_CHUNK_CHARS])
+        collector.close()
+        return ''.join(collector.parts)
+
+
+class _TextCollector(HTMLParser):
+    """HTMLParser that keeps text outside script and style elements"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def strip_html_tags(html_content: str) -> str:
+    """Remove tags with a regex and decode entities; the last-resort converter"""
+    return ' '.join(unescape(_TAG_PATTERN.sub('', html_content)).split())
+
+
+def is_html(text: str) -> bool:
+    """Check if text contains HTML markup"""
+    return bool(_MARKUP_PATTERN.search(text))
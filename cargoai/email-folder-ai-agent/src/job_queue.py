@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ProcessingJobQueue:
+    """Run email processing jobs on one long-lived background worker
+
+    Jobs are submitted per (email_folder, output_folder) pair and executed
+    in order by a single worker thread, which keeps its agents, and with
+    them the loaded models, alive between jobs. Submitting a folder that
+    already has a queued job returns that job instead of queueing a second
+    one; a folder whose job is already running gets one follow-up job, so
+    mail that arrived after the run scanned the folder is still processed.
+    The running agent counts the mail of queued jobs in its decoding backlog.
+    """
+
+    def __init__(self, agent_factory: Callable[[str, str], Any], max_finished: int = 100):
+        self.agent_factory = agent_factory
+        self.max_finished = max_finished
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._queued_by_folder: Dict[tuple, str] = {}
+        self._agents: Dict[tuple, Any] = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name='email-processing-worker', daemon=True)
+        self._worker.start()
+
+    def submit(self, email_folder: str, output_folder: str,
+               options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Queue a processing job and return a snapshot of it
+
+        The snapshot's ``deduplicated`` flag is set when a queued job for
+        the same folder was returned instead of a new one.
+        """
+        folder_key = (email_folder, output_folder)
+        options = dict(options or {})
+
+        with self._lock:
+            queued_id = self._queued_by_folder.get(folder_key)
+            if queued_id is not None:
+                queued_options = self.jobs[queued_id]['options']
+                # A full run covers an incremental one, not the other way round
+                queued_options['incremental'] = (queued_options.get('incremental', False)
+                                                 and options.get('incremental', False))
+                return dict(self._snapshot(queued_id), deduplicated=True)
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'email_folder': email_folder,
+                'output_folder': output_folder,
+                'options': options,
+                'progress': {'total': None, 'stage': None, 'seen': 0, 'parsed': 0, 'processed': 0, 'failed': 0},
+                'processed_count': None,
+                'error': None,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self._queued_by_folder[folder_key] = job_id
+            self._prune_finished()
+
+        self._queue.put(job_id)
+        return dict(self._snapshot(job_id), deduplicated=False)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of a job, or None if it is unknown"""
+        with self._lock:
+            if job_id not in self.jobs:
+                return None
+            return self._snapshot(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Return snapshots of all known jobs, newest first"""
+        with self._lock:
+            snapshots = [self._snapshot(job_id) for job_id in self.jobs]
+        return sorted(snapshots, key=lambda job: job['submitted_at'], reverse=True)
+
+    def queue_depth(self) -> int:
+        """Number of jobs waiting to start"""
+        return self._queue.qsize()
+
+    def queued_emails(self) -> int:
+        """Rough count of the emails waiting in queued jobs: the files in their email folders"""
+        with self._lock:
+            folders = [job['email_folder'] for job in self.jobs.values() if job['status'] == 'queued']
+        count = 0
+        for folder in folders:
+            try:
+                with os.scandir(folder) as it:
+                    count += sum(1 for entry in it if entry.is_file())
+            except OSError:
+                continue
+        return count
+
+    def _snapshot(self, job_id: str) -> Dict[str, Any]:
+        job = self.jobs[job_id]
+        return dict(job, progress=dict(job['progress']), options=dict(job['options']))
+
+    def _prune_finished(self):
+        """Forget the oldest finished jobs beyond max_finished"""
+        finished = [job for job in self.jobs.values() if job['status'] in ('completed', 'failed')]
+        if len(finished) <= self.max_finished:
+            return
+        finished.sort(key=lambda job: job['finished_at'])
+        for job in finished[:len(finished) - self.max_finished]:
+            del self.jobs[job['job_id']]
+
+    def _get_agent(self, email_folder: str, output_folder: str):
+        """Reuse one agent per folder pair so models stay loaded between jobs"""
+        folder_key = (email_folder, output_folder)
+        if folder_key not in self._agents:
+            self._agents[folder_key] = self.agent_factory(email_folder, output_folder)
+        return self._agents[folder_key]
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self.jobs[job_id]
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                folder_key = (job['email_folder'], job['output_folder'])
+                # Later submits for this folder queue a follow-up job
+                del self._queued_by_folder[folder_key]
+            try:
+                agent = self._get_agent(*folder_key)
+                agent.progress_callback = lambda counts: self._update_progress(job_id, counts)
+                agent.backlog_source = self.queued_emails
+                try:
+                    results = agent.process_all_emails(**job['options'])
+                finally:
+                    agent.progress_callback = None
+                    agent.backlog_source = None
+
+                with self._lock:
+                    job['status'] = 'completed'
+                    job['processed_count'] = len(results)
+
+            except Exception as e:
+                traceback.print_exc()
+                with self._lock:
+                    job['status'] = 'failed'
+                    job['error'] = str(e)
+
+            finally:
+                with self._lock:
+                    job['finished_at'] = time.time()
+                self._queue.task_done()
+
+    def _update_progress(self, job_id: str, counts: Dict[str, Any]):
+        with self._lock:
+            if job_id in self.jobs:
+                self.jobs[job_id]['progress'].update(counts)
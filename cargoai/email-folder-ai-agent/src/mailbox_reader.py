@@ -0,0 +1,238 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+from array import array
+from typing import Iterator, NamedTuple, Optional, Union
+
+from metrics import get_metrics
+
+# Index progress is saved after every this many scanned bytes, so an
+# interrupted scan of a large archive resumes close to where it stopped
+CHECKPOINT_BYTES = 64 * 1024 * 1024
+
+# Bytes hashed at the start and at the indexed end to recognise a rewritten mbox
+IDENTITY_BYTES = 4096
+
+_FROM_SEPARATOR = b'\nFrom '
+_ESCAPED_FROM = re.compile(rb'^>(>*From )', re.MULTILINE)
+
+
+class MessageRef(NamedTuple):
+    """One message inside a mailbox: a byte range of a file and the name it is reported under
+
+    ``end=None`` means the whole file (Maildir messages are one file each).
+    Refs are small and picklable, so they can be handed to worker processes.
+    """
+    path: str
+    filename: str
+    start: int = 0
+    end: Optional[int] = None
+    # mbox bodies escape lines starting with 'From ' as '>From '
+    unescape_from: bool = False
+
+
+def message_name(source: Union[str, MessageRef]) -> str:
+    """The filename a message is reported under"""
+    if isinstance(source, MessageRef):
+        return source.filename
+    return os.path.basename(source)
+
+
+def read_message_bytes(source: Union[str, MessageRef]) -> bytes:
+    """Raw bytes of a message file or of one message in a mailbox"""
+    if not isinstance(source, MessageRef):
+        with open(source, 'rb') as f:
+            return f.read()
+
+    with open(source.path, 'rb') as f:
+        f.seek(source.start)
+        raw = f.read() if source.end is None else f.read(source.end - source.start)
+    if source.unescape_from and b'>From ' in raw:
+        raw = _ESCAPED_FROM.sub(rb'\1', raw)
+    return raw
+
+
+def is_maildir(path: str) -> bool:
+    """True for a directory with the cur/, new/ and tmp/ subfolders of a Maildir"""
+    return all(os.path.isdir(os.path.join(path, sub)) for sub in ('cur', 'new', 'tmp'))
+
+
+def iter_maildir(path: str) -> Iterator[MessageRef]:
+    """Messages in a Maildir's new/ and cur/ folders, in name order
+
+    Messages are named by their unique Maildir name without the ':2,' flags,
+    so marking a message read does not make it a new email.
+    """
+    prefix = os.path.basename(os.path.normpath(path))
+    for sub in ('new', 'cur'):
+        folder = os.path.join(path, sub)
+        for name in sorted(os.listdir(folder)):
+            if name.startswith('.'):
+                continue
+            key = name.split(':2,', 1)[0].split('!2,', 1)[0]
+            yield MessageRef(os.path.join(folder, name), f"{prefix}#{key}")
+
+
+class MboxIndex:
+    """Persistent byte-offset index of the messages in an mbox file
+
+    The file is memory-mapped and scanned for 'From ' separator lines at C
+    speed; message start offsets are appended to ``<name>.offsets`` and the
+    indexed size plus a fingerprint of the file go to ``<name>.json``. When
+    the mbox grows, indexing resumes at the last indexed message (which
+    may have been incomplete); when it was rewritten, it starts over.
+    Without ``index_dir`` the index is kept in memory only.
+    """
+
+    def __init__(self, mbox_path: str, index_dir: Optional[str] = None):
+        self.mbox_path = mbox_path
+        self.name = os.path.basename(mbox_path)
+        self.offsets = array('Q')
+        self.indexed_size = 0
+        self.identity = {}
+        self._saved_count = 0
+
+        self._offsets_path = None
+        self._state_path = None
+        if index_dir:
+            digest = hashlib.sha1(os.path.abspath(mbox_path).encode('utf-8')).hexdigest()[:12]
+            base = os.path.join(index_dir, f"{self.name}-{digest}")
+            self._offsets_path = base + '.offsets'
+            self._state_path = base + '.json'
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def update(self) -> int:
+        """Index messages added since the last update; returns how many were added"""
+        if os.path.getsize(self.mbox_path) == 0:
+            self._reset()
+            return 0
+
+        with open(self.mbox_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Bytes appended after mapping are picked up by the next update
+            size = len(mm)
+            if not self._still_valid(mm, size):
+                if self.offsets:
+                    print(f"{self.name} was rewritten; rebuilding its index")
+                self._reset()
+            elif self.indexed_size == size:
+                return 0
+
+            before = len(self.offsets)
+            if self.offsets:
+                # The last message may have been cut off by a concurrent append
+                position = self.offsets.pop()
+            else:
+                position = 0 if mm[:5] == b'From ' else mm.find(_FROM_SEPARATOR)
+                if position < 0:
+                    return 0
+                if position > 0:
+                    position += 1
+
+            with get_metrics().timer('mbox_index_seconds'):
+                checkpoint = position + CHECKPOINT_BYTES
+                while position >= 0:
+                    self.offsets.append(position)
+                    found = mm.find(_FROM_SEPARATOR, position)
+                    position = found + 1 if found >= 0 else -1
+                    if position > checkpoint:
+                        self._checkpoint(mm, position)
+                        checkpoint = position + CHECKPOINT_BYTES
+
+            self._checkpoint(mm, size)
+            added = len(self.offsets) - before
+            get_metrics().inc('mbox_messages_indexed_total', max(0, added))
+            return max(0, added)
+
+    def message(self, number: int) -> MessageRef:
+        """Ref to message ``number`` (0-based), without its 'From ' envelope line"""
+        return next(self.iter_messages(number, number + 1))
+
+    def iter_messages(self, start: int = 0, stop: Optional[int] = None) -> Iterator[MessageRef]:
+        """Refs to the indexed messages from ``start`` up to ``stop``"""
+        stop = len(self.offsets) if stop is None else min(stop, len(self.offsets))
+        if start >= stop:
+            return
+        with open(self.mbox_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for number in range(start, stop):
+                begin = self.offsets[number]
+                end = self.offsets[number + 1] - 1 if number + 1 < len(self.offsets) else self.indexed_size
+                envelope_end = mm.find(b'\n', begin, end)
+                body_start = envelope_end + 1 if envelope_end >= 0 else end
+                yield MessageRef(self.mbox_path, f"{self.name}#{number + 1}", body_start, end,
+                                 unescape_from=True)
+
+    def _identity(self, mm: mmap.mmap, size: int) -> dict:
+        """Hashes of the first bytes and of the bytes before ``size``"""
+        return {
+            'head': hashlib.sha1(mm[:min(IDENTITY_BYTES, size)]).hexdigest(),
+            'tail': hashlib.sha1(mm[max(0, size - IDENTITY_BYTES):size]).hexdigest()
+        }
+
+    def _still_valid(self, mm: mmap.mmap, size: int) -> bool:
+        """True if the indexed part of the file is unchanged"""
+        if not self.offsets:
+            return True
+        if size < self.indexed_size:
+            return False
+        return self._identity(mm, self.indexed_size) == self.identity
+
+    def _reset(self):
+        self.offsets = array('Q')
+        self.indexed_size = 0
+        self.identity = {}
+        self._saved_count = 0
+        if self._offsets_path and os.path.exists(self._offsets_path):
+            os.remove(self._offsets_path)
+
+    def _checkpoint(self, mm: mmap.mmap, indexed_size: int):
+        """Record progress: offsets first, then the state that makes them valid"""
+        self.indexed_size = indexed_size
+        self.identity = self._identity(mm, indexed_size)
+        if not self._state_path:
+            return
+
+        os.makedirs(os.path.dirname(self._state_path), exist_ok=True)
+        with open(self._offsets_path, 'ab') as f:
+            # Drop offsets past the saved count, written by an interrupted checkpoint
+            saved = f.tell() // self.offsets.itemsize
+            saved = min(saved, self._saved_count)
+            f.truncate(saved * self.offsets.itemsize)
+            self.offsets[saved:].tofile(f)
+
+        state = {
+            'version': 1,
+            'mbox_path': os.path.abspath(self.mbox_path),
+            'count': len(self.offsets),
+            'indexed_size': indexed_size,
+            'identity': self.identity
+        }
+        tmp_path = self._state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path)
+        self._saved_count = len(self.offsets)
+
+    def _load(self):
+        """Read a saved index; a missing or unreadable one means starting from scratch"""
+        if not os.path.exists(self._state_path):
+            return
+        try:
+            with open(self._state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            offsets = array('Q')
+            with open(self._offsets_path, 'rb') as f:
+                offsets.fromfile(f, state['count'])
+        except Exception as e:
+            print(f"Warning: could not read mbox index {self._state_path}: {str(e)}")
+            return
+        self.offsets = offsets
+        self.indexed_size = state['indexed_size']
+        self.identity = state['identity']
+        self._saved_count = state['count']
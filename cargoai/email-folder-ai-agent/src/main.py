@@ -1,86 +1,672 @@
 import os
 import json
-from typing import List, Dict, Any
+import textwrap
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from email_parser import EmailParser
 from document_extractor import DocumentExtractor
 from summarizer import EmailSummarizer
+from decoding_policy import DecodingPolicy
+from entity_extractor import CorpusEntityExtractor
+from summary_cache import SummaryCache
+from manifest import ProcessingManifest
+from folder_watcher import FolderWatcher
+from mailbox_reader import message_name, read_message_bytes
+from semantic_index import SemanticIndex
+from results_store import ResultsStore
+from summary_export import SummaryExporter, parse_since
+from metrics import get_metrics
+from worker_pool import WorkerPool, init_pipeline_worker, parse_and_extract, parse_and_extract_worker
 
 class EmailProcessingAgent:
-    def __init__(self, email_folder: str, output_folder: str):
+    def __init__(self, email_folder: str, output_folder: str, use_cache: bool = True,
+                 workers: int = 1, chunksize: int = 4, profile: bool = False,
+                 semantic_index: bool = True, inference_backend: Optional[str] = None,
+                 threads: Optional[int] = None, latency_budget: Optional[float] = None,
+                 run_budget: Optional[float] = None):
         self.email_folder = email_folder
         self.output_folder = output_folder
-        self.email_parser = EmailParser()
-        self.document_extractor = DocumentExtractor()
-        self.summarizer = EmailSummarizer()
+        
+        # Write a per-run JSON profile of stage timings and counters to the output folder
+        self.profile = profile
+        
+        # Optional callable receiving per-email progress counts during a run
+        self.progress_callback = None
+        
+        # Optional callable returning how many emails wait outside the current run
+        # (queued jobs, files still settling); they count towards the decoding backlog
+        self.backlog_source = None
         
         # Ensure output folder exists
         os.makedirs(output_folder, exist_ok=True)
+        
+        # Persistent cache so unchanged mail skips parsing, OCR and summarization
+        self.cache = None
+        if use_cache:
+            self.cache = SummaryCache(os.path.join(output_folder, 'cache', 'summary_cache.sqlite3'))
+        
+        # Indexed, per-email copy of the results that the web API pages through
+        self.results_store = ResultsStore.for_output_folder(output_folder)
+        
+        # mbox byte-offset indexes persist here so re-runs resume instead of rescanning
+        self.email_parser = EmailParser(mailbox_index_dir=os.path.join(output_folder, 'cache', 'mailbox'))
+        
+        # Parsing and attachment extraction are CPU-bound; workers=0 uses every core
+        self.worker_pool = WorkerPool(
+            workers=workers,
+            chunksize=chunksize,
+            initializer=init_pipeline_worker,
+            initargs=(self.cache.cache_path if self.cache is not None else None,)
+        )
+        # Large PDFs extracted in this process split their pages over the same pool
+        self.document_extractor = DocumentExtractor(cache=self.cache, pool=self.worker_pool)
+        # Keyword document frequencies accumulate across runs next to the cache;
+        # threads sets the CPU threads one generate call uses, latency_budget
+        # the seconds one call may take before decoding gets cheaper and
+        # run_budget the seconds a whole run may take
+        self.summarizer = EmailSummarizer(
+            entity_extractor=CorpusEntityExtractor(os.path.join(output_folder, 'cache', 'keyword_corpus.json')),
+            inference_backend=inference_backend,
+            intra_op_threads=threads,
+            decoding_policy=DecodingPolicy(latency_budget=latency_budget, run_budget=run_budget)
+        )
+        
+        # Embeddings of summaries and document chunks, backing /api/search
+        self.semantic_index = None
+        if semantic_index:
+            self.semantic_index = SemanticIndex(
+                os.path.join(output_folder, 'index'), self.summarizer.embedding_model_name
+            )
     
-    def process_all_emails(self) -> List[Dict[str, Any]]:
-        """Process all emails in the folder and generate summaries"""
+    def process_all_emails(self, incremental: bool = False, streaming: bool = False,
+                           window: int = 8) -> List[Dict[str, Any]]:
+        """Process all emails in the folder and generate summaries
+        
+        With ``incremental=True`` only new or modified emails are processed
+        and the results are merged into the existing aggregate file.
+        With ``streaming=True`` emails are handled ``window`` at a time and the
+        aggregate file is written as results arrive; the returned list then
+        only holds filenames and output files, not the summaries.
+        """
         print("Starting email processing...")
         
-        # Parse all emails
-        emails = self.email_parser.parse_email_folder(self.email_folder)
-        print(f"Found {len(emails)} emails to process")
+        metrics = get_metrics()
+        before = metrics.snapshot()
+        mode = 'incremental' if incremental else 'streaming' if streaming else 'full'
+        start = time.perf_counter()
+        
+        with metrics.timer('run_seconds', mode=mode):
+            if incremental:
+                results = self._process_incremental()
+            elif streaming:
+                results = self._process_streaming(window)
+            else:
+                email_paths = list(self.email_parser.iter_messages(self.email_folder))
+                print(f"Found {len(email_paths)} emails to process")
+                
+                results = self._process_paths(email_paths)
+                self._save_results(results)
+                self._prune_results([result['email_filename'] for result in results])
+                
+                print(f"Processing complete! Results saved to {self.output_folder}")
+        
+        if self.profile:
+            self._write_profile(mode, time.perf_counter() - start, len(results),
+                                metrics.diff(before, metrics.snapshot()))
+        return results
+    
+    def _write_profile(self, mode: str, seconds: float, email_count: int, profile: Dict[str, Any]):
+        """Save the metrics recorded during one run as output/profile_<time>.json"""
+        profile_path = os.path.join(
+            self.output_folder, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+        )
+        profile = dict(profile, mode=mode, run_seconds=round(seconds, 3), emails=email_count,
+                       workers=self.worker_pool.workers)
+        try:
+            with open(profile_path, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, indent=2)
+            print(f"Run profile saved to {profile_path}")
+        except Exception as e:
+            print(f"✗ Error writing run profile: {str(e)}")
+    
+    def _process_streaming(self, window: int) -> List[Dict[str, Any]]:
+        """Stream the folder through the pipeline with bounded memory"""
+        email_paths = self.email_parser.iter_messages(self.email_folder)
+        results_path = os.path.join(self.output_folder, 'processing_results.json')
+        tmp_path = results_path + '.tmp'
+        processed_index = []
+        
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for result in self.iter_processed_emails(email_paths, window=max(1, window)):
+                # Same layout as json.dump(results, indent=2), one item at a time
+                with get_metrics().timer('json_write_seconds', kind='aggregate'):
+                    item = json.dumps(result, indent=2, ensure_ascii=False)
+                    f.write((',\n' if processed_index else '\n') + textwrap.indent(item, '  '))
+                processed_index.append({
+                    'email_filename': result['email_filename'],
+                    'output_file': result['output_file']
+                })
+            f.write('\n]' if processed_index else ']')
+        os.replace(tmp_path, results_path)
+        self._prune_results([item['email_filename'] for item in processed_index])
+        
+        print(f"Processing complete! {len(processed_index)} emails streamed to {self.output_folder}")
+        return processed_index
+    
+    def _process_incremental(self) -> List[Dict[str, Any]]:
+        """Process only email files that changed since the last run, using the manifest
+        
+        mbox and Maildir archives are not tracked by the manifest; full and
+        streaming runs cover them, with unchanged messages served from the cache.
+        """
+        os.makedirs(self.email_folder, exist_ok=True)
+        manifest = ProcessingManifest(os.path.join(self.output_folder, 'manifest.json'))
         
-        processed_results = []
+        changed, removed = manifest.scan(self.email_folder, self.email_parser.supported_formats)
+        print(f"Found {len(changed)} new or modified emails, {len(removed)} removed")
         
-        for i, email_data in enumerate(emails, 1):
-            print(f"Processing email {i}/{len(emails)}: {email_data['filename']}")
+        new_results = self._apply_changes(manifest, changed, removed)
+        
+        # Merge into the aggregate: drop stale and removed entries, append fresh ones
+        replaced = set(removed) | {result['email_filename'] for result in new_results}
+        merged = [
+            result for result in self._load_results()
+            if result.get('email_filename') not in replaced
+        ]
+        merged.extend(new_results)
+        
+        self._save_results(merged)
+        manifest.save()
+        
+        print(f"Processing complete! {len(new_results)} updated, {len(merged)} total in {self.output_folder}")
+        return merged
+    
+    def _apply_changes(self, manifest: ProcessingManifest, changed: List[str],
+                       removed: List[str]) -> List[Dict[str, Any]]:
+        """Process changed emails and drop removed ones from the outputs, store and index
+        
+        The manifest is updated in memory for the caller to save. Returns the
+        new results; the aggregate results file is left to the caller too.
+        """
+        # Delete outputs that belong to emails no longer in the folder
+        if removed and self.semantic_index is not None:
+            self.semantic_index.remove(removed)
+        self.results_store.remove(removed)
+        for filename in removed:
+            output_file = manifest.remove(filename).get('output_file')
+            if output_file:
+                output_path = os.path.join(self.output_folder, output_file)
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                    print(f"✓ Removed output for deleted email: {filename}")
+        
+        new_results = self._process_paths(changed)
+        for result in new_results:
+            manifest.record(
+                os.path.join(self.email_folder, result['email_filename']),
+                result['output_file']
+            )
+        return new_results
+    
+    def watch(self, debounce: float = 1.0, poll_interval: float = 2.0, backend: str = 'auto',
+              stop_event: Optional[threading.Event] = None, results_interval: float = 60.0):
+        """Process emails as they arrive in the folder until interrupted or stop_event is set
+        
+        Models are loaded once before watching starts and stay loaded, and
+        mail that arrived while nothing was watching is caught up with an
+        incremental run. After that each settled batch of new, modified or
+        deleted files goes through the incremental path on its own, as a
+        run of its own. The manifest is re-read for every batch, so runs
+        started from the web app in between are not overwritten. Files still
+        settling count towards the backlog the decoding policy downgrades on.
+        
+        Each batch's results go to the results store as they are written;
+        processing_results.json is rebuilt from the store at most every
+        ``results_interval`` seconds and when watching stops, instead of
+        after every batch.
+        """
+        os.makedirs(self.email_folder, exist_ok=True)
+        # Start watching before the catch-up run so nothing arriving during it is missed
+        watcher = FolderWatcher(self.email_folder, self.email_parser.supported_formats,
+                                debounce=debounce, poll_interval=poll_interval, backend=backend)
+        metrics = get_metrics()
+        self.backlog_source = watcher.pending_count
+        results_dirty = False
+        results_saved = time.monotonic()
+        
+        try:
+            self.summarizer.registry.preload(self.summarizer.model_name, self.summarizer.embedding_model_name,
+                                             self.summarizer.inference_backend)
+            self.process_all_emails(incremental=True)
+            manifest = ProcessingManifest(os.path.join(self.output_folder, 'manifest.json'))
             
-            try:
-                # Extract content from attachments
-                extracted_docs = self.document_extractor.extract_from_attachments(
-                    email_data['attachments']
-                )
+            print(f"Watching {self.email_folder} for new emails ({watcher.backend}); press Ctrl+C to stop")
+            for ready, deleted in watcher.batches(stop_event, idle=True):
+                if results_dirty and time.monotonic() - results_saved >= results_interval:
+                    self._save_results_from_store()
+                    results_dirty = False
+                    results_saved = time.monotonic()
+                if not ready and not deleted:
+                    continue
+                
+                # Other runs may have updated the manifest since the last batch
+                manifest.load()
+                # Files re-saved with identical content are not processed again
+                changed = sorted(path for path in ready if not manifest.is_current(path))
+                removed = [name for name in deleted if name in manifest.entries]
+                if not changed and not removed:
+                    continue
+                
+                print(f"Detected {len(changed)} new or modified emails, {len(removed)} removed")
+                with metrics.timer('run_seconds', mode='watch'):
+                    new_results = self._apply_changes(manifest, changed, removed)
+                    manifest.save()
+                results_dirty = True
                 
-                # Generate comprehensive summary
-                summary = self.summarizer.generate_comprehensive_summary(
-                    email_data, extracted_docs
-                )
+                # Arrival-to-summary latency, from the first filesystem event for the file
+                done = time.monotonic()
+                for result in new_results:
+                    arrived = ready.get(os.path.join(self.email_folder, result['email_filename']))
+                    if arrived is not None:
+                        metrics.observe('watch_latency_seconds', done - arrived)
+                metrics.inc('watch_batches_total')
+        except KeyboardInterrupt:
+            print("Stopping watcher")
+        finally:
+            self.backlog_source = None
+            watcher.close()
+            if results_dirty:
+                self._save_results_from_store()
+    
+    def _process_paths(self, email_paths: List[str]) -> List[Dict[str, Any]]:
+        """Parse, extract, summarize and write the given email files"""
+        return list(self.iter_processed_emails(email_paths))
+    
+    def iter_processed_emails(self, email_paths: Iterable[str],
+                              window: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield one result per email, parsing and summarizing ``window`` emails at a time
+        
+        Each window is parsed, extracted, summarized in one batch, written and
+        released before the next one is read, so memory is bounded by the
+        window size. ``window=None`` batches the whole run together. Parsing
+        and extraction of a window are spread over the worker pool.
+        
+        Before each window is summarized the decoding policy learns how many
+        emails are left in the run and waiting behind it, so a backed-up
+        queue or a tight run budget makes decoding cheaper.
+        """
+        total = len(email_paths) if hasattr(email_paths, '__len__') else '?'
+        self.summarizer.decoding_policy.start_run(total if total != '?' else None)
+        count = 0
+        parsed_count = 0
+        processed = 0
+        # Progress goes out per email at every stage, not once per window:
+        # a full run is a single window
+        self._report_progress(total=total if total != '?' else None, stage='reading', seen=0,
+                              parsed=0, processed=0, failed=0)
+        
+        for chunk in self._chunked(email_paths, window):
+            entries = []   # [filename, summary, cache_key] in folder order
+            pending = []   # (entry index, email_data, extracted_docs) still to summarize
+            misses = []    # (entry index, email_path) that need parsing
+            
+            for email_path in chunk:
+                count += 1
+                filename = message_name(email_path)
+                print(f"Processing email {count}/{total}: {filename}")
+                self._report_progress(stage='reading', seen=count)
                 
+                try:
+                    # Unchanged mail costs one hash plus one lookup
+                    cache_key = self._summary_cache_key(email_path)
+                    if cache_key is not None:
+                        cached_summary = self.cache.get('summary', cache_key)
+                        if cached_summary is not None:
+                            cached_summary['email_metadata']['filename'] = filename
+                            entries.append([filename, cached_summary, None])
+                            continue
+                    
+                    misses.append((len(entries), email_path))
+                    entries.append([filename, None, cache_key])
+                    
+                except Exception as e:
+                    print(f"✗ Error processing {filename}: {str(e)}")
+                    import traceback
+                    traceback.print_exc()
+                    continue
+            
+            parsed = self._parse_and_extract_all([email_path for _, email_path in misses])
+            for (index, _), result in zip(misses, parsed):
+                if result is not None:
+                    pending.append((index, result[0], result[1]))
+                parsed_count += 1
+                self._report_progress(stage='parsing', parsed=parsed_count)
+            
+            # Emails that failed to parse have no summary and are skipped
+            self._update_backlog(len(pending) + (total - count if total != '?' else 0))
+            self._report_progress(stage='summarizing')
+            for result in self._finish_window(entries, pending):
+                processed += 1
+                self._report_progress(stage='writing', processed=processed)
+                yield result
+            
+            self._report_progress(seen=count, processed=processed, failed=count - processed)
+        
+        try:
+            self.summarizer.entity_extractor.save()
+        except Exception as e:
+            print(f"Warning: could not save keyword corpus: {str(e)}")
+        
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    
+    def _update_backlog(self, run_remaining: int):
+        """Tell the decoding policy how many emails are left in this run and waiting after it
+        
+        Only the waiting emails count as backlog; the run's own emails only
+        share out the run budget, so a large run alone keeps full quality.
+        """
+        policy = self.summarizer.decoding_policy
+        policy.set_run_remaining(run_remaining)
+        waiting = 0
+        if self.backlog_source is not None:
+            try:
+                waiting = self.backlog_source()
+            except Exception as e:
+                print(f"Warning: could not read the backlog: {str(e)}")
+        # Mail piling up faster than it is summarized switches to cheaper decoding
+        policy.set_backlog(waiting)
+    
+    def _parse_and_extract_all(self, email_paths: List[str]) -> Iterator[Optional[tuple]]:
+        """Parse and extract emails in order, in the worker pool when one is configured
+        
+        Results are yielded as they are ready, so progress can be reported per email.
+        """
+        if self.worker_pool.workers > 1 and len(email_paths) > 1:
+            return self.worker_pool.imap(parse_and_extract_worker, email_paths)
+        return (
+            parse_and_extract(self.email_parser, self.document_extractor, email_path)
+            for email_path in email_paths
+        )
+    
+    @staticmethod
+    def _chunked(items: Iterable[str], size: Optional[int]) -> Iterator[List[str]]:
+        """Split an iterable into lists of ``size`` items; None means one list"""
+        if not size:
+            yield list(items)
+            return
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def _finish_window(self, entries: List[list], pending: List[tuple]) -> Iterator[Dict[str, Any]]:
+        """Summarize the pending emails of a window, then write and yield every entry"""
+        # Summarize every email and attachment of the window in batched passes
+        summaries = self.summarizer.generate_comprehensive_summaries(
+            [(email_data, extracted_docs) for _, email_data, extracted_docs in pending]
+        )
+        for (index, _, _), summary in zip(pending, summaries):
+            entries[index][1] = summary
+        self._index_window(entries, {index: extracted_docs for index, _, extracted_docs in pending})
+        pending.clear()
+        
+        for filename, summary, cache_key in entries:
+            if summary is None:
+                continue
+            try:
                 # Save individual summary
-                output_filename = f"summary_{email_data['filename']}.json"
+                output_filename = f"summary_{filename}.json"
                 output_path = os.path.join(self.output_folder, output_filename)
                 
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(summary, f, indent=2, ensure_ascii=False)
+                with get_metrics().timer('json_write_seconds', kind='summary'):
+                    with open(output_path, 'w', encoding='utf-8') as f:
+                        json.dump(summary, f, indent=2, ensure_ascii=False)
+                
+                # The key names the configured model; summaries made without it are
+                # not cached, so they are redone once the model loads
+                if cache_key is not None and self.summarizer.model_ready:
+                    self.cache.put('summary', cache_key, summary)
                 
-                processed_results.append({
-                    'email_filename': email_data['filename'],
+                self.results_store.put({
+                    'email_filename': filename,
                     'summary': summary,
                     'output_file': output_filename
                 })
                 
-                print(f"✓ Processed: {email_data['filename']}")
+                get_metrics().inc('emails_processed_total')
+                print(f"✓ Processed: {filename}")
                 
             except Exception as e:
-                print(f"✗ Error processing {email_data['filename']}: {str(e)}")
+                print(f"✗ Error processing {filename}: {str(e)}")
                 import traceback
                 traceback.print_exc()
                 continue
+            
+            yield {
+                'email_filename': filename,
+                'summary': summary,
+                'output_file': output_filename
+            }
         
-        # Save comprehensive results
-        results_path = os.path.join(self.output_folder, 'processing_results.json')
-        with open(results_path, 'w', encoding='utf-8') as f:
-            json.dump(processed_results, f, indent=2, ensure_ascii=False)
+        entries.clear()
+    
+    def _index_window(self, entries: List[list], docs_by_entry: Dict[int, List[Dict[str, Any]]]):
+        """Embed the new or changed summaries of a window in one batch and add them to the index"""
+        if self.semantic_index is None:
+            return
+        try:
+            records = []
+            for index, (filename, summary, _) in enumerate(entries):
+                if summary is None:
+                    continue
+                fingerprint = self.semantic_index.fingerprint(summary)
+                if self.semantic_index.has(filename, fingerprint):
+                    continue
+                records.extend(self.semantic_index.build_records(
+                    filename, summary, fingerprint, docs_by_entry.get(index)
+                ))
+            if not records:
+                return
+            
+            vectors = self.summarizer.embed_texts([record['text'] for record in records])
+            if vectors is not None:
+                self.semantic_index.add(records, vectors)
+        except Exception as e:
+            print(f"✗ Error updating semantic index: {str(e)}")
+    
+    def _prune_results(self, email_filenames: List[str]):
+        """Drop stored results and index rows for emails that are no longer part of the results"""
+        try:
+            self.results_store.retain(email_filenames)
+        except Exception as e:
+            print(f"✗ Error pruning results store: {str(e)}")
         
-        print(f"Processing complete! Results saved to {self.output_folder}")
-        return processed_results
+        if self.semantic_index is None:
+            return
+        try:
+            self.semantic_index.retain(email_filenames)
+        except Exception as e:
+            print(f"✗ Error pruning semantic index: {str(e)}")
+    
+    def _load_results(self) -> List[Dict[str, Any]]:
+        """Load the existing aggregate results file, if any"""
+        results_path = os.path.join(self.output_folder, 'processing_results.json')
+        if not os.path.exists(results_path):
+            return []
+        try:
+            with open(results_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Warning: could not read {results_path}: {str(e)}")
+            return []
+    
+    def _save_results(self, processed_results: List[Dict[str, Any]]):
+        """Save comprehensive results"""
+        results_path = os.path.join(self.output_folder, 'processing_results.json')
+        with get_metrics().timer('json_write_seconds', kind='aggregate'):
+            with open(results_path, 'w', encoding='utf-8') as f:
+                json.dump(processed_results, f, indent=2, ensure_ascii=False)
+    
+    def _save_results_from_store(self):
+        """Rebuild the aggregate results file from the results store, one email at a time"""
+        results_path = os.path.join(self.output_folder, 'processing_results.json')
+        tmp_path = results_path + '.tmp'
+        count = 0
+        try:
+            with get_metrics().timer('json_write_seconds', kind='aggregate'):
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write('[')
+                    # Same layout as json.dump(results, indent=2)
+                    for result in self.results_store.iter_results():
+                        item = json.dumps(result, indent=2, ensure_ascii=False)
+                        f.write((',\n' if count else '\n') + textwrap.indent(item, '  '))
+                        count += 1
+                    f.write('\n]' if count else ']')
+                os.replace(tmp_path, results_path)
+            print(f"✓ Saved {count} results to {results_path}")
+        except Exception as e:
+            print(f"✗ Error saving {results_path}: {str(e)}")
+    
+    def _report_progress(self, **counts):
+        """Pass per-email progress counts to the progress callback, if one is set"""
+        if self.progress_callback is not None:
+            try:
+                self.progress_callback(counts)
+            except Exception as e:
+                print(f"Progress callback failed: {str(e)}")
+    
+    def close(self):
+        """Save the keyword corpus and release the worker pool, OCR threads, results store and cache"""
+        try:
+            self.summarizer.entity_extractor.save(force=True)
+        except Exception as e:
+            print(f"Warning: could not save keyword corpus: {str(e)}")
+        self.worker_pool.shutdown()
+        self.document_extractor.ocr_engine.shutdown()
+        self.results_store.close()
+        if self.cache is not None:
+            self.cache.close()
+    
+    def _summary_cache_key(self, email_path: str) -> Optional[str]:
+        """Hash the raw message bytes (attachments included) with the summarizer settings"""
+        if self.cache is None:
+            return None
+        raw = read_message_bytes(email_path)
+        return self.cache.make_key('summary', raw, self.summarizer.settings_fingerprint())
+
+def export_summaries(output_folder: str, path: str, since: Optional[str] = None,
+                     cursor_file: Optional[str] = None, limit: Optional[int] = None,
+                     compress: Optional[bool] = None) -> Dict[str, Any]:
+    """Write summaries and deletions after since (or the cursor saved in cursor_file) as NDJSON
+    
+    path '-' writes to stdout; a path ending in .gz is gzip-compressed unless
+    compress says otherwise. After a complete export the cursor of the last
+    record is saved to cursor_file, so the next export continues from there.
+    """
+    import sys
+    
+    if since is None and cursor_file and os.path.exists(cursor_file):
+        with open(cursor_file, 'r', encoding='utf-8') as f:
+            since = f.read().strip() or None
+    if compress is None:
+        compress = path.endswith('.gz')
+    
+    store = ResultsStore.for_output_folder(output_folder)
+    exporter = SummaryExporter(store)
+    try:
+        if path == '-':
+            stats = exporter.export(sys.stdout.buffer, parse_since(since), limit, compress)
+            sys.stdout.flush()
+        else:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                stats = exporter.export(f, parse_since(since), limit, compress)
+            os.replace(tmp_path, path)
+    finally:
+        store.close()
+    
+    if cursor_file and stats['cursor']:
+        tmp_path = cursor_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(stats['cursor'] + '\n')
+        os.replace(tmp_path, cursor_file)
+    
+    # stderr keeps stdout clean when the export itself goes there
+    print(f"✓ Exported {stats['records']} changes; next cursor: {stats['cursor']}", file=sys.stderr)
+    return stats
 
 def main():
     """Main function to run the email processing agent"""
+    import argparse
+    
+    arg_parser = argparse.ArgumentParser(description="Process an email folder and generate summaries")
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help="only process new or modified emails since the last run")
+    arg_parser.add_argument('--streaming', action='store_true',
+                            help="process emails a few at a time with bounded memory")
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="processes for parsing and extraction (0 = one per core)")
+    arg_parser.add_argument('--profile', action='store_true',
+                            help="write a JSON profile of stage timings to the output folder")
+    arg_parser.add_argument('--watch', action='store_true',
+                            help="keep running and process emails as they arrive in the folder")
+    arg_parser.add_argument('--watch-backend', choices=['auto', 'inotify', 'poll'], default='auto',
+                            help="how to detect new files (poll for mounts without inotify events)")
+    arg_parser.add_argument('--debounce', type=float, default=1.0,
+                            help="seconds a new file must be unchanged before it is processed")
+    arg_parser.add_argument('--results-interval', type=float, default=60.0,
+                            help="in watch mode, seconds between rewrites of processing_results.json")
+    arg_parser.add_argument('--backend', choices=['fp32', 'int8', 'onnx'], default=None,
+                            help="T5 inference backend (default: $SUMMARIZER_BACKEND or fp32)")
+    arg_parser.add_argument('--threads', type=int, default=None,
+                            help="CPU threads per summarization call (default: $SUMMARIZER_THREADS or torch's choice)")
+    arg_parser.add_argument('--latency-budget', type=float, default=None,
+                            help="seconds one summarization batch may take; decoding gets cheaper to fit")
+    arg_parser.add_argument('--run-budget', type=float, default=None,
+                            help="seconds the whole run may take; each batch gets its share of the time left")
+    arg_parser.add_argument('--export', metavar='PATH', default=None,
+                            help="instead of processing, write summaries as NDJSON to PATH ('-' for stdout, .gz to compress)")
+    arg_parser.add_argument('--since', default=None,
+                            help="export only summaries after this cursor, Unix time or ISO date")
+    arg_parser.add_argument('--cursor-file', default=None,
+                            help="read --since from this file and save the next cursor to it after exporting")
+    arg_parser.add_argument('--limit', type=int, default=None,
+                            help="export at most this many summaries")
+    args = arg_parser.parse_args()
+    
     email_folder = "emails"
     output_folder = "output"
     
+    if args.export:
+        export_summaries(output_folder, args.export, since=args.since, cursor_file=args.cursor_file,
+                         limit=args.limit)
+        return
+    
     # Create folders if they don't exist
     os.makedirs(email_folder, exist_ok=True)
     os.makedirs(output_folder, exist_ok=True)
     
     # Initialize and run the agent
-    agent = EmailProcessingAgent(email_folder, output_folder)
-    results = agent.process_all_emails()
+    agent = EmailProcessingAgent(email_folder, output_folder, workers=args.workers, profile=args.profile,
+                                 inference_backend=args.backend, threads=args.threads,
+                                 latency_budget=args.latency_budget, run_budget=args.run_budget)
+    try:
+        if args.watch:
+            agent.watch(debounce=args.debounce, backend=args.watch_backend,
+                        results_interval=args.results_interval)
+            return
+        results = agent.process_all_emails(incremental=args.incremental, streaming=args.streaming)
+    finally:
+        agent.close()
     
     print(f"\n=== Processing Summary ===")
     print(f"Total emails processed: {len(results)}")
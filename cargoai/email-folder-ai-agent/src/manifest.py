@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+
+class ProcessingManifest:
+    """Track which email files have already been processed
+
+    Each entry records the file's size, mtime, content hash and the summary
+    file written for it, so a run only needs to process new or modified
+    emails and can clean up outputs for emails that were removed.
+    """
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self):
+        """Load the manifest from disk, starting empty if it is missing or corrupt"""
+        if not os.path.exists(self.manifest_path):
+            self.entries = {}
+            return
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {})
+        except Exception as e:
+            print(f"Warning: could not read manifest {self.manifest_path}: {str(e)}")
+            self.entries = {}
+
+    def save(self):
+        """Atomically write the manifest back to disk"""
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': self.entries}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def scan(self, folder_path: str, supported_formats: List[str]) -> Tuple[List[str], List[str]]:
+        """Compare the folder against the manifest
+
+        Returns (changed, removed): paths of new or modified emails, and
+        manifest keys of emails that no longer exist. Files whose size and
+        mtime are unchanged are not read at all; files that were only touched
+        are re-hashed and kept if their content is identical.
+        """
+        changed = []
+        seen = set()
+
+        if not os.path.isdir(folder_path):
+            return changed, list(self.entries)
+
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                if not entry.is_file() or not any(entry.name.endswith(fmt) for fmt in supported_formats):
+                    continue
+
+                seen.add(entry.name)
+                if not self._is_current(entry.name, entry.path, entry.stat()):
+                    changed.append(entry.path)
+
+        removed = [name for name in self.entries if name not in seen]
+        return sorted(changed), removed
+
+    def is_current(self, email_path: str) -> bool:
+        """True if the email is recorded with its current content (False once it is gone)"""
+        try:
+            stat = os.stat(email_path)
+        except OSError:
+            return False
+        return self._is_current(os.path.basename(email_path), email_path, stat)
+
+    def _is_current(self, name: str, path: str, stat: os.stat_result) -> bool:
+        """Check stat first and hash only when it differs from the recorded entry"""
+        known = self.entries.get(name)
+        if not known:
+            return False
+        if known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            return True
+
+        if known['hash'] == self.hash_file(path):
+            # Touched but identical: refresh the stat fields only
+            known['size'] = stat.st_size
+            known['mtime'] = stat.st_mtime
+            return True
+        return False
+
+    def record(self, email_path: str, output_file: str):
+        """Record a processed email with its current stat and content hash"""
+        stat = os.stat(email_path)
+        self.entries[os.path.basename(email_path)] = {
+            'path': email_path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': self.hash_file(email_path),
+            'output_file': output_file
+        }
+
+    def remove(self, filename: str) -> Dict[str, Any]:
+        """Forget an email and return its old entry"""
+        return self.entries.pop(filename, {})
+
+    @staticmethod
+    def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+        """SHA-256 of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+# Histogram buckets in seconds, from fast header parses to slow OCR and T5 batches
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = 'email_agent_'
+
+
+class Metrics:
+    """In-process counters, gauges and timing histograms
+
+    Values are keyed by metric name plus labels and can be rendered in the
+    Prometheus text format or snapshotted into a per-run profile. Each
+    process keeps its own values; pool workers hand theirs back with every
+    task result (``take``) and the parent adds them to its own (``merge``).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[tuple, float] = {}
+        self._gauges: Dict[tuple, float] = {}
+        self._timers: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> tuple:
+        return (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add value to a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a gauge to value"""
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one duration in a timing histogram"""
+        key = self._key(name, labels)
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(self.buckets)}
+                self._timers[key] = timer
+            timer['count'] += 1
+            timer['sum'] += seconds
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timer['buckets'][index] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the body of a with-block into a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of all values, keyed by a readable 'name{label="value"}' string"""
+        with self._lock:
+            return {
+                'counters': {self._format_key(key): value for key, value in self._counters.items()},
+                'gauges': {self._format_key(key): value for key, value in self._gauges.items()},
+                'timers': {
+                    self._format_key(key): {'count': timer['count'], 'sum': round(timer['sum'], 6)}
+                    for key, timer in self._timers.items()
+                }
+            }
+
+    @staticmethod
+    def diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        """What changed between two snapshots, e.g. the work done by one run"""
+        counters = {
+            key: value - before['counters'].get(key, 0)
+            for key, value in after['counters'].items()
+            if value != before['counters'].get(key, 0)
+        }
+        timers = {}
+        for key, timer in after['timers'].items():
+            previous = before['timers'].get(key, {'count': 0, 'sum': 0.0})
+            count = timer['count'] - previous['count']
+            if count:
+                total = timer['sum'] - previous['sum']
+                timers[key] = {'count': count, 'sum': round(total, 6), 'mean': round(total / count, 6)}
+        return {'counters': counters, 'gauges': dict(after['gauges']), 'timers': timers}
+
+    def take(self) -> Dict[str, Any]:
+        """Return the raw values recorded since the last take and start again from zero"""
+        with self._lock:
+            taken = {'counters': self._counters, 'gauges': self._gauges, 'timers': self._timers}
+            self._counters, self._gauges, self._timers = {}, {}, {}
+        return taken
+
+    def merge(self, taken: Dict[str, Any]):
+        """Add values taken from another process's registry to this one"""
+        with self._lock:
+            for key, value in taken['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            self._gauges.update(taken['gauges'])
+            for key, other in taken['timers'].items():
+                timer = self._timers.get(key)
+                if timer is None:
+                    timer = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(self.buckets)}
+                    self._timers[key] = timer
+                timer['count'] += other['count']
+                timer['sum'] += other['sum']
+                for index, count in enumerate(other['buckets']):
+                    timer['buckets'][index] += count
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for kind, values in (('counter', self._counters), ('gauge', self._gauges)):
+                for name in sorted({key[0] for key in values}):
+                    lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+                    for key in sorted(k for k in values if k[0] == name):
+                        lines.append(f"{METRIC_PREFIX}{self._format_key(key)} {values[key]}")
+
+            for name in sorted({key[0] for key in self._timers}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                for key in sorted(k for k in self._timers if k[0] == name):
+                    timer = self._timers[key]
+                    labels = list(key[1])
+                    for bound, count in zip(self.buckets, timer['buckets']):
+                        bucket_key = (f"{name}_bucket", tuple(labels + [('le', repr(bound))]))
+                        lines.append(f"{METRIC_PREFIX}{self._format_key(bucket_key)} {count}")
+                    inf_key = (f"{name}_bucket", tuple(labels + [('le', '+Inf')]))
+                    lines.append(f"{METRIC_PREFIX}{self._format_key(inf_key)} {timer['count']}")
+                    lines.append(f"{METRIC_PREFIX}{self._format_key((f'{name}_sum', key[1]))} {timer['sum']}")
+                    lines.append(f"{METRIC_PREFIX}{self._format_key((f'{name}_count', key[1]))} {timer['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _format_key(key: tuple) -> str:
+        name, labels = key
+        if not labels:
+            return name
+        rendered = ','.join(
+            '{}="{}"'.format(label, value.replace('\\', '\\\\').replace('"', '\\"'))
+            for label, value in labels
+        )
+        return f"{name}{{{rendered}}}"
+
+
+_metrics: Optional[Metrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics registry"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
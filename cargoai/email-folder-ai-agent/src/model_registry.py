@@ -0,0 +1,220 @@
+import contextlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# How the T5 model runs on CPU: the float32 PyTorch model, PyTorch with the
+# linear layers dynamically quantized to int8, or an ONNX Runtime export
+# (encoder, decoder and decoder-with-past, so generation reuses the KV cache)
+T5_BACKENDS = ('fp32', 'int8', 'onnx')
+
+# ONNX exports are kept here and reused, exporting a checkpoint takes a while
+DEFAULT_ONNX_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'email-agent', 'onnx')
+
+
+class ModelRegistry:
+    """Process-wide home for the AI models
+
+    Each model is loaded lazily the first time it is asked for, exactly once
+    per process, and then shared by every EmailSummarizer. Load timings are
+    recorded so the cold-start cost is visible.
+    """
+
+    def __init__(self, onnx_cache_dir: Optional[str] = None):
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._timings: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self.onnx_cache_dir = onnx_cache_dir or os.environ.get('ONNX_CACHE_DIR', DEFAULT_ONNX_CACHE)
+        self.intra_op_threads: Optional[int] = None
+        self.inter_op_threads: Optional[int] = None
+        self._threads_applied = False
+
+    def configure_threads(self, intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+        """Set the CPU thread counts used by torch and ONNX Runtime
+
+        intra_op threads split one operator (a matmul) across cores; inter_op
+        threads run independent operators side by side. torch only accepts
+        the inter-op count before its first parallel work, so this should be
+        called before the first model is loaded.
+        """
+        with self._lock:
+            if intra_op:
+                self.intra_op_threads = intra_op
+            if inter_op:
+                self.inter_op_threads = inter_op
+            self._threads_applied = False
+
+    def get_t5(self, model_name: str = 't5-small', backend: str = 'fp32') -> Tuple[Any, Any]:
+        """Return a shared (tokenizer, model) pair for a T5 checkpoint on the given backend
+
+        Every backend's model has the same ``generate()`` interface.
+        """
+        loaders = {
+            'fp32': lambda: self._load_t5_model(model_name),
+            'int8': lambda: self._load_t5_int8(model_name),
+            'onnx': lambda: self._load_t5_onnx(model_name)
+        }
+        if backend not in loaders:
+            raise ValueError(f"Unknown T5 backend: {backend}")
+
+        tokenizer = self._get(f"t5-tokenizer:{model_name}", lambda: self._load_t5_tokenizer(model_name))
+        key = f"t5-model:{model_name}" if backend == 'fp32' else f"t5-model:{backend}:{model_name}"
+        model = self._get(key, loaders[backend])
+        return tokenizer, model
+
+    def get_sentence_model(self, model_name: str = 'all-MiniLM-L6-v2'):
+        """Return a shared SentenceTransformer"""
+        return self._get(f"sentence:{model_name}", lambda: self._load_sentence_model(model_name))
+
+    def ensure_nltk_data(self, resource: str = 'tokenizers/punkt', package: str = 'punkt'):
+        """Make sure an NLTK resource is present, downloading it at most once per process"""
+        def load():
+            import nltk
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                nltk.download(package)
+            return True
+        return self._get(f"nltk:{package}", load)
+
+    def preload(self, t5_name: str = 't5-small', sentence_name: str = 'all-MiniLM-L6-v2',
+                t5_backend: str = 'fp32') -> Dict[str, Any]:
+        """Load every model up front, e.g. at app startup, and return the stats"""
+        for loader in (lambda: self.get_t5(t5_name, t5_backend),
+                       lambda: self.get_sentence_model(sentence_name),
+                       self.ensure_nltk_data):
+            try:
+                loader()
+            except Exception as e:
+                print(f"Warning: model preload failed: {str(e)}")
+
+        stats = self.stats()
+        for name, seconds in stats['load_seconds'].items():
+            print(f"✓ Loaded {name} in {seconds:.2f}s")
+        return stats
+
+    def inference_mode(self):
+        """Context manager that disables autograd for generation, when torch is available"""
+        try:
+            import torch
+            return torch.inference_mode()
+        except ImportError:
+            return contextlib.nullcontext()
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded models, per-model load time and any load errors"""
+        with self._lock:
+            return {
+                'loaded': sorted(self._models),
+                'load_seconds': dict(self._timings),
+                'errors': dict(self._errors)
+            }
+
+    def _get(self, key: str, loader: Callable[[], Any]):
+        """Return the cached model for key, loading it under the lock on first use"""
+        if key in self._models:
+            return self._models[key]
+
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+            if key in self._errors:
+                # Don't pay for a failing load again on every new summarizer
+                raise RuntimeError(self._errors[key])
+
+            self._apply_threads()
+            start = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                self._errors[key] = str(e)
+                raise
+            self._timings[key] = time.perf_counter() - start
+            self._models[key] = model
+            return model
+
+    def _apply_threads(self):
+        """Hand the configured thread counts to torch, once, before a model loads"""
+        if self._threads_applied or not (self.intra_op_threads or self.inter_op_threads):
+            return
+        self._threads_applied = True
+        try:
+            import torch
+        except ImportError:
+            return
+        if self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError as e:
+                # torch already started its inter-op pool
+                print(f"Warning: could not set inter-op threads: {str(e)}")
+
+    @staticmethod
+    def _load_t5_tokenizer(model_name: str):
+        from transformers import T5Tokenizer
+        return T5Tokenizer.from_pretrained(model_name)
+
+    @staticmethod
+    def _load_t5_model(model_name: str):
+        from transformers import T5ForConditionalGeneration
+        model = T5ForConditionalGeneration.from_pretrained(model_name)
+        model.eval()
+        return model
+
+    def _load_t5_int8(self, model_name: str):
+        """T5 with every nn.Linear quantized to int8; activations are quantized on the fly"""
+        import torch
+        model = self._load_t5_model(model_name)
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _load_t5_onnx(self, model_name: str):
+        """T5 exported to ONNX Runtime with past key/values, exported once and cached on disk"""
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            options.inter_op_num_threads = self.inter_op_threads
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+
+        export_dir = os.path.join(self.onnx_cache_dir, model_name.replace('/', '--'))
+        exported = os.path.exists(os.path.join(export_dir, 'config.json'))
+        model = ORTModelForSeq2SeqLM.from_pretrained(
+            export_dir if exported else model_name,
+            export=not exported,
+            use_cache=True,
+            provider='CPUExecutionProvider',
+            session_options=options
+        )
+        if not exported:
+            model.save_pretrained(export_dir)
+            print(f"✓ Exported {model_name} to ONNX in {export_dir}")
+        return model
+
+    @staticmethod
+    def _load_sentence_model(model_name: str):
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+        model.eval()
+        return model
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
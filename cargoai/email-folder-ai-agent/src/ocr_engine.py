@@ -0,0 +1,141 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from metrics import get_metrics
+from attachment_payload import open_payload, payload_view
+
+
+class OCREngine:
+    """Tesseract OCR with image preprocessing, a bounded worker pool and a result cache
+
+    Images are converted to grayscale, downscaled when larger than
+    ``max_side`` pixels and upscaled when they are small low-DPI scans, then
+    handed to tesseract with an explicit DPI. Each tesseract run is a
+    separate process, so the frames of a multi-page TIFF are OCRed side by
+    side in a small thread pool of ``workers`` threads. A single-frame image
+    is OCRed in the calling thread; separate attachments are only OCRed in
+    parallel across the agent's worker processes. Results are cached by
+    image hash, in memory and optionally in a SummaryCache.
+    """
+
+    def __init__(self, workers: int = 2, max_side: int = 2500, target_dpi: int = 300,
+                 cache=None, memory_cache_size: int = 256, tesseract_config: str = ''):
+        self.workers = max(1, workers)
+        self.max_side = max_side
+        self.target_dpi = target_dpi
+        self.cache = cache
+        self.memory_cache_size = memory_cache_size
+        self.tesseract_config = tesseract_config
+        self._memory_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def image_to_text(self, content: bytes) -> str:
+        """OCR an image (every frame, for multi-page TIFFs) and return its text"""
+        metrics = get_metrics()
+        digest = hashlib.sha256(payload_view(content))
+        digest.update(f"|{self.max_side}|{self.target_dpi}|{self.tesseract_config}".encode('utf-8'))
+        key = digest.hexdigest()
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            metrics.inc('ocr_cache_total', result='hit')
+            return cached
+        metrics.inc('ocr_cache_total', result='miss')
+
+        frames = self._load_frames(content)
+        metrics.inc('ocr_frames_total', len(frames))
+
+        if len(frames) == 1:
+            texts = [self._run_ocr(frames[0])]
+        else:
+            texts = list(self._get_executor().map(self._run_ocr, frames))
+
+        text = '\n'.join(t for t in texts if t).strip()
+        self._cache_put(key, text)
+        return text
+
+    def _run_ocr(self, image) -> str:
+        """Run tesseract on one preprocessed frame"""
+        import pytesseract
+
+        with get_metrics().timer('ocr_seconds'):
+            return pytesseract.image_to_string(image, config=self._config()).strip()
+
+    def _config(self) -> str:
+        return f"--dpi {self.target_dpi} {self.tesseract_config}".strip()
+
+    def _load_frames(self, content: bytes) -> List:
+        """Open the image and return preprocessed frames"""
+        from PIL import Image, ImageSequence
+
+        with open_payload(content) as stream:
+            image = Image.open(stream)
+            frames = [self.preprocess(frame.copy(), image.info.get('dpi'))
+                      for frame in ImageSequence.Iterator(image)]
+            image.close()
+        return frames
+
+    def preprocess(self, image, dpi=None):
+        """Grayscale and rescale a frame so tesseract sees roughly target_dpi text"""
+        if image.mode != 'L':
+            image = image.convert('L')
+
+        width, height = image.size
+        longest = max(width, height)
+        scale = 1.0
+
+        if longest > self.max_side:
+            # Phone photos: far more pixels than OCR needs
+            scale = self.max_side / float(longest)
+        elif dpi and dpi[0] and dpi[0] < self.target_dpi * 0.5:
+            # Low-resolution scans: upscale towards the target DPI, within max_side
+            scale = min(self.target_dpi / float(dpi[0]), self.max_side / float(longest))
+
+        if abs(scale - 1.0) > 0.05:
+            from PIL import Image
+            image = image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+            get_metrics().inc('ocr_resized_total', direction='down' if scale < 1 else 'up')
+
+        return image
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr-worker')
+            return self._executor
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory_cache:
+                self._memory_cache.move_to_end(key)
+                return self._memory_cache[key]
+
+        if self.cache is not None:
+            cached = self.cache.get('ocr', key)
+            if cached is not None:
+                self._remember(key, cached['text'])
+                return cached['text']
+        return None
+
+    def _cache_put(self, key: str, text: str):
+        self._remember(key, text)
+        if self.cache is not None:
+            self.cache.put('ocr', key, {'text': text})
+
+    def _remember(self, key: str, text: str):
+        with self._lock:
+            self._memory_cache[key] = text
+            self._memory_cache.move_to_end(key)
+            while len(self._memory_cache) > self.memory_cache_size:
+                self._memory_cache.popitem(last=False)
+
+    def shutdown(self):
+        """Stop the OCR worker threads"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,146 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import get_metrics
+from attachment_payload import open_payload
+
+# Pages with less text than this and at least one image are treated as scanned
+MIN_TEXT_CHARS = 20
+
+
+class PDFTextEngine:
+    """Bounded PDF text extraction with OCR for scanned pages
+
+    Pages are read in order and assembled with a single join. Work stops at
+    ``max_pages`` pages or ``max_chars`` characters. Pages without a text
+    layer but with embedded images are passed to the ``ocr`` callable
+    instead, while the character budget has room left. PDFs of at least
+    ``parallel_min_pages`` pages are read in page ranges on ``pool``, a
+    WorkerPool; inside a pool worker, where the pool runs in-process, they
+    are read in one pass instead.
+    """
+
+    def __init__(self, max_pages: int = 200, max_chars: int = 200000,
+                 ocr: Optional[Callable[[bytes], str]] = None, max_ocr_pages: int = 20,
+                 pool=None, parallel_min_pages: int = 40):
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.ocr = ocr
+        self.max_ocr_pages = max_ocr_pages
+        self.pool = pool
+        self.parallel_min_pages = parallel_min_pages
+
+    def extract(self, content) -> str:
+        """Extract text from PDF bytes or an AttachmentPayload within the page and character budget"""
+        import PyPDF2
+
+        metrics = get_metrics()
+        with open_payload(content) as stream:
+            reader = PyPDF2.PdfReader(stream)
+            total_pages = len(reader.pages)
+            page_count = min(total_pages, self.max_pages)
+            metrics.inc('pdf_pages_total', total_pages - page_count, kind='skipped')
+
+            if self.pool is not None and self.pool.parallel and page_count >= self.parallel_min_pages:
+                page_texts, image_pages = self._read_parallel(content, page_count)
+            else:
+                page_texts, image_pages = _read_pages(reader, 0, page_count, self.max_chars)
+            metrics.inc('pdf_pages_total', len(page_texts), kind='text')
+
+            # The text layer may already fill the budget; OCR would only be cut off
+            room = self.max_chars - sum(len(text) + 1 for text in page_texts.values())
+            if image_pages and self.ocr is not None and room > 0:
+                ocr_texts = self._ocr_pages(reader, image_pages, room)
+                metrics.inc('pdf_pages_total', len(ocr_texts), kind='ocr')
+                page_texts.update(ocr_texts)
+
+        # Assemble in page order with one join, stopping at the character budget
+        parts = []
+        size = 0
+        for page_number in sorted(page_texts):
+            text = page_texts[page_number]
+            parts.append(text)
+            size += len(text) + 1
+            if size >= self.max_chars:
+                break
+
+        return '\n'.join(parts)[:self.max_chars].strip()
+
+    def _read_parallel(self, content, page_count: int) -> Tuple[Dict[int, str], List[int]]:
+        """Read one page range per worker and merge them in page order"""
+        range_size = -(-page_count // self.pool.workers)
+        tasks = [(content, start, min(start + range_size, page_count), self.max_chars)
+                 for start in range(0, page_count, range_size)]
+
+        page_texts: Dict[int, str] = {}
+        image_pages: List[int] = []
+        for texts, images in self.pool.map(_read_page_range, tasks):
+            page_texts.update(texts)
+            image_pages.extend(images)
+        return page_texts, sorted(image_pages)
+
+    def _ocr_pages(self, reader, image_pages: List[int], room: int) -> Dict[int, str]:
+        """OCR the embedded images of scanned pages, up to max_ocr_pages pages or ``room`` characters"""
+        texts = {}
+        for page_number in image_pages[:self.max_ocr_pages]:
+            if room <= 0:
+                break
+            try:
+                parts = [self.ocr(image.data) for image in reader.pages[page_number].images]
+                text = '\n'.join(part for part in parts if part)
+                if text.strip():
+                    texts[page_number] = text
+                    room -= len(text) + 1
+            except Exception as e:
+                print(f"PDF page OCR error on page {page_number + 1}: {str(e)}")
+        return texts
+
+
+def _read_page_range(task: Tuple[Any, int, int, int]) -> Tuple[Dict[int, str], List[int]]:
+    """Pool task: open the PDF and read pages [start, stop)"""
+    import PyPDF2
+
+    content, start, stop, max_chars = task
+    # Spilled payloads arrive as a file path, so workers read the file directly
+    with open_payload(content) as stream:
+        return _read_pages(PyPDF2.PdfReader(stream), start, stop, max_chars)
+
+
+def _read_pages(reader, start: int, stop: int, max_chars: int) -> Tuple[Dict[int, str], List[int]]:
+    """Extract pages [start, stop); returns page texts and the scanned (image-only) pages"""
+    page_texts: Dict[int, str] = {}
+    image_pages: List[int] = []
+    size = 0
+
+    for page_number in range(start, stop):
+        page = reader.pages[page_number]
+        try:
+            text = page.extract_text() or ''
+        except Exception as e:
+            print(f"PDF extraction error on page {page_number + 1}: {str(e)}")
+            text = ''
+
+        if len(text.strip()) < MIN_TEXT_CHARS and _has_images(page):
+            image_pages.append(page_number)
+            continue
+
+        if text:
+            page_texts[page_number] = text
+            size += len(text) + 1
+            if size >= max_chars:
+                break
+
+    return page_texts, image_pages
+
+
+def _has_images(page) -> bool:
+    """True if the page's resources contain at least one image XObject"""
+    try:
+        resources = page.get('/Resources')
+        resources = resources.get_object() if resources is not None else {}
+        xobjects = resources.get('/XObject')
+        if xobjects is None:
+            return False
+        xobjects = xobjects.get_object()
+        return any(xobjects[name].get_object().get('/Subtype') == '/Image' for name in xobjects)
+    except Exception:
+        return False
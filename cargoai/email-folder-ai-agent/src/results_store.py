@@ -0,0 +1,271 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from metrics import get_metrics
+
+# Page size limits for query()
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class ResultsStore:
+    """Processed email summaries in SQLite, written one email at a time
+
+    Each row holds the searchable metadata columns (sender, subject, date,
+    filename) next to the full summary JSON. The columns are indexed, so
+    listing a page of results or fetching one summary never reads the rest
+    of the store. Rows are replaced when an email is processed again and
+    dropped when it leaves the folder, leaving a tombstone in ``deletions``
+    so exports can tell consumers about the removal.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL lets the web app read while an agent run is writing
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                   email_filename TEXT PRIMARY KEY,
+                   output_file TEXT NOT NULL,
+                   sender TEXT NOT NULL,
+                   subject TEXT NOT NULL,
+                   date TEXT NOT NULL,
+                   summary TEXT NOT NULL,
+                   updated_at REAL NOT NULL
+               )"""
+        )
+        # Sender and subject sort case-insensitively; dates and file names compare exactly
+        for column, collation in (('sender', ' COLLATE NOCASE'), ('subject', ' COLLATE NOCASE'),
+                                  ('date', ''), ('output_file', '')):
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_results_{column} ON results ({column}{collation})"
+            )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS deletions (
+                   email_filename TEXT PRIMARY KEY,
+                   output_file TEXT NOT NULL,
+                   deleted_at REAL NOT NULL
+               )"""
+        )
+        # Exports page through both tables in change order
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_updated ON results (updated_at, email_filename)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_deletions_deleted ON deletions (deleted_at, email_filename)")
+        self._conn.commit()
+
+    @classmethod
+    def for_output_folder(cls, output_folder: str) -> 'ResultsStore':
+        """The store of an output folder, seeded from an older processing_results.json"""
+        store = cls(os.path.join(output_folder, 'results.sqlite3'))
+        if store.count() == 0:
+            store.import_json(os.path.join(output_folder, 'processing_results.json'))
+        return store
+
+    def put(self, result: Dict[str, Any]):
+        """Insert or replace one processed email ({'email_filename', 'summary', 'output_file'})"""
+        self.put_many([result])
+
+    def put_many(self, results: Iterable[Dict[str, Any]]):
+        """Insert or replace processed emails in one transaction"""
+        rows = [self._row(result) for result in results]
+        if not rows:
+            return
+        with get_metrics().timer('results_store_seconds', op='write'):
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO results "
+                    "(email_filename, output_file, sender, subject, date, summary, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                # An email that is back supersedes its tombstone
+                self._conn.executemany("DELETE FROM deletions WHERE email_filename = ?",
+                                       [(row[0],) for row in rows])
+                self._conn.commit()
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """The summary of one email, looked up by email filename or output file name"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM results WHERE email_filename = ? OR output_file = ? LIMIT 1",
+                (filename, filename)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, page: int = 1, per_page: int = DEFAULT_PAGE_SIZE, sender: Optional[str] = None,
+              subject: Optional[str] = None, filename: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              order: str = 'date_desc') -> Dict[str, Any]:
+        """One page of results matching the filters, with the total match count
+
+        sender, subject and filename match case-insensitive substrings;
+        date_from and date_to are inclusive bounds on the 'YYYY-MM-DD HH:MM:SS'
+        dates the parser writes (a bare 'YYYY-MM-DD' date works as well).
+        """
+        page = max(1, int(page))
+        per_page = max(1, min(int(per_page), MAX_PAGE_SIZE))
+
+        clauses, params = [], []
+        for column, value in (('sender', sender), ('subject', subject), ('email_filename', filename)):
+            if value:
+                clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+                params.append('%' + value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("date <= ?")
+            # A bare day includes everything on that day
+            params.append(date_to + ' 99' if len(date_to) == 10 else date_to)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        order_by = {
+            'date_desc': 'date DESC, email_filename',
+            'date_asc': 'date ASC, email_filename',
+            'filename': 'email_filename',
+            'sender': 'sender COLLATE NOCASE, date DESC',
+            'subject': 'subject COLLATE NOCASE, date DESC'
+        }.get(order)
+        if order_by is None:
+            raise ValueError(f"Unknown order: {order}")
+
+        with get_metrics().timer('results_store_seconds', op='query'):
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) FROM results {where}", params).fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT email_filename, output_file, summary FROM results {where} "
+                    f"ORDER BY {order_by} LIMIT ? OFFSET ?",
+                    params + [per_page, (page - 1) * per_page]
+                ).fetchall()
+
+        return {
+            'results': [
+                {'email_filename': name, 'summary': json.loads(summary), 'output_file': output_file}
+                for name, output_file, summary in rows
+            ],
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page
+        }
+
+    def iter_results(self, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Every stored email as {'email_filename', 'summary', 'output_file'}, oldest change first"""
+        after: Tuple[float, str] = (-1.0, '')
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT updated_at, email_filename, output_file, summary FROM results "
+                    "WHERE (updated_at, email_filename) > (?, ?) "
+                    "ORDER BY updated_at, email_filename LIMIT ?",
+                    (after[0], after[1], batch_size)
+                ).fetchall()
+            for _, email_filename, output_file, summary in rows:
+                yield {'email_filename': email_filename, 'summary': json.loads(summary), 'output_file': output_file}
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1][0], rows[-1][1])
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def remove(self, email_filenames: Iterable[str]):
+        """Drop the rows of the given emails"""
+        names = [(name,) for name in email_filenames]
+        if not names:
+            return
+        with self._lock:
+            self._delete(names)
+            self._conn.commit()
+
+    def retain(self, email_filenames: Iterable[str]):
+        """Drop every row except those of the given emails"""
+        keep = set(email_filenames)
+        with self._lock:
+            stale = [
+                (name,) for (name,) in self._conn.execute("SELECT email_filename FROM results")
+                if name not in keep
+            ]
+            if stale:
+                self._delete(stale)
+                self._conn.commit()
+
+    def changes(self, after: Tuple[float, str], before: float,
+                limit: int) -> Iterable[Tuple[float, str, str, Optional[str]]]:
+        """Rows and tombstones changed after the (time, email_filename) cursor and before ``before``
+
+        Returns up to ``limit`` (changed_at, email_filename, output_file,
+        summary JSON) tuples, oldest first; tombstones have no summary.
+        """
+        after_time, after_name = after
+        with get_metrics().timer('results_store_seconds', op='changes'):
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT changed_at, email_filename, output_file, summary FROM ("
+                    "  SELECT updated_at AS changed_at, email_filename, output_file, summary FROM results"
+                    "  WHERE (updated_at, email_filename) > (?, ?) AND updated_at < ?"
+                    "  UNION ALL"
+                    "  SELECT deleted_at, email_filename, output_file, NULL FROM deletions"
+                    "  WHERE (deleted_at, email_filename) > (?, ?) AND deleted_at < ?"
+                    ") ORDER BY changed_at, email_filename LIMIT ?",
+                    (after_time, after_name, before, after_time, after_name, before, limit)
+                ).fetchall()
+
+    def import_json(self, results_path: str) -> int:
+        """Load a processing_results.json written before the store existed; returns rows added"""
+        if not os.path.exists(results_path):
+            return 0
+        try:
+            with open(results_path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+        except Exception as e:
+            print(f"Warning: could not read {results_path}: {str(e)}", file=sys.stderr)
+            return 0
+        # Streaming runs only list filenames in the aggregate file
+        results = [result for result in results if isinstance(result.get('summary'), dict)]
+        self.put_many(results)
+        # stderr: the store is also opened by exports writing to stdout
+        print(f"✓ Imported {len(results)} results from {results_path}", file=sys.stderr)
+        return len(results)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _delete(self, names: Iterable[tuple]):
+        """Delete rows, leaving a tombstone for each; the caller holds the lock and commits"""
+        now = time.time()
+        names = list(names)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO deletions (email_filename, output_file, deleted_at) "
+            "SELECT email_filename, output_file, ? FROM results WHERE email_filename = ?",
+            [(now, name) for (name,) in names]
+        )
+        self._conn.executemany("DELETE FROM results WHERE email_filename = ?", names)
+
+    @staticmethod
+    def _row(result: Dict[str, Any]) -> tuple:
+        summary = result['summary']
+        metadata = summary.get('email_metadata', {})
+        return (
+            result['email_filename'],
+            result.get('output_file') or f"summary_{result['email_filename']}.json",
+            str(metadata.get('sender', '') or ''),
+            str(metadata.get('subject', '') or ''),
+            str(metadata.get('date', '') or ''),
+            json.dumps(summary, ensure_ascii=False),
+            time.time()
+        )
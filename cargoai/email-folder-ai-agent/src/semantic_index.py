@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# numpy is imported inside the methods that touch vectors, so importing the
+# agent or the web app does not pay for it
+
+# Text per document chunk and chunks per document that get their own vector
+CHUNK_CHARS = 1000
+MAX_CHUNKS_PER_DOCUMENT = 8
+
+# Characters of each entry's text kept for display in search results
+SNIPPET_CHARS = 300
+
+
+class SemanticIndex:
+    """Sentence-embedding index over processed emails, stored in the output folder
+
+    Every email summary, document summary and document text chunk gets one
+    L2-normalized float32 vector. Vectors are appended to a flat
+    ``embeddings_<generation>.f32`` file that is memory-mapped for search,
+    and ``rows_<generation>.jsonl`` gets one line of metadata per vector plus
+    a ``drop`` line when emails are replaced or removed, so indexing an email
+    only appends to both files. ``index.json`` names the current generation;
+    once dropped rows dominate, the live rows are compacted into a new
+    generation, so readers never see a half-written file.
+    """
+
+    def __init__(self, index_folder: str, model_name: str = ''):
+        self.index_folder = index_folder
+        self.model_name = model_name
+        self.header_path = os.path.join(index_folder, 'index.json')
+        self._header = self._empty_header()
+        self._header_mtime: Optional[int] = None
+        self._rows: List[Dict[str, Any]] = []
+        # Live emails: filename -> summary fingerprint, and -> row positions
+        self._fingerprints: Dict[str, str] = {}
+        self._positions: Dict[str, List[int]] = {}
+        self._dead = 0
+        # Bytes of the rows file already applied to the rows above
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(summary: Dict[str, Any]) -> str:
+        """Hash of a summary, so unchanged emails are not embedded again"""
+        encoded = json.dumps(summary, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def build_records(self, email_filename: str, summary: Dict[str, Any], fingerprint: str,
+                      extracted_docs: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """The texts to embed for one email: its summary, document summaries and text chunks"""
+        metadata = summary.get('email_metadata', {})
+        base = {
+            'email_filename': email_filename,
+            'subject': metadata.get('subject', ''),
+            'sender': metadata.get('sender', ''),
+            'date': metadata.get('date', ''),
+            'output_file': f"summary_{email_filename}.json",
+            'fingerprint': fingerprint
+        }
+
+        records = [dict(base, kind='email', document=None,
+                        text=f"{metadata.get('subject', '')}\n{summary.get('email_summary', '')}".strip())]
+
+        for doc_summary in summary.get('document_summaries', []):
+            records.append(dict(base, kind='document', document=doc_summary.get('filename'),
+                                text=doc_summary.get('summary', '')))
+
+        for doc in extracted_docs or []:
+            for chunk in chunk_text(doc.get('extracted_text') or ''):
+                records.append(dict(base, kind='chunk', document=doc.get('filename'), text=chunk))
+
+        return [record for record in records if record['text']]
+
+    def has(self, email_filename: str, fingerprint: str) -> bool:
+        """True if the email is indexed with exactly this summary"""
+        with self._lock:
+            self._load()
+            return self._fingerprints.get(email_filename) == fingerprint
+
+    def add(self, records: List[Dict[str, Any]], vectors):
+        """Append records with their vectors, replacing older rows for the same emails"""
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(records) != len(vectors):
+            raise ValueError(f"{len(records)} records but {len(vectors)} vectors")
+        if not records:
+            return
+
+        with self._lock:
+            self._load()
+            header = self._header
+            dim = int(vectors.shape[1])
+            if header['model'] != self.model_name or (header['dim'] and header['dim'] != dim):
+                # Vectors from another model are not comparable; start over
+                print(f"Semantic index model changed to {self.model_name}; rebuilding")
+                self._start_generation(dict(self._empty_header(), generation=header['generation'] + 1, dim=dim), [])
+            elif not header['dim']:
+                self._start_generation(dict(header, dim=dim), [])
+
+            replaced = sorted({record['email_filename'] for record in records} & self._fingerprints.keys())
+            events: List[Dict[str, Any]] = [{'drop': replaced}] if replaced else []
+            for record in records:
+                row = {key: value for key, value in record.items() if key != 'text'}
+                row['snippet'] = record['text'][:SNIPPET_CHARS]
+                events.append(row)
+
+            # Vectors first: a reader with the old rows only maps the old vectors.
+            # Truncating drops vectors orphaned by an interrupted earlier add.
+            with open(self._vectors_path(), 'ab') as f:
+                f.truncate(len(self._rows) * dim * vectors.itemsize)
+                f.write(vectors.tobytes())
+            self._append(events)
+            self._compact_if_needed()
+
+    def remove(self, email_filenames: Iterable[str]):
+        """Drop every row belonging to the given emails"""
+        names = set(email_filenames)
+        self._update(lambda name: name in names)
+
+    def retain(self, email_filenames: Iterable[str]):
+        """Drop every row except those belonging to the given emails"""
+        names = set(email_filenames)
+        self._update(lambda name: name not in names)
+
+    def search(self, query_vector, top_k: int = 10, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top-k rows by cosine similarity to a normalized query vector"""
+        import numpy as np
+
+        with self._lock:
+            self._load()
+            rows = list(self._rows)
+            if not rows:
+                return []
+            live = np.fromiter(
+                (row['live'] and (kind is None or row['kind'] == kind) for row in rows),
+                dtype=bool, count=len(rows)
+            )
+            vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode='r',
+                                shape=(len(rows), self._header['dim']))
+
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        if query.shape[0] != vectors.shape[1]:
+            raise ValueError(f"Query has {query.shape[0]} dimensions, index has {vectors.shape[1]}")
+
+        scores = vectors @ query
+        scores[~live] = -np.inf
+
+        top_k = min(top_k, int(live.sum()))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for position in top:
+            row = {key: value for key, value in rows[position].items() if key not in ('live', 'fingerprint')}
+            row['score'] = round(float(scores[position]), 4)
+            results.append(row)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Row counts, vector size and model of the index"""
+        with self._lock:
+            self._load()
+            return {
+                'model': self._header['model'],
+                'dim': self._header['dim'],
+                'rows': len(self._rows) - self._dead,
+                'emails': len(self._fingerprints),
+                'tombstones': self._dead
+            }
+
+    def _update(self, predicate):
+        with self._lock:
+            self._load()
+            dropped = sorted(name for name in self._fingerprints if predicate(name))
+            if dropped:
+                self._append([{'drop': dropped}])
+                self._compact_if_needed()
+
+    def _apply(self, event: Dict[str, Any]):
+        """Apply one line of the rows file to the in-memory rows"""
+        if 'drop' in event:
+            for name in event['drop']:
+                for position in self._positions.pop(name, []):
+                    self._rows[position]['live'] = False
+                    self._dead += 1
+                self._fingerprints.pop(name, None)
+            return
+
+        name = event['email_filename']
+        event['live'] = True
+        self._positions.setdefault(name, []).append(len(self._rows))
+        self._fingerprints[name] = event['fingerprint']
+        self._rows.append(event)
+
+    def _append(self, events: List[Dict[str, Any]]):
+        data = _encode_lines(events)
+        with open(self._rows_path(), 'ab') as f:
+            # Drops a line left half-written by an interrupted earlier append
+            f.truncate(self._offset)
+            f.seek(self._offset)
+            f.write(data)
+            self._offset = f.tell()
+        for event in events:
+            self._apply(event)
+
+    def _compact_if_needed(self):
+        """Rewrite the live rows into a new generation once dropped rows dominate"""
+        import numpy as np
+
+        if self._dead < 64 or self._dead * 2 < len(self._rows):
+            return
+
+        header = dict(self._header, generation=self._header['generation'] + 1)
+        live_positions = [position for position, row in enumerate(self._rows) if row['live']]
+        vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode='r',
+                            shape=(len(self._rows), header['dim']))
+        with open(self._vectors_path(header['generation']), 'wb') as f:
+            f.write(np.ascontiguousarray(vectors[live_positions]).tobytes())
+        del vectors
+
+        rows = [{key: value for key, value in self._rows[position].items() if key != 'live'}
+                for position in live_positions]
+        self._start_generation(header, rows)
+
+    def _start_generation(self, header: Dict[str, Any], rows: List[Dict[str, Any]]):
+        """Write the rows of a new generation, point index.json at it and delete the old files"""
+        old_generation = self._header['generation']
+        data = _encode_lines(rows)
+        os.makedirs(self.index_folder, exist_ok=True)
+        with open(self._rows_path(header['generation']), 'wb') as f:
+            f.write(data)
+
+        tmp_path = self.header_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(header, f, ensure_ascii=False)
+        os.replace(tmp_path, self.header_path)
+        self._header_mtime = os.stat(self.header_path).st_mtime_ns
+
+        self._reset(header)
+        for row in rows:
+            self._apply(row)
+        self._offset = len(data)
+
+        if old_generation != header['generation']:
+            for path in (self._vectors_path(old_generation), self._rows_path(old_generation)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _empty_header(self) -> Dict[str, Any]:
+        return {'model': self.model_name, 'dim': None, 'generation': 0}
+
+    def _reset(self, header: Dict[str, Any]):
+        self._header = header
+        self._rows = []
+        self._fingerprints = {}
+        self._positions = {}
+        self._dead = 0
+        self._offset = 0
+
+    def _vectors_path(self, generation: Optional[int] = None) -> str:
+        if generation is None:
+            generation = self._header['generation']
+        return os.path.join(self.index_folder, f"embeddings_{generation}.f32")
+
+    def _rows_path(self, generation: Optional[int] = None) -> str:
+        if generation is None:
+            generation = self._header['generation']
+        return os.path.join(self.index_folder, f"rows_{generation}.jsonl")
+
+    def _load(self):
+        """Catch up with index.json and the rows another process appended since the last call"""
+        try:
+            mtime = os.stat(self.header_path).st_mtime_ns
+        except OSError:
+            return
+
+        if mtime != self._header_mtime:
+            self._header_mtime = mtime
+            try:
+                with open(self.header_path, 'r', encoding='utf-8') as f:
+                    self._reset(json.load(f))
+            except Exception as e:
+                print(f"Warning: could not read {self.header_path}: {str(e)}")
+                self._reset(self._empty_header())
+                return
+
+        try:
+            with open(self._rows_path(), 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return
+
+        # A last line without its newline is still being written
+        for line in data[:data.rfind(b'\n') + 1].splitlines(keepends=True):
+            try:
+                if line.strip():
+                    self._apply(json.loads(line))
+            except Exception as e:
+                print(f"Warning: could not read {self._rows_path()}: {str(e)}")
+                break
+            self._offset += len(line)
+
+
+def _encode_lines(events: List[Dict[str, Any]]) -> bytes:
+    return ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events).encode('utf-8')
+
+
+def chunk_text(text: str, chunk_chars: int = CHUNK_CHARS,
+               max_chunks: int = MAX_CHUNKS_PER_DOCUMENT) -> List[str]:
+    """Split text into at most max_chunks pieces of about chunk_chars, on whitespace"""
+    chunks = []
+    start = 0
+    text = text.strip()
+    while start < len(text) and len(chunks) < max_chunks:
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            split = text.rfind(' ', start + chunk_chars // 2, end)
+            if split > start:
+                end = split
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
@@ -1,41 +1,305 @@
-from transformers import pipeline, T5Tokenizer, T5ForConditionalGeneration
-from sentence_transformers import SentenceTransformer
-import nltk
-import numpy as np
-from typing import Dict, List, Any
+import os
+import re
+import time
+from typing import Dict, List, Any, Optional, Tuple
+# transformers, torch, sentence_transformers and nltk are only imported by the
+# registry when a model is first requested
+from model_registry import T5_BACKENDS, ModelRegistry, get_model_registry
+from metrics import get_metrics
+from dedup import Deduplicator, thread_id
+from entity_extractor import CorpusEntityExtractor, extract_domain_entities
+from decoding_policy import FALLBACK_DECODING, DecodingPolicy, DecodingSettings
 
 class EmailSummarizer:
-    def __init__(self):
+    def __init__(self, batch_size: int = 8, registry: Optional[ModelRegistry] = None,
+                 long_document_mode: bool = True, max_chunks_per_document: int = 16,
+                 dedup: bool = True, entity_extractor: Optional[CorpusEntityExtractor] = None,
+                 inference_backend: Optional[str] = None, intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None, decoding_policy: Optional[DecodingPolicy] = None):
+        # Number of texts per padded generate call
+        self.batch_size = max(1, batch_size)
+        
+        # Inputs longer than this are truncated, or chunked in long document mode
+        self.max_input_chars = 900  # Conservative limit to avoid tokenization issues
+        self.long_document_mode = long_document_mode
+        # Chunk size leaves room for the task prefix inside the 512-token window
+        self.chunk_tokens = 480
+        # Caps generate work per document: map inputs plus a few reduce levels
+        self.max_chunks_per_document = max(1, max_chunks_per_document)
+        self.max_reduce_levels = 4
+        self.model_name = 't5-small'
+        self.embedding_model_name = 'all-MiniLM-L6-v2'
+        
+        # Near-duplicate emails and repeated attachments reuse one summary
+        self.deduplicator = Deduplicator() if dedup else None
+        
+        # TF-IDF keywords against the corpus seen so far, plus shipping identifiers
+        self.entity_extractor = entity_extractor or CorpusEntityExtractor()
+        
+        # Picks beam width and output length per generate call
+        self.decoding_policy = decoding_policy or DecodingPolicy()
+        
+        # Models are loaded once per process and shared by every summarizer;
+        # this instance only fetches them from the registry on first use
+        self.registry = registry or get_model_registry()
+        intra_op_threads = intra_op_threads or int(os.environ.get('SUMMARIZER_THREADS') or 0)
+        if intra_op_threads or inter_op_threads:
+            self.registry.configure_threads(intra_op_threads, inter_op_threads)
+        
+        # CPU inference backend for T5 (fp32, int8 or onnx); the backend that
+        # actually loaded is kept in active_backend
+        self.inference_backend = inference_backend or os.environ.get('SUMMARIZER_BACKEND', 'fp32')
+        if self.inference_backend not in T5_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {self.inference_backend}")
+        self.active_backend = None
+        self._models_loaded = False
+        self._tokenizer = None
+        self._model = None
+        # The sentence model loads on its own, so query embedding never pulls in T5
+        self._sentence_loaded = False
+        self._sentence_model = None
+    
+    def _ensure_models(self):
+        """Fetch T5 and the NLTK data from the registry the first time they are needed"""
+        if self._models_loaded:
+            return
+        self._models_loaded = True
+        
         try:
             # Initialize T5 model for abstractive summarization
-            self.tokenizer = T5Tokenizer.from_pretrained('t5-small')
-            self.model = T5ForConditionalGeneration.from_pretrained('t5-small')
-            
-            # Initialize sentence transformer for embeddings
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self._tokenizer, self._model = self._load_t5()
             
             # Download required NLTK data
-            try:
-                nltk.data.find('tokenizers/punkt')
-            except LookupError:
-                nltk.download('punkt')
+            self.registry.ensure_nltk_data('tokenizers/punkt', 'punkt')
                 
             print("✓ AI models loaded successfully")
         except Exception as e:
             print(f"Warning: Error loading AI models: {str(e)}")
-            self.tokenizer = None
-            self.model = None
-            self.sentence_model = None
+            self._tokenizer = None
+            self._model = None
+    
+    def _ensure_sentence_model(self):
+        """Fetch the sentence model from the registry the first time it is needed"""
+        if self._sentence_loaded:
+            return
+        self._sentence_loaded = True
+        
+        try:
+            # Initialize sentence transformer for the semantic index; it is
+            # independent of T5, so search works with fallback summaries too
+            self._sentence_model = self.registry.get_sentence_model(self.embedding_model_name)
+        except Exception as e:
+            print(f"Warning: Error loading embedding model: {str(e)}")
+            self._sentence_model = None
+    
+    def _load_t5(self):
+        """Load T5 on the configured backend, falling back to fp32 if that backend fails"""
+        if self.inference_backend != 'fp32':
+            try:
+                tokenizer, model = self.registry.get_t5(self.model_name, self.inference_backend)
+                self.active_backend = self.inference_backend
+                return tokenizer, model
+            except Exception as e:
+                print(f"Warning: {self.inference_backend} backend unavailable ({str(e)}); using fp32")
+        tokenizer, model = self.registry.get_t5(self.model_name)
+        self.active_backend = 'fp32'
+        return tokenizer, model
+    
+    @property
+    def model_ready(self) -> bool:
+        """True when T5 is loaded on the configured backend; never triggers a load"""
+        return self._model is not None and self.active_backend == self.inference_backend
+    
+    @property
+    def tokenizer(self):
+        self._ensure_models()
+        return self._tokenizer
+    
+    @tokenizer.setter
+    def tokenizer(self, value):
+        self._models_loaded = True
+        self._tokenizer = value
+    
+    @property
+    def model(self):
+        self._ensure_models()
+        return self._model
+    
+    @model.setter
+    def model(self, value):
+        self._models_loaded = True
+        self._model = value
+        self.active_backend = self.inference_backend if value is not None else None
+    
+    @property
+    def sentence_model(self):
+        self._ensure_sentence_model()
+        return self._sentence_model
+    
+    @sentence_model.setter
+    def sentence_model(self, value):
+        self._sentence_loaded = True
+        self._sentence_model = value
+    
+    def embed_texts(self, texts: List[str], batch_size: int = 32):
+        """L2-normalized sentence embeddings as a float32 array, or None without a model"""
+        if not texts or self.sentence_model is None:
+            return None
+        metrics = get_metrics()
+        with metrics.timer('embed_seconds'), self.registry.inference_mode():
+            vectors = self.sentence_model.encode(
+                texts, batch_size=batch_size, convert_to_numpy=True,
+                normalize_embeddings=True, show_progress_bar=False
+            )
+        metrics.inc('texts_embedded_total', len(texts))
+        return vectors.astype('float32', copy=False)
+    
+    def settings_fingerprint(self) -> Dict[str, Any]:
+        """Describe the model and prompt settings that shape a summary (used in cache keys)
+        
+        Built from configuration only, so computing a cache key never loads a model.
+        """
+        return {
+            'model': self.model_name,
+            'backend': self.inference_backend,
+            'prompt_prefix': 'summarize: ',
+            'max_input_chars': self.max_input_chars,
+            'long_document_mode': self.long_document_mode,
+            'chunk_tokens': self.chunk_tokens,
+            'max_chunks_per_document': self.max_chunks_per_document,
+            'email_lengths': [150, 40],
+            'document_lengths': [100, 20],
+            'decoding': self.decoding_policy.fingerprint(),
+            'dedup': self.deduplicator is not None,
+            'entities': 'tfidf'
+        }
     
     def generate_comprehensive_summary(self, email_data: Dict[str, Any], 
                                      extracted_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate comprehensive summary of email and extracted documents"""
+        return self.generate_comprehensive_summaries([(email_data, extracted_docs)])[0]
+    
+    def generate_comprehensive_summaries(self, items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """Generate comprehensive summaries for a run of emails with batched AI inference
+        
+        All email bodies and document texts in the run are summarized together
+        so the model sees a few padded batches instead of one call per text.
+        Before that, near-duplicate emails and repeated attachments are
+        collapsed so each distinct text is summarized once.
+        Results are returned in the same order as the input items.
+        """
+        email_texts, email_keys, email_sources = [], [], []
+        doc_texts, doc_keys, doc_sources = [], [], []
         
+        try:
+            # Collect every text of the run before touching the model
+            for email_data, extracted_docs in items:
+                filename = self._safe_get_string(email_data.get('filename', ''))
+                text = self._build_email_text(email_data)
+                email_texts.append(text)
+                email_keys.append(self.deduplicator.email_key(email_data) if text and self.deduplicator else None)
+                email_sources.append(filename)
+                for doc in extracted_docs:
+                    text = self._build_document_text(doc)
+                    doc_texts.append(text)
+                    doc_keys.append(Deduplicator.document_key(text) if text and self.deduplicator else None)
+                    doc_sources.append(filename)
+            
+            with get_metrics().timer('summarize_seconds', kind='email'):
+                email_ai, email_origins, email_decoding = self._summarize_unique(
+                    email_texts, email_keys, email_sources, 'email', max_length=150, min_length=40)
+            # Once per email, however many generate calls and retries it took
+            self.decoding_policy.emails_done(len(items))
+            with get_metrics().timer('summarize_seconds', kind='document'):
+                doc_ai, _, doc_decoding = self._summarize_unique(
+                    doc_texts, doc_keys, doc_sources, 'document', max_length=100, min_length=20)
+        except Exception as e:
+            print(f"Batched summarization failed: {str(e)}")
+            email_ai, doc_ai = None, None
+        
+        # Score the keywords of every email against the corpus in one pass
+        entities = self._extract_entities_batch(items)
+        
+        results = []
+        doc_offset = 0
+        
+        for index, (email_data, extracted_docs) in enumerate(items):
+            if email_ai is None:
+                results.append(self._create_fallback_summary(email_data, extracted_docs))
+                continue
+            
+            # Hand each email its own slice of the batched results
+            doc_summaries = doc_ai[doc_offset:doc_offset + len(extracted_docs)]
+            doc_decodings = doc_decoding[doc_offset:doc_offset + len(extracted_docs)]
+            doc_offset += len(extracted_docs)
+            
+            summary = self._assemble_summary(email_data, extracted_docs, email_ai[index], doc_summaries,
+                                             entities[index], email_decoding[index], doc_decodings)
+            origin = email_origins[index]
+            if origin and origin != email_sources[index]:
+                summary['duplicate_of'] = origin
+            results.append(summary)
+        
+        return results
+    
+    def _summarize_unique(self, texts: List[Optional[str]], keys: List[Optional[str]], sources: List[str],
+                          kind: str, max_length: int, min_length: int) -> Tuple[List[Optional[str]], List[Optional[str]], List[Optional[Dict[str, Any]]]]:
+        """Summarize each distinct dedup key once, reusing summaries remembered from earlier runs
+        
+        Returns the summary for every text (None where the text is None),
+        for reused summaries the file the summary was first produced for, and
+        the decoding that produced each summary. Fallback summaries are not
+        remembered, so a later run with the model loaded summarizes them properly.
+        """
+        metrics = get_metrics()
+        summaries: List[Optional[str]] = [None] * len(texts)
+        origins: List[Optional[str]] = [None] * len(texts)
+        decodings: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        groups: Dict[Any, List[int]] = {}
+        
+        for index, (text, key) in enumerate(zip(texts, keys)):
+            if not text:
+                continue
+            remembered = self.deduplicator.get(key) if key is not None else None
+            if remembered is not None:
+                summaries[index] = remembered['summary']
+                origins[index] = remembered['source']
+                decodings[index] = remembered.get('decoding')
+                metrics.inc('dedup_reused_total', kind=kind, source='memory')
+                continue
+            # Texts without a key are summarized on their own
+            groups.setdefault(key if key is not None else index, []).append(index)
+        
+        unique = list(groups.values())
+        generated, generated_decodings = self._summarize_texts(
+            [texts[group[0]] for group in unique], max_length, min_length, kind)
+        
+        for group, summary, decoding in zip(unique, generated, generated_decodings):
+            first = group[0]
+            if keys[first] is not None and decoding != FALLBACK_DECODING:
+                self.deduplicator.put(keys[first], summary, sources[first], decoding)
+            for index in group:
+                summaries[index] = summary
+                decodings[index] = decoding
+                if index != first:
+                    origins[index] = sources[first]
+                    metrics.inc('dedup_reused_total', kind=kind, source='batch')
+        
+        return summaries, origins, decodings
+    
+    def _assemble_summary(self, email_data: Dict[str, Any], extracted_docs: List[Dict[str, Any]],
+                          email_summary: Optional[str] = None,
+                          doc_summaries: Optional[List[Optional[str]]] = None,
+                          entities: Optional[Dict[str, Any]] = None,
+                          email_decoding: Optional[Dict[str, Any]] = None,
+                          doc_decodings: Optional[List[Optional[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """Build the summary structure for one email from precomputed AI summaries"""
         try:
             # Extract key information with safe handling
-            email_summary = self._summarize_email(email_data)
-            document_summaries = self._summarize_documents(extracted_docs)
-            key_entities = self._extract_entities(email_data, extracted_docs)
+            email_summary = self._summarize_email(email_data, email_summary)
+            document_summaries = self._summarize_documents(extracted_docs, doc_summaries, doc_decodings)
+            if entities is None:
+                entities = self._extract_entities_batch([(email_data, extracted_docs)])[0]
             
             # Create comprehensive summary
             comprehensive_summary = {
@@ -43,11 +307,15 @@ class EmailSummarizer:
                     'sender': self._safe_get_string(email_data.get('sender', '')),
                     'subject': self._safe_get_string(email_data.get('subject', '')),
                     'date': self._safe_get_string(email_data.get('date', '')),
-                    'filename': self._safe_get_string(email_data.get('filename', ''))
+                    'filename': self._safe_get_string(email_data.get('filename', '')),
+                    'thread_id': thread_id(email_data)
                 },
                 'email_summary': email_summary,
+                # Which decoding policy produced the email summary
+                'decoding': email_decoding,
                 'document_summaries': document_summaries,
-                'key_entities': key_entities,
+                'key_entities': entities['key_entities'],
+                'domain_entities': entities['domain_entities'],
                 'total_attachments': len(email_data.get('attachments', [])),
                 'processed_documents': len(extracted_docs)
             }
@@ -70,8 +338,8 @@ class EmailSummarizer:
         else:
             return str(value)
     
-    def _summarize_email(self, email_data: Dict[str, Any]) -> str:
-        """Generate summary of email content with safe text handling"""
+    def _build_email_text(self, email_data: Dict[str, Any]) -> Optional[str]:
+        """Build the text to summarize for an email, or None if it has minimal content"""
         try:
             subject = self._safe_get_string(email_data.get('subject', ''))
             body = self._safe_get_string(email_data.get('body', ''))
@@ -81,41 +349,90 @@ class EmailSummarizer:
             
             # Ensure we have some content to summarize
             if not email_text.strip() or len(email_text.strip()) < 10:
+                return None
+            
+            return email_text
+        except Exception:
+            return None
+    
+    def _build_document_text(self, doc: Dict[str, Any]) -> Optional[str]:
+        """Return the extracted text of a document, or None if it has minimal text"""
+        try:
+            extracted_text = self._safe_get_string(doc.get('extracted_text', ''))
+            if extracted_text and len(extracted_text.strip()) > 10:
+                return extracted_text
+        except Exception:
+            pass
+        return None
+    
+    def _summarize_texts(self, texts: List[str], max_length: int, min_length: int,
+                         kind: str = 'email') -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Summarize texts with the AI model when available, otherwise with the fallback
+        
+        Returns the summaries and the decoding that produced each one.
+        """
+        if not texts:
+            return [], []
+        if self.tokenizer and self.model:
+            return self._summarize_batch_decoded(texts, max_length, min_length, kind)
+        return [self._fallback_summarize(text) for text in texts], [FALLBACK_DECODING] * len(texts)
+    
+    def _summarize_email(self, email_data: Dict[str, Any], ai_summary: Optional[str] = None) -> str:
+        """Generate summary of email content with safe text handling"""
+        try:
+            email_text = self._build_email_text(email_data)
+            if email_text is None:
                 return "Email contains minimal content or could not be processed."
             
-            # Use AI summarization if models are available
-            if self.tokenizer and self.model:
-                return self._ai_summarize_text(email_text, max_length=150, min_length=40)
-            else:
-                return self._fallback_summarize(email_text)
+            # Use the batched summary when the caller already computed it
+            if ai_summary is not None:
+                return ai_summary
+            
+            return self._summarize_texts([email_text], max_length=150, min_length=40)[0][0]
                 
         except Exception as e:
             print(f"Error summarizing email: {str(e)}")
             return "Error generating email summary."
     
-    def _summarize_documents(self, extracted_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _summarize_documents(self, extracted_docs: List[Dict[str, Any]],
+                             ai_summaries: Optional[List[Optional[str]]] = None,
+                             decodings: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
         """Generate summaries for extracted documents with safe handling"""
         document_summaries = []
         
-        for doc in extracted_docs:
+        if ai_summaries is None:
+            # Summarize all documents of this email in one batch
+            texts = [self._build_document_text(doc) for doc in extracted_docs]
+            try:
+                batch, batch_decodings = self._summarize_texts(
+                    [t for t in texts if t], max_length=100, min_length=20, kind='document')
+                batch, batch_decodings = iter(batch), iter(batch_decodings)
+                ai_summaries = [next(batch) if text else None for text in texts]
+                decodings = [next(batch_decodings) if text else None for text in texts]
+            except Exception as e:
+                print(f"Error batch summarizing documents: {str(e)}")
+                ai_summaries = [None] * len(extracted_docs)
+        if decodings is None:
+            decodings = [None] * len(extracted_docs)
+        
+        for doc, ai_summary, decoding in zip(extracted_docs, ai_summaries, decodings):
             try:
                 extracted_text = self._safe_get_string(doc.get('extracted_text', ''))
                 filename = self._safe_get_string(doc.get('filename', 'unknown'))
                 content_type = self._safe_get_string(doc.get('content_type', 'unknown'))
                 
-                if extracted_text and len(extracted_text.strip()) > 10:
-                    # Generate summary for document
-                    if self.tokenizer and self.model:
-                        summary = self._ai_summarize_text(extracted_text, max_length=100, min_length=20)
-                    else:
-                        summary = self._fallback_summarize(extracted_text)
+                if self._build_document_text(doc) is None:
+                    summary, decoding = "Document contains minimal text or could not be processed.", None
+                elif ai_summary is not None:
+                    summary = ai_summary
                 else:
-                    summary = "Document contains minimal text or could not be processed."
+                    summary, decoding = self._fallback_summarize(extracted_text), FALLBACK_DECODING
                 
                 document_summaries.append({
                     'filename': filename,
                     'content_type': content_type,
                     'summary': summary,
+                    'decoding': decoding,
                     'word_count': len(extracted_text.split()) if extracted_text else 0
                 })
                 
@@ -125,16 +442,266 @@ class EmailSummarizer:
         
         return document_summaries
     
-    def _ai_summarize_text(self, text: str, max_length: int = 150, min_length: int = 40) -> str:
-        """Generate AI summary with proper text truncation and bounds checking - FIXED VERSION"""
+    def summarize_batch(self, texts: List[str], max_length: int = 150, min_length: int = 40,
+                        kind: str = 'email') -> List[str]:
+        """Summarize many texts with one padded generate call per length bucket
+        
+        Inputs are sorted by token length and grouped into buckets of
+        ``batch_size`` so padding stays small. Any bucket that fails is retried
+        item by item, so each text keeps its own fallback. Texts longer than
+        ``max_input_chars`` go through the chunked map-reduce path when
+        ``long_document_mode`` is on. ``kind`` ('email' or 'document') steers
+        the decoding policy.
+        """
+        return self._summarize_batch_decoded(texts, max_length, min_length, kind)[0]
+    
+    def _summarize_batch_decoded(self, texts: List[str], max_length: int, min_length: int,
+                                 kind: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """summarize_batch, also returning the decoding that produced each summary"""
+        if not texts:
+            return [], []
+        
+        summaries = [None] * len(texts)
+        decodings = [None] * len(texts)
+        long_indices = [
+            i for i, text in enumerate(texts)
+            if self.long_document_mode and len(text) > self.max_input_chars
+        ]
+        long_set = set(long_indices)
+        short_indices = [i for i in range(len(texts)) if i not in long_set]
+        
+        short_summaries, short_decodings = self._summarize_inputs(
+            [self._prepare_input_text(texts[i]) for i in short_indices],
+            [texts[i] for i in short_indices],
+            max_length, min_length, kind
+        )
+        for i, summary, decoding in zip(short_indices, short_summaries, short_decodings):
+            summaries[i] = summary
+            decodings[i] = decoding
+        
+        if long_indices:
+            try:
+                long_summaries, long_decodings = self._summarize_long_documents(
+                    [texts[i] for i in long_indices], max_length, min_length, kind
+                )
+            except Exception as e:
+                print(f"Long document summarization failed, using truncated input: {str(e)}")
+                long_results = [self._ai_summarize_decoded(texts[i], max_length, min_length, kind)
+                                for i in long_indices]
+                long_summaries = [summary for summary, _ in long_results]
+                long_decodings = [decoding for _, decoding in long_results]
+            for i, summary, decoding in zip(long_indices, long_summaries, long_decodings):
+                summaries[i] = summary
+                decodings[i] = decoding
+        
+        return summaries, decodings
+    
+    def _summarize_inputs(self, prepared: List[str], originals: List[str], max_length: int,
+                          min_length: int, kind: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Length-bucket already prefixed inputs and generate one batch per bucket"""
+        if not prepared:
+            return [], []
+        
+        summaries = [None] * len(prepared)
+        decodings = [None] * len(prepared)
+        
         try:
-            # Safely truncate text to avoid token limits
-            max_input_chars = 900  # Conservative limit to avoid tokenization issues
-            if len(text) > max_input_chars:
-                text = text[:max_input_chars] + "..."
+            lengths = [
+                len(self.tokenizer.encode(text, max_length=512, truncation=True))
+                for text in prepared
+            ]
+        except Exception as e:
+            print(f"AI summarization failed: {str(e)}")
+            return [self._fallback_summarize(text) for text in originals], [FALLBACK_DECODING] * len(prepared)
+        
+        # Length-bucket: neighbours in sorted order have similar token counts
+        order = sorted(range(len(prepared)), key=lambda i: lengths[i])
+        for start in range(0, len(order), self.batch_size):
+            bucket = order[start:start + self.batch_size]
+            try:
+                bucket_summaries, settings = self._generate_bucket(
+                    [prepared[i] for i in bucket],
+                    [lengths[i] for i in bucket],
+                    max_length, min_length, kind
+                )
+                for i, summary in zip(bucket, bucket_summaries):
+                    if summary.strip():
+                        summaries[i], decodings[i] = summary, settings.describe()
+                    else:
+                        summaries[i], decodings[i] = self._fallback_summarize(originals[i]), FALLBACK_DECODING
+            except Exception as e:
+                print(f"Batched summarization failed, retrying per item: {str(e)}")
+                for i in bucket:
+                    summaries[i], decodings[i] = self._ai_summarize_decoded(originals[i], max_length,
+                                                                            min_length, kind)
+        
+        return summaries, decodings
+    
+    def _summarize_long_documents(self, texts: List[str], max_length: int, min_length: int,
+                                  kind: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Map-reduce summarization for texts that don't fit in one model window
+        
+        Each text is split into token-aware chunks (at most
+        ``max_chunks_per_document``, sampled evenly across the text). All
+        chunks of all documents are summarized together in batches, then the
+        chunk summaries of each document are joined and reduced the same way
+        until a single chunk remains. Intermediate levels decode as 'chunk'
+        text; a document's recorded decoding is that of its last level.
+        """
+        metrics = get_metrics()
+        final = [None] * len(texts)
+        final_decodings = [None] * len(texts)
+        current = {}
+        
+        for doc_index, text in enumerate(texts):
+            chunks = self._chunk_text(text)
+            metrics.inc('long_document_chunks_total', len(chunks))
+            current[doc_index] = self._limit_chunks(chunks)
+        
+        for level in range(self.max_reduce_levels):
+            if not current:
+                break
+            
+            # One batched pass over every chunk still being reduced; single
+            # chunks are final summaries and decode as the caller's kind
+            doc_order = list(current)
+            for level_kind, docs in ((kind, [d for d in doc_order if len(current[d]) == 1]),
+                                     ('chunk', [d for d in doc_order if len(current[d]) > 1])):
+                chunks = [chunk for doc_index in docs for chunk in current[doc_index]]
+                chunk_summaries, chunk_decodings = self._summarize_inputs(
+                    [f"summarize: {chunk}" for chunk in chunks], chunks, max_length, min_length, level_kind
+                )
+                offset = 0
+                for doc_index in docs:
+                    count = len(current[doc_index])
+                    current[doc_index] = (chunk_summaries[offset:offset + count],
+                                          chunk_decodings[offset + count - 1])
+                    offset += count
+                metrics.inc('long_document_generate_inputs_total', len(chunks), level=level)
+            
+            next_level = {}
+            for doc_index in doc_order:
+                summaries, decoding = current[doc_index]
+                final_decodings[doc_index] = decoding
+                if len(summaries) == 1:
+                    final[doc_index] = summaries[0]
+                else:
+                    next_level[doc_index] = self._limit_chunks(self._chunk_text(' '.join(summaries)))
+            current = next_level
+        
+        # Out of reduce levels: keep the partial summaries rather than dropping them
+        for doc_index, chunks in current.items():
+            final[doc_index] = ' '.join(chunks)
+        
+        return final, final_decodings
+    
+    def _chunk_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most ``chunk_tokens`` tokens on sentence boundaries"""
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+|\n+', text) if s.strip()]
+        if not sentences:
+            return [text]
+        
+        token_ids = self.tokenizer(sentences, add_special_tokens=False)['input_ids']
+        chunks = []
+        current, current_tokens = [], 0
+        
+        for sentence, ids in zip(sentences, token_ids):
+            if len(ids) > self.chunk_tokens:
+                # A single sentence longer than the window is cut by tokens
+                if current:
+                    chunks.append(' '.join(current))
+                    current, current_tokens = [], 0
+                for start in range(0, len(ids), self.chunk_tokens):
+                    chunks.append(self.tokenizer.decode(ids[start:start + self.chunk_tokens],
+                                                        skip_special_tokens=True))
+                continue
             
+            if current_tokens + len(ids) > self.chunk_tokens and current:
+                chunks.append(' '.join(current))
+                current, current_tokens = [], 0
+            current.append(sentence)
+            current_tokens += len(ids)
+        
+        if current:
+            chunks.append(' '.join(current))
+        return chunks
+    
+    def _limit_chunks(self, chunks: List[str]) -> List[str]:
+        """Cap compute per document by keeping evenly spaced chunks"""
+        if len(chunks) <= self.max_chunks_per_document:
+            return chunks
+        step = len(chunks) / float(self.max_chunks_per_document)
+        return [chunks[int(i * step)] for i in range(self.max_chunks_per_document)]
+    
+    def _generate_bucket(self, input_texts: List[str], lengths: List[int], max_length: int,
+                         min_length: int, kind: str) -> Tuple[List[str], DecodingSettings]:
+        """Run a single generate call over one padded bucket of inputs"""
+        inputs = self.tokenizer(
+            input_texts,
+            return_tensors='pt',
+            max_length=512,
+            truncation=True,
+            padding=True
+        )
+        
+        # Output budget from the longest input, minimum from the shortest
+        settings = self.decoding_policy.choose(kind, max(lengths), max_length, min_length,
+                                               batch_rows=len(input_texts), shortest_input=min(lengths))
+        
+        metrics = get_metrics()
+        metrics.inc('generate_texts_total', len(input_texts), path='batch', num_beams=settings.num_beams)
+        metrics.inc('generate_input_tokens_total', sum(lengths), path='batch')
+        
+        start = time.perf_counter()
+        with self.registry.inference_mode(), metrics.timer('generate_seconds', path='batch',
+                                                           num_beams=settings.num_beams,
+                                                           backend=self.active_backend):
+            summary_ids = self.model.generate(
+                inputs['input_ids'],
+                attention_mask=inputs['attention_mask'],
+                **self._generate_kwargs(settings)
+            )
+        self.decoding_policy.record(settings, len(input_texts), int(summary_ids.shape[1]) - 1,
+                                    time.perf_counter() - start)
+        
+        metrics.inc('generate_output_tokens_total',
+                    int((summary_ids != self.tokenizer.pad_token_id).sum()), path='batch')
+        return self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True), settings
+    
+    @staticmethod
+    def _generate_kwargs(settings: DecodingSettings) -> Dict[str, Any]:
+        """model.generate() arguments for a decoding choice"""
+        kwargs = {
+            'max_new_tokens': settings.max_new_tokens,
+            'min_new_tokens': settings.min_new_tokens,
+            'num_beams': settings.num_beams,
+            'do_sample': False
+        }
+        if settings.num_beams > 1:
+            # Only meaningful for beam search; greedy decoding warns about them
+            kwargs['length_penalty'] = settings.length_penalty
+            kwargs['early_stopping'] = True
+        return kwargs
+    
+    def _prepare_input_text(self, text: str) -> str:
+        """Truncate text and add the T5 task prefix"""
+        # Safely truncate text to avoid token limits
+        if len(text) > self.max_input_chars:
+            text = text[:self.max_input_chars] + "..."
+        
+        return f"summarize: {text}"
+    
+    def _ai_summarize_text(self, text: str, max_length: int = 150, min_length: int = 40,
+                           kind: str = 'email') -> str:
+        """Generate AI summary with proper text truncation and bounds checking - FIXED VERSION"""
+        return self._ai_summarize_decoded(text, max_length, min_length, kind)[0]
+    
+    def _ai_summarize_decoded(self, text: str, max_length: int, min_length: int,
+                              kind: str) -> Tuple[str, Dict[str, Any]]:
+        """Summarize one text on its own; returns the summary and the decoding used"""
+        try:
             # Prepare input with bounds checking
-            input_text = f"summarize: {text}"
+            input_text = self._prepare_input_text(text)
             
             # Tokenize with safe parameters
             input_ids = self.tokenizer.encode(
@@ -145,30 +712,34 @@ class EmailSummarizer:
                 padding=False
             )
             
-            # FIXED: Proper tensor length handling
+            # Output budget follows the input length, so short texts stay cheap
             input_length = input_ids.shape[1]  # Get actual sequence length
-            safe_min_length = min(min_length, max(1, input_length // 3))  # Ensure reasonable min_length
-            safe_max_length = max(max_length, input_length + 20)  # Ensure max_length > input_length
+            settings = self.decoding_policy.choose(kind, input_length, max_length, min_length)
             
             # Generate summary with safe parameters
-            summary_ids = self.model.generate(
-                input_ids,
-                max_length=safe_max_length,
-                min_length=safe_min_length,
-                length_penalty=2.0,
-                num_beams=4,
-                early_stopping=True,
-                do_sample=False
-            )
+            metrics = get_metrics()
+            metrics.inc('generate_texts_total', path='single', num_beams=settings.num_beams)
+            metrics.inc('generate_input_tokens_total', input_length, path='single')
+            
+            start = time.perf_counter()
+            with self.registry.inference_mode(), metrics.timer('generate_seconds', path='single',
+                                                               num_beams=settings.num_beams,
+                                                               backend=self.active_backend):
+                summary_ids = self.model.generate(input_ids, **self._generate_kwargs(settings))
+            self.decoding_policy.record(settings, 1, int(summary_ids.shape[1]) - 1, time.perf_counter() - start)
             
+            metrics.inc('generate_output_tokens_total',
+                        int((summary_ids != self.tokenizer.pad_token_id).sum()), path='single')
             summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
             
             # Ensure we return a non-empty summary
-            return summary if summary.strip() else self._fallback_summarize(text)
+            if summary.strip():
+                return summary, settings.describe()
+            return self._fallback_summarize(text), FALLBACK_DECODING
             
         except Exception as e:
             print(f"AI summarization failed: {str(e)}")
-            return self._fallback_summarize(text)
+            return self._fallback_summarize(text), FALLBACK_DECODING
     
     def _fallback_summarize(self, text: str) -> str:
         """Simple fallback summarization using first few sentences"""
@@ -198,65 +769,59 @@ class EmailSummarizer:
             print(f"Fallback summarization failed: {str(e)}")
             return "Unable to generate summary."
     
-    def _extract_entities(self, email_data: Dict[str, Any], 
-                         extracted_docs: List[Dict[str, Any]]) -> List[str]:
-        """Extract key entities with safe text handling - FIXED VERSION"""
+    def _extract_entities_batch(self, items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """Key entities and shipping identifiers for each email, scored as one batch"""
+        texts = []
+        for email_data, extracted_docs in items:
+            parts = [self._safe_get_string(email_data.get('body', ''))]
+            parts.extend(self._safe_get_string(doc.get('extracted_text', '')) for doc in extracted_docs)
+            texts.append(' '.join(part for part in parts if part))
+        
+        empty_domain = {'containers': [], 'air_waybills': [], 'bills_of_lading': [], 'ports': []}
         try:
-            # Safely combine all text
-            all_text = ""
-            
-            body = self._safe_get_string(email_data.get('body', ''))
-            if body:
-                all_text += body + " "
-            
-            for doc in extracted_docs:
-                doc_text = self._safe_get_string(doc.get('extracted_text', ''))
-                if doc_text:
-                    all_text += doc_text + " "
-            
-            if not all_text.strip():
-                return ["No entities found"]
-            
-            # Basic keyword extraction with bounds checking
-            words = all_text.lower().split()
-            word_freq = {}
-            
-            for word in words:
-                if len(word) > 3 and word.isalpha():
-                    word_freq[word] = word_freq.get(word, 0) + 1
-            
-            if not word_freq:
-                return ["No significant keywords found"]
-            
-            # FIXED: The bug was here - now properly sorting by frequency (x[1])
-            sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-            return [word for word, freq in sorted_words[:10]]
-            
+            extracted = self.entity_extractor.extract_batch(texts)
         except Exception as e:
             print(f"Error extracting entities: {str(e)}")
-            return ["Entity extraction failed"]
+            return [{'key_entities': ["Entity extraction failed"], 'domain_entities': empty_domain}
+                    for _ in texts]
+        
+        results = []
+        for text, found in zip(texts, extracted):
+            domain = found['domain_entities']
+            if not text.strip():
+                key_entities = ["No entities found"]
+            else:
+                # Identifiers first: a container number says more than any keyword
+                identifiers = [value for values in domain.values() for value in values]
+                key_entities = (identifiers + found['keywords'])[:10] or ["No significant keywords found"]
+            results.append({'key_entities': key_entities, 'domain_entities': domain})
+        return results
     
     def _create_fallback_summary(self, email_data: Dict[str, Any], 
                                 extracted_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Create a basic summary when AI processing fails"""
+        """Create a basic summary when AI processing fails, with the same keys as a model summary"""
         return {
             'email_metadata': {
                 'sender': self._safe_get_string(email_data.get('sender', '')),
                 'subject': self._safe_get_string(email_data.get('subject', '')),
                 'date': self._safe_get_string(email_data.get('date', '')),
-                'filename': self._safe_get_string(email_data.get('filename', ''))
+                'filename': self._safe_get_string(email_data.get('filename', '')),
+                'thread_id': thread_id(email_data)
             },
             'email_summary': "Basic email information extracted (AI processing unavailable)",
+            'decoding': FALLBACK_DECODING,
             'document_summaries': [
                 {
                     'filename': self._safe_get_string(doc.get('filename', 'unknown')),
                     'content_type': self._safe_get_string(doc.get('content_type', 'unknown')),
                     'summary': "Document processed (AI summary unavailable)",
+                    'decoding': FALLBACK_DECODING,
                     'word_count': len(self._safe_get_string(doc.get('extracted_text', '')).split())
                 }
                 for doc in extracted_docs
             ],
             'key_entities': ["Processing completed with basic extraction"],
+            'domain_entities': extract_domain_entities(''),
             'total_attachments': len(email_data.get('attachments', [])),
             'processed_documents': len(extracted_docs)
         }
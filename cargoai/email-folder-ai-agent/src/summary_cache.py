@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from metrics import get_metrics
+
+# Seconds a statement waits for another process's write lock before failing
+BUSY_TIMEOUT = 10.0
+
+
+class SummaryCache:
+    """Persistent content-addressed cache for extraction and summary results
+
+    Entries live in a small SQLite database and are keyed by a hash of the
+    input bytes plus the settings that produced them. When the stored values
+    grow past ``max_bytes`` the least recently used entries are evicted.
+    Worker processes share the database; a lookup or store that still fails
+    (e.g. "database is locked") counts as a miss or is skipped, never as an
+    error for the caller.
+    """
+
+    def __init__(self, cache_path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(cache_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        # WAL lets worker processes read while another one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache_entries (
+                   key TEXT PRIMARY KEY,
+                   namespace TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   last_access REAL NOT NULL
+               )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash bytes and strings into a single cache key"""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode('utf-8')
+            elif not isinstance(part, (bytes, bytearray, memoryview)):
+                part = json.dumps(part, sort_keys=True, default=str).encode('utf-8')
+            # Length prefix keeps ("ab", "c") and ("a", "bc") apart
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return the cached value or None, counting the hit or miss"""
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM cache_entries WHERE key = ? AND namespace = ?",
+                    (key, namespace)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Cache lookup failed, treating as a miss: {str(e)}")
+                row = None
+
+            if row is None:
+                self.misses += 1
+                get_metrics().inc('cache_lookups_total', namespace=namespace, result='miss')
+                return None
+
+            self.hits += 1
+            get_metrics().inc('cache_lookups_total', namespace=namespace, result='hit')
+            try:
+                self._conn.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # Only the LRU order is lost
+                self._conn.rollback()
+                print(f"Cache access time not updated: {str(e)}")
+
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def put(self, namespace: str, key: str, value: Any):
+        """Store a JSON-serialisable value and evict old entries if needed"""
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            print(f"Cache store skipped: {str(e)}")
+            return
+
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, namespace, value, size, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, namespace, payload, len(payload), time.time())
+                )
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                print(f"Cache store skipped: {str(e)}")
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM cache_entries ORDER BY last_access ASC"
+        ).fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes
+        }
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,155 @@
+import json
+import re
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from metrics import get_metrics
+from results_store import ResultsStore
+
+# Changes are read this many at a time, oldest first; memory stays bounded
+# by the batch however many emails the store holds
+EXPORT_BATCH = 5000
+
+# Another process may still commit a change stamped this long ago; such
+# recent changes are left for the next export so a cursor never skips one
+SETTLE_SECONDS = 2.0
+
+_CURSOR_PATTERN = re.compile(r'^(\d+(?:\.\d+)?):(.*)$', re.DOTALL)
+
+# (change time in Unix seconds, email filename): exports resume after a cursor
+Cursor = Tuple[float, str]
+
+
+def parse_since(value: Optional[str]) -> Cursor:
+    """A cursor from an export record, a Unix timestamp or an ISO date/datetime
+
+    A timestamp includes the changes made at that instant; a cursor
+    resumes right after the record it was taken from.
+    """
+    if not value:
+        return (0.0, '')
+    match = _CURSOR_PATTERN.match(value)
+    if match:
+        return (float(match.group(1)), match.group(2))
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            raise ValueError(f"Invalid since value: {value!r} (expected a cursor, Unix time or ISO date)")
+    return (seconds, '')
+
+
+def format_cursor(cursor: Cursor) -> str:
+    # repr round-trips the float exactly, so resuming never repeats or skips a record
+    return f"{cursor[0]!r}:{cursor[1]}"
+
+
+class SummaryExporter:
+    """Stream the summaries of a ResultsStore as NDJSON
+
+    Records come in the order the emails last changed, each carrying the
+    cursor to resume after it, so a downstream system can sync
+    incrementally: pass the last cursor it received as ``since``. A
+    reprocessed email is exported again with its new summary, and an email
+    that left the folder comes as a tombstone (``deleted`` set, no summary);
+    consumers upsert or delete by ``email_filename``. Each batch is one
+    indexed range query on the store.
+    """
+
+    def __init__(self, store: ResultsStore, batch_size: int = EXPORT_BATCH,
+                 settle_seconds: float = SETTLE_SECONDS):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.settle_seconds = settle_seconds
+
+    def iter_records(self, since: Optional[Cursor] = None,
+                     limit: Optional[int] = None) -> Iterator[Tuple[Cursor, Dict[str, Any]]]:
+        """Yield (cursor, record) for every summary or deletion after ``since``"""
+        cursor = since or (0.0, '')
+        horizon = time.time() - self.settle_seconds
+        remaining = limit
+
+        while remaining is None or remaining > 0:
+            size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            rows = self.store.changes(cursor, horizon, size)
+            for changed_at, name, output_file, summary in rows:
+                cursor = (changed_at, name)
+                record = self._record(changed_at, name, output_file, summary)
+                if record is None:
+                    continue
+                if remaining is not None:
+                    remaining -= 1
+                yield cursor, record
+            if len(rows) < size:
+                return
+
+    def iter_ndjson(self, since: Optional[Cursor] = None, limit: Optional[int] = None,
+                    compress: bool = False) -> Iterator[bytes]:
+        """NDJSON export as byte chunks, gzip-compressed when ``compress`` is set"""
+        return self._encode(self.iter_records(since, limit), compress)
+
+    def export(self, stream: BinaryIO, since: Optional[Cursor] = None, limit: Optional[int] = None,
+               compress: bool = False) -> Dict[str, Any]:
+        """Write the export to a binary stream; returns the record count and the cursor to resume from"""
+        progress = {'records': 0, 'cursor': since}
+
+        def tracked():
+            for cursor, record in self.iter_records(since, limit):
+                progress['records'] += 1
+                progress['cursor'] = cursor
+                yield cursor, record
+
+        with get_metrics().timer('export_seconds'):
+            for chunk in self._encode(tracked(), compress):
+                stream.write(chunk)
+        cursor = progress['cursor']
+        return {'records': progress['records'], 'cursor': format_cursor(cursor) if cursor else None}
+
+    @staticmethod
+    def _encode(records: Iterator[Tuple[Cursor, Dict[str, Any]]], compress: bool) -> Iterator[bytes]:
+        """One JSON line per record, written out every 100 records"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        buffer, count = [], 0
+
+        for cursor, record in records:
+            record['cursor'] = format_cursor(cursor)
+            buffer.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+            count += 1
+            if len(buffer) >= 100:
+                chunk = b''.join(buffer)
+                buffer = []
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+
+        chunk = b''.join(buffer)
+        if compressor:
+            # Closes the gzip member, so an empty export is still a valid .gz file
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+        get_metrics().inc('export_records_total', count, compressed=str(compress).lower())
+
+    @staticmethod
+    def _record(changed_at: float, name: str, output_file: str,
+                summary: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The export record of one change, or None if its summary is unreadable"""
+        record = {
+            'email_filename': name,
+            'output_file': output_file,
+            'modified': datetime.fromtimestamp(changed_at).isoformat(timespec='microseconds'),
+            'deleted': summary is None
+        }
+        if summary is not None:
+            try:
+                record['summary'] = json.loads(summary)
+            except ValueError as e:
+                # stderr: the export itself may be going to stdout
+                print(f"Warning: skipping {name} in export: {str(e)}", file=sys.stderr)
+                return None
+        return record
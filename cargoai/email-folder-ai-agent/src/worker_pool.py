@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from email_parser import EmailParser
+from mailbox_reader import message_name
+from document_extractor import DocumentExtractor
+from summary_cache import SummaryCache
+from metrics import get_metrics
+
+# Per-process pipeline objects, created once by init_pipeline_worker
+_worker_parser = None
+_worker_extractor = None
+
+# Set in pool worker processes, which run every map in-process instead of
+# starting a pool of their own
+_in_worker = False
+
+
+class WorkerPool:
+    """Map a function over items, in a process pool when more than one worker is configured
+
+    Results always come back in input order. With ``workers <= 1`` everything
+    runs in the calling process, which keeps the serial path free of any
+    pickling or process start-up cost, and so does a pool used inside one of
+    its own worker processes. Metrics a task records in a worker process come
+    back with its result and are merged into the parent's.
+    """
+
+    def __init__(self, workers: int = 1, chunksize: int = 4,
+                 initializer: Optional[Callable] = None, initargs: Tuple = ()):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.chunksize = max(1, chunksize)
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor = None
+
+    @property
+    def parallel(self) -> bool:
+        """True if map runs in worker processes rather than in this process"""
+        return self.workers > 1 and not _in_worker
+
+    def map(self, fn: Callable, items: Iterable) -> List[Any]:
+        """Apply fn to every item and return the results in input order"""
+        return list(self.imap(fn, items))
+
+    def imap(self, fn: Callable, items: Iterable) -> Iterator[Any]:
+        """Like map, but yield each result in input order as soon as it is ready"""
+        items = list(items)
+        if not self.parallel or len(items) <= 1:
+            return (fn(item) for item in items)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.initializer, self.initargs)
+            )
+        return _merge_metrics(self._executor.map(partial(_call_with_metrics, fn), items,
+                                                 chunksize=self.chunksize))
+
+    def shutdown(self):
+        """Stop the worker processes, if any were started"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _init_worker(initializer: Optional[Callable], initargs: Tuple):
+    global _in_worker
+    _in_worker = True
+    # A forked worker starts with a copy of the parent's metrics; drop them so
+    # only the worker's own work is sent back
+    get_metrics().take()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _call_with_metrics(fn: Callable, item: Any) -> Tuple[Any, Dict[str, Any]]:
+    """Pool task: run fn and return its result with the metrics it recorded"""
+    result = fn(item)
+    return result, get_metrics().take()
+
+
+def _merge_metrics(results: Iterator[Tuple[Any, Dict[str, Any]]]) -> Iterator[Any]:
+    metrics = get_metrics()
+    for result, taken in results:
+        metrics.merge(taken)
+        yield result
+
+
+def init_pipeline_worker(cache_path: Optional[str] = None):
+    """Build the parser and extractor once per worker process"""
+    global _worker_parser, _worker_extractor
+    cache = SummaryCache(cache_path) if cache_path else None
+    _worker_parser = EmailParser()
+    _worker_extractor = DocumentExtractor(cache=cache)
+
+
+def parse_and_extract_worker(email_path: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Pool task: parse one email and extract its attachments in a worker process"""
+    if _worker_parser is None:
+        init_pipeline_worker()
+    return parse_and_extract(_worker_parser, _worker_extractor, email_path)
+
+
+def parse_and_extract(parser: EmailParser, extractor: DocumentExtractor,
+                      email_path: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Parse one email and extract its attachments, reporting errors like the serial path
+
+    Attachment payloads are dropped from the parsed email once extraction is
+    done, so only text and metadata travel back to the parent process.
+    """
+    filename = message_name(email_path)
+
+    try:
+        email_data = parser.parse_single_email(email_path)
+        if not email_data:
+            return None
+        print(f"✓ Successfully parsed: {filename}")
+
+        # Extract content from attachments
+        extracted_docs = extractor.extract_from_attachments(email_data['attachments'])
+
+        # The summary only needs attachment metadata, so drop the payloads now
+        email_data['attachments'] = [
+            {key: value for key, value in attachment.items() if key != 'content'}
+            for attachment in email_data['attachments']
+        ]
+
+        return email_data, extracted_docs
+
+    except Exception as e:
+        print(f"✗ Error processing {filename}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
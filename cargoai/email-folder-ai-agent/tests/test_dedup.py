@@ -0,0 +1,76 @@
+"""Deduplicator email keys: content decides, never the Message-ID alone"""
+from decoding_policy import FALLBACK_DECODING
+from dedup import Deduplicator, normalize_subject, strip_quoted_text, thread_id
+from summarizer import EmailSummarizer
+
+BODY = ("The container MSCU1234565 left Rotterdam on Monday and is due in Singapore "
+        "on the 14th. Please confirm the customs paperwork and the delivery slot with "
+        "the consignee before the vessel arrives, and send the updated invoice.")
+
+
+def _email(body=BODY, subject='Shipment update', message_id='<a@example.com>'):
+    return {'subject': subject, 'body': body, 'message_id': message_id}
+
+
+def test_same_message_id_with_different_body_gets_its_own_key():
+    dedup = Deduplicator()
+    first = dedup.email_key(_email())
+    other = dedup.email_key(_email(body="Completely unrelated text about the quarterly budget "
+                                        "review meeting, the agenda and who brings the slides."))
+    assert first != other
+
+
+def test_same_body_with_different_message_id_shares_a_key():
+    dedup = Deduplicator()
+    assert dedup.email_key(_email()) == dedup.email_key(_email(message_id='<b@example.com>'))
+
+
+def test_near_duplicate_body_shares_a_key():
+    dedup = Deduplicator()
+    long_body = ' '.join(f"Line {i}: container MSCU{i:06d} is booked on voyage {i * 7} "
+                         f"from port {i % 13} to port {i % 17}." for i in range(40))
+    edited = long_body.replace('voyage 70 ', 'voyage 71 ')
+    assert dedup.email_key(_email(body=long_body)) == dedup.email_key(_email(body=edited))
+
+
+def test_reply_prefix_and_quoted_text_are_ignored():
+    dedup = Deduplicator()
+    reply = _email(subject='RE: Fwd: Shipment update',
+                   body=BODY + "\n\nOn Mon, 1 Jan 2024, Bob wrote:\n> earlier message\n> more quoted text")
+    assert dedup.email_key(_email()) == dedup.email_key(reply)
+
+
+def test_short_bodies_are_compared_exactly():
+    dedup = Deduplicator()
+    assert dedup.email_key(_email(body='See attached.')) == dedup.email_key(_email(body='See attached.'))
+    assert dedup.email_key(_email(body='See attached.')) != dedup.email_key(_email(body='Call me.'))
+
+
+def test_summaries_are_evicted_least_recently_used():
+    dedup = Deduplicator(max_entries=1)
+    first = dedup.email_key(_email())
+    dedup.put(first, 'first summary', source='one.eml')
+    assert dedup.get(first)['summary'] == 'first summary'
+
+    second = dedup.email_key(_email(body='Short note.'))
+    dedup.put(second, 'second summary')
+    assert dedup.get(first) is None
+    assert dedup.get(second)['summary'] == 'second summary'
+
+
+def test_fallback_summaries_are_not_remembered():
+    summarizer = EmailSummarizer()
+    summarizer._summarize_texts = lambda texts, *args: (['fallback'] * len(texts), [FALLBACK_DECODING] * len(texts))
+    key = summarizer.deduplicator.email_key(_email())
+
+    summaries, _, decodings = summarizer._summarize_unique(
+        [BODY, BODY], [key, key], ['one.eml', 'two.eml'], 'email', 150, 30)
+    assert summaries == ['fallback', 'fallback']
+    assert decodings == [FALLBACK_DECODING, FALLBACK_DECODING]
+    assert summarizer.deduplicator.get(key) is None
+
+
+def test_helpers():
+    assert normalize_subject('Re: FW: Re[2]: Hello') == 'hello'
+    assert strip_quoted_text("New text\n> old text\n") == 'New text'
+    assert thread_id({'references': '<root@x> <mid@x>', 'message_id': '<me@x>'}) == '<root@x>'
@@ -0,0 +1,77 @@
+"""MboxIndex: resuming after appends, partial messages, rewrites and From-unescaping"""
+from mailbox_reader import MboxIndex, read_message_bytes
+
+FIRST = b"From alice@example.com Mon Jan  1 00:00:00 2024\nSubject: One\n\nfirst body\n\n"
+SECOND = b"From bob@example.com Mon Jan  1 00:01:00 2024\nSubject: Two\n\nsecond body\n\n"
+THIRD = b"From carol@example.com Mon Jan  1 00:02:00 2024\nSubject: Three\n\nthird body\n"
+
+
+def _messages(index):
+    return [read_message_bytes(ref) for ref in index.iter_messages()]
+
+
+def test_index_resumes_after_append(tmp_path):
+    mbox = tmp_path / 'inbox.mbox'
+    index_dir = str(tmp_path / 'index')
+    mbox.write_bytes(FIRST + SECOND)
+
+    assert MboxIndex(str(mbox), index_dir).update() == 2
+
+    with open(mbox, 'ab') as f:
+        f.write(THIRD)
+    # A new index object loads the saved offsets and only scans the new bytes
+    resumed = MboxIndex(str(mbox), index_dir)
+    assert len(resumed) == 2
+    assert resumed.update() == 1
+    assert resumed.update() == 0
+
+    fresh = MboxIndex(str(mbox))
+    fresh.update()
+    assert list(resumed.offsets) == list(fresh.offsets)
+    assert _messages(resumed)[2].startswith(b"Subject: Three")
+
+
+def test_partial_last_message_is_completed_on_next_update(tmp_path):
+    mbox = tmp_path / 'inbox.mbox'
+    # A writer is midway through appending the second message
+    cut = SECOND.index(b'second') + 3
+    mbox.write_bytes(FIRST + SECOND[:cut])
+
+    index = MboxIndex(str(mbox), str(tmp_path / 'index'))
+    assert index.update() == 2
+    assert _messages(index)[1] == b"Subject: Two\n\nsec"
+
+    with open(mbox, 'ab') as f:
+        f.write(SECOND[cut:] + THIRD)
+    # The cut-off message is re-read; only the third one is new
+    assert index.update() == 1
+    messages = _messages(index)
+    assert len(messages) == 3
+    assert messages[1] == SECOND.split(b'\n', 1)[1][:-1]
+
+
+def test_rewritten_mbox_is_reindexed(tmp_path):
+    mbox = tmp_path / 'inbox.mbox'
+    index_dir = str(tmp_path / 'index')
+    mbox.write_bytes(FIRST + SECOND)
+    MboxIndex(str(mbox), index_dir).update()
+
+    # Same size, different content: the saved offsets no longer apply
+    mbox.write_bytes(THIRD.ljust(len(FIRST + SECOND), b'x'))
+    index = MboxIndex(str(mbox), index_dir)
+    assert index.update() == 1
+    assert len(index) == 1
+    assert _messages(index)[0].startswith(b"Subject: Three")
+
+
+def test_escaped_from_lines_are_unescaped(tmp_path):
+    mbox = tmp_path / 'inbox.mbox'
+    body = b"Subject: Quote\n\n>From the top\n>>From nested\nnot >From mid-line\n"
+    mbox.write_bytes(b"From alice@example.com Mon Jan  1 00:00:00 2024\n" + body + b"\n" + SECOND)
+
+    index = MboxIndex(str(mbox))
+    assert index.update() == 2
+    message = _messages(index)[0]
+    assert b"\nFrom the top\n" in message
+    assert b"\n>From nested\n" in message
+    assert b"not >From mid-line" in message
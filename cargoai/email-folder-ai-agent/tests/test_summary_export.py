@@ -0,0 +1,72 @@
+"""SummaryExporter: cursor resume, limits and tombstones over a ResultsStore"""
+import gzip
+import io
+import json
+
+import pytest
+
+from results_store import ResultsStore
+from summary_export import SummaryExporter, format_cursor, parse_since
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite3'))
+    for number in range(7):
+        store.put({'email_filename': f"email{number}.eml",
+                   'summary': {'email_metadata': {'subject': f"Subject {number}"}}})
+    yield store
+    store.close()
+
+
+def _names(records):
+    return [record['email_filename'] for _, record in records]
+
+
+def test_cursor_resumes_after_last_record(store):
+    # Batches smaller than the export exercise paging through the store
+    exporter = SummaryExporter(store, batch_size=2, settle_seconds=0)
+    first = list(exporter.iter_records(limit=3))
+    assert _names(first) == ['email0.eml', 'email1.eml', 'email2.eml']
+
+    cursor = parse_since(format_cursor(first[-1][0]))
+    assert cursor == first[-1][0]
+    assert _names(exporter.iter_records(cursor)) == [f"email{number}.eml" for number in range(3, 7)]
+
+
+def test_limit_caps_records_and_reports_next_cursor(store):
+    exporter = SummaryExporter(store, batch_size=2, settle_seconds=0)
+    stream = io.BytesIO()
+    stats = exporter.export(stream, limit=5)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert stats['records'] == 5 == len(lines)
+    assert stats['cursor'] == lines[-1]['cursor']
+    assert _names(exporter.iter_records(parse_since(stats['cursor']))) == ['email5.eml', 'email6.eml']
+
+
+def test_removed_email_is_exported_as_tombstone(store):
+    exporter = SummaryExporter(store, settle_seconds=0)
+    cursor = list(exporter.iter_records())[-1][0]
+
+    store.remove(['email3.eml'])
+    changes = [record for _, record in exporter.iter_records(cursor)]
+    assert len(changes) == 1
+    assert changes[0]['email_filename'] == 'email3.eml'
+    assert changes[0]['deleted'] is True
+    assert 'summary' not in changes[0]
+
+    # Processing the email again replaces its tombstone with the new summary
+    store.put({'email_filename': 'email3.eml', 'summary': {'email_metadata': {}}})
+    changes = [record for _, record in exporter.iter_records(cursor)]
+    assert [(record['email_filename'], record['deleted']) for record in changes] == [('email3.eml', False)]
+
+
+def test_recent_changes_wait_for_the_settle_window(store):
+    assert list(SummaryExporter(store, settle_seconds=60).iter_records()) == []
+
+
+def test_compressed_export_is_valid_gzip(store):
+    stream = io.BytesIO()
+    SummaryExporter(store, settle_seconds=0).export(stream, compress=True)
+    assert len(gzip.decompress(stream.getvalue()).splitlines()) == 7
@@ -1,14 +1,63 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-import json
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 import os
 import sys
+import threading
 
 # Add src directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 from main import EmailProcessingAgent
+from email_parser import EmailParser
+from job_queue import ProcessingJobQueue
+from model_registry import get_model_registry
+from metrics import get_metrics
+from semantic_index import SemanticIndex
+from results_store import ResultsStore
+from summary_export import SummaryExporter, parse_since
+from summarizer import EmailSummarizer
 
 app = Flask(__name__)
 
+# Shared services are built on first use, so importing this module creates no
+# files and starts no threads
+_services = {}
+_services_lock = threading.Lock()
+
+
+def _service(name, factory):
+    """Return the named service, building it once per process"""
+    if name not in _services:
+        with _services_lock:
+            if name not in _services:
+                _services[name] = factory()
+    return _services[name]
+
+
+def get_job_queue() -> ProcessingJobQueue:
+    # One background worker per process keeps agents and models warm between jobs
+    return _service('job_queue', lambda: ProcessingJobQueue(EmailProcessingAgent))
+
+
+def get_query_summarizer() -> EmailSummarizer:
+    # Query embeddings come from the same shared model the agent uses for indexing;
+    # embedding loads only the sentence model, never T5
+    return _service('query_summarizer', EmailSummarizer)
+
+
+def get_search_index() -> SemanticIndex:
+    return _service('search_index', lambda: SemanticIndex(
+        "../output/index", get_query_summarizer().embedding_model_name))
+
+
+def get_results_store() -> ResultsStore:
+    # Results are paged out of SQLite instead of re-reading the aggregate JSON per request
+    return _service('results_store', lambda: ResultsStore.for_output_folder("../output"))
+
+
+def get_summary_exporter() -> SummaryExporter:
+    # Bulk export pages through the same store in change order
+    return _service('summary_exporter', lambda: SummaryExporter(get_results_store()))
+
+
 @app.route('/')
 def index():
     """Main page showing processing results"""
@@ -16,19 +65,22 @@ def index():
 
 @app.route('/api/process', methods=['POST'])
 def process_emails():
-    """API endpoint to trigger email processing"""
+    """API endpoint to queue email processing; returns a job id straight away"""
     try:
         email_folder = "../emails"
         output_folder = "../output"
+        options = request.get_json(silent=True) or {}
         
-        agent = EmailProcessingAgent(email_folder, output_folder)
-        results = agent.process_all_emails()
+        job = get_job_queue().submit(email_folder, output_folder, {
+            'incremental': bool(options.get('incremental', False))
+        })
         
         return jsonify({
-            'status': 'success',
-            'processed_count': len(results),
-            'results': results
-        })
+            'status': 'queued',
+            'job_id': job['job_id'],
+            'job_status': job['status'],
+            'deduplicated': job['deduplicated']
+        }), 202
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -37,33 +89,131 @@ def process_emails():
             'message': str(e)
         }), 500
 
+@app.route('/api/jobs')
+def list_jobs():
+    """List known processing jobs, newest first"""
+    return jsonify(get_job_queue().list_jobs())
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Get status and per-email progress of a processing job"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/emails')
+def list_emails():
+    """List emails in the inbox folder from their headers only, without parsing bodies"""
+    try:
+        return jsonify(list(EmailParser().iter_email_headers("../emails")))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/results')
 def get_results():
-    """Get processing results"""
+    """Get one page of processing results
+    
+    Query parameters: page, per_page, sender, subject, filename (substrings),
+    date_from, date_to (YYYY-MM-DD) and order (date_desc, date_asc, filename,
+    sender, subject).
+    """
     try:
-        results_path = "../output/processing_results.json"
-        if os.path.exists(results_path):
-            with open(results_path, 'r', encoding='utf-8') as f:
-                results = json.load(f)
-            return jsonify(results)
-        else:
-            return jsonify([])
+        args = request.args
+        return jsonify(get_results_store().query(
+            page=args.get('page', 1),
+            per_page=args.get('per_page', 50),
+            sender=args.get('sender'),
+            subject=args.get('subject'),
+            filename=args.get('filename'),
+            date_from=args.get('date_from'),
+            date_to=args.get('date_to'),
+            order=args.get('order', 'date_desc')
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/summary/<filename>')
 def get_summary(filename):
-    """Get detailed summary for a specific email"""
+    """Get detailed summary for a specific email, by email or summary file name"""
     try:
-        summary_path = f"../output/{filename}"
-        if os.path.exists(summary_path):
-            with open(summary_path, 'r', encoding='utf-8') as f:
-                summary = json.load(f)
+        summary = get_results_store().get(filename)
+        if summary is not None:
             return jsonify(summary)
         else:
             return jsonify({'error': 'Summary not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export')
+def export_summaries():
+    """Stream every summary changed after ?since= as NDJSON, in change order
+    
+    Emails removed from the folder come as tombstones with deleted set.
+    since takes the cursor of the last record received, a Unix timestamp or
+    an ISO date; limit caps the records in one response. The body is
+    gzip-encoded when the client accepts it or ?gzip=1 is given.
+    """
+    try:
+        since = parse_since(request.args.get('since'))
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    compress = (request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+                or 'gzip' in request.headers.get('Accept-Encoding', ''))
+    headers = {'Cache-Control': 'no-store', 'Vary': 'Accept-Encoding'}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    # No Content-Length: the body goes out with chunked transfer as it is read
+    return Response(get_summary_exporter().iter_ndjson(since, limit, compress),
+                    mimetype='application/x-ndjson', headers=headers, direct_passthrough=True)
+
+@app.route('/api/search')
+def search():
+    """Top-k processed emails and document chunks by cosine similarity to ?q="""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query parameter q'}), 400
+    try:
+        top_k = max(1, min(int(request.args.get('k', 10)), 100))
+        kind = request.args.get('kind') or None
+        vectors = get_query_summarizer().embed_texts([query])
+        if vectors is None:
+            return jsonify({'error': 'Embedding model is not available'}), 503
+        search_index = get_search_index()
+        return jsonify({
+            'query': query,
+            'results': search_index.search(vectors[0], top_k=top_k, kind=kind),
+            'index': search_index.stats()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models')
+def model_status():
+    """Loaded models and their load timings"""
+    return jsonify(get_model_registry().stats())
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint for pipeline timings and counters"""
+    registry = get_metrics()
+    registry.set_gauge('job_queue_depth', get_job_queue().queue_depth())
+    for name, seconds in get_model_registry().stats()['load_seconds'].items():
+        registry.set_gauge('model_load_seconds', seconds, model=name)
+    return Response(registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
+    # The debug reloader runs this block twice; only preload in the serving process.
+    # The summarizer reads SUMMARIZER_BACKEND and SUMMARIZER_THREADS like the job
+    # agents do, so the models warmed here are the ones jobs will use
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        summarizer = get_query_summarizer()
+        summarizer.registry.preload(summarizer.model_name, summarizer.embedding_model_name,
+                                    summarizer.inference_backend)
     app.run(debug=True, port=5000, host='0.0.0.0')